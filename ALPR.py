@@ -1,7 +1,28 @@
-import wx
-from gui import frame_alpr
+import time
+START_TIME = time.perf_counter()
 
-myALPR = wx.App()
-guiFrame = frame_alpr()
-guiFrame.Show()
-myALPR.MainLoop()
\ No newline at end of file
+import sys
+import multiprocessing
+
+if __name__ == '__main__':
+    # needed by the frozen (PyInstaller) build before any worker process
+    # can be started
+    multiprocessing.freeze_support()
+
+    if '--profile-startup' in sys.argv:
+        # import time of every module, see startup.py
+        import startup
+        sys.exit(startup.main([each for each in sys.argv[1:]
+            if each != '--profile-startup']))
+
+    # wx and the window are imported here so worker processes, which import
+    # this module again, do not load them
+    import wx
+    from gui import frame_alpr
+
+    myALPR = wx.App()
+    guiFrame = frame_alpr(start_time=START_TIME)
+    guiFrame.Show()
+    wx.CallAfter(lambda: print('window shown {:.2f} s after start'.format(
+        time.perf_counter() - START_TIME)))
+    myALPR.MainLoop()
@@ -0,0 +1,359 @@
+"""
+Micro-benchmarks of the pipeline stages.
+
+Every stage is timed on the images of test_images/ and on generated car
+scenes at several resolutions: PreProcess.__init__ (decode, grayscale,
+resize), get_plate_like_objects, validate_plate, OCROnObjects,
+DeepMachineLearning.classify_objects, templatematching.template_match and
+DBConnection.get_vehicle_info on a generated registry. The median and 95th
+percentile of the runs and the peak memory allocated by one run (measured
+with tracemalloc in a separate run) are saved as JSON, and a saved run can
+be compared with a new one to catch regressions.
+
+Usage:
+    python benchmark.py --output bench.json
+    python benchmark.py --compare bench.json --output new.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+import numpy as np
+from skimage.io import imread, imsave
+from skimage.color import rgb2gray
+
+from preprocess import PreProcess
+from ocr import OCROnObjects
+from deepMachine import DeepMachineLearning, TEMPLATE_DIR
+from recognition import (ROOT_FOLDER, DEFAULT_MODEL_PATH, Recognizer,
+    extract_license_plate, list_images)
+import templatematching
+
+TEST_IMAGES = os.path.join(ROOT_FOLDER, 'test_images')
+
+# (height, width) of the generated car scenes
+RESOLUTIONS = ((480, 640), (720, 1280), (1080, 1920))
+
+# number of plates of the generated vehicle registry
+REGISTRY_SIZE = 100000
+
+BENCHMARKS = ('preprocess', 'plate_like_objects', 'validate_plate', 'ocr',
+    'classify_objects', 'template_match', 'vehicle_lookup')
+
+
+def generate_scene(height, width, plate_text='EGB626AA', seed=0):
+    """
+    A gray car scene with a white plate of dark characters taken from the
+    training glyphs
+
+    Returns:
+    --------
+    2D uint8 array
+    """
+    rng = np.random.RandomState(seed)
+    scene = rng.uniform(0.15, 0.45, (height, width))
+    plate_height, plate_width = int(0.12 * height), int(0.3 * width)
+    top, left = int(0.6 * height), (width - plate_width) // 2
+    scene[top:top + plate_height, left:left + plate_width] = 0.95
+
+    glyph_height = int(0.5 * plate_height)
+    glyph_width = plate_width // (len(plate_text) + 4)
+    gap = (plate_width - glyph_width * len(plate_text)) // (len(plate_text) + 1)
+    glyph_top = top + (plate_height - glyph_height) // 2
+    for index, character in enumerate(plate_text):
+        glyph = rgb2gray(imread(os.path.join(TEMPLATE_DIR, character,
+            character + '_0.jpg')))
+        rows = np.arange(glyph_height) * glyph.shape[0] // glyph_height
+        cols = np.arange(glyph_width) * glyph.shape[1] // glyph_width
+        glyph_left = left + gap + index * (glyph_width + gap)
+        scene[glyph_top:glyph_top + glyph_height,
+            glyph_left:glyph_left + glyph_width] = glyph[rows][:, cols]
+    return (scene * 255).astype(np.uint8)
+
+
+def generate_registry(filename, size, seed=0):
+    """
+    writes a CSV vehicle registry of size random plates
+
+    Returns:
+    --------
+    list of the plates
+    """
+    rng = random.Random(seed)
+    alphabet = '0123456789ABCDEFGHJKLMNPQRSTUVWXYZ'
+    plates = [''.join(rng.choice(alphabet) for _ in range(8)) for _ in range(size)]
+    with open(filename, 'w') as f:
+        f.write('plate_number,owner,issue_date,expiry_date,chasis_number,type\n')
+        for index, plate in enumerate(plates):
+            f.write('{},Owner {},2020-01-01,2025-01-01,CH{},Car\n'.format(
+                plate, index, index))
+    return plates
+
+
+def measure(function, setup=None, repeat=20, warmup=2):
+    """
+    Times function(*setup()) repeat times, setup is not timed
+
+    Returns:
+    --------
+    dict of the median, 95th percentile, mean and minimum in milliseconds
+    and the peak memory in KiB allocated by one more run
+    """
+    setup = setup or tuple
+    for _ in range(warmup):
+        function(*setup())
+
+    times = []
+    for _ in range(repeat):
+        arguments = setup()
+        start = time.perf_counter_ns()
+        function(*arguments)
+        times.append((time.perf_counter_ns() - start) / 1e6)
+
+    arguments = setup()
+    tracemalloc.start()
+    try:
+        function(*arguments)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    times = np.array(times)
+    return {
+        'median_ms': float(np.median(times)),
+        'p95_ms': float(np.percentile(times, 95)),
+        'mean_ms': float(np.mean(times)),
+        'min_ms': float(np.min(times)),
+        'runs': len(times),
+        'peak_kib': peak / 1024.0
+    }
+
+
+def image_inputs(directory, resolutions=RESOLUTIONS):
+    """
+    The test images and generated scenes saved in directory
+
+    Returns:
+    --------
+    list of (name, image path) tuples
+    """
+    inputs = [(os.path.basename(each), each) for each in list_images([TEST_IMAGES])]
+    for height, width in resolutions:
+        name = 'generated_{}x{}.png'.format(width, height)
+        image_path = os.path.join(directory, name)
+        imsave(image_path, generate_scene(height, width), check_contrast=False)
+        inputs.append((name, image_path))
+    return inputs
+
+
+def pipeline_benchmarks(name, image_path, model, repeat):
+    """
+    Times every image stage of the pipeline on one image, the stages after
+    a failing one are skipped
+
+    Returns:
+    --------
+    list of result dicts
+    """
+    results = []
+
+    def add(benchmark, function, setup=None):
+        if selected(benchmark):
+            result = measure(function, setup, repeat)
+            result.update(benchmark=benchmark, input=name)
+            results.append(result)
+
+    add('preprocess', PreProcess, lambda: (image_path,))
+
+    pre_process = PreProcess(image_path)
+    full_car_image = pre_process.full_car_image
+
+    def fresh_pre_process():
+        # the thresholded image is computed lazily, a new instance keeps it
+        # inside the timed call
+        each = PreProcess(full_car_image)
+        return (each,)
+
+    add('plate_like_objects', lambda each: each.get_plate_like_objects(),
+        fresh_pre_process)
+
+    plate_like_objects = pre_process.get_plate_like_objects()
+    if len(plate_like_objects) > 1:
+        add('validate_plate', pre_process.validate_plate,
+            lambda: (plate_like_objects,))
+    try:
+        plate_index, license_plate = extract_license_plate(plate_like_objects,
+            pre_process)
+    except Exception:
+        return results
+
+    add('ocr', OCROnObjects, lambda: (license_plate,))
+    candidates = OCROnObjects(license_plate).candidates
+    if not candidates:
+        return results
+
+    deep_learn = DeepMachineLearning()
+    characters = candidates['fullscale']
+    add('classify_objects', deep_learn.classify_objects,
+        lambda: (characters, model, (20, 20)))
+
+    labels, confidences = deep_learn.classify_with_confidence(characters, model,
+        (20, 20))
+    confusing = [index for index, label in enumerate(labels)
+        if label in templatematching.confusing_chars]
+    index = confusing[0] if confusing else 0
+    label = labels[index] if confusing else '8'
+    add('template_match', templatematching.template_match,
+        lambda: (label, characters[index], TEMPLATE_DIR))
+    return results
+
+
+def miss_plate(plate):
+    """
+    an unregistered plate of the same length, one character replaced
+    """
+    middle = len(plate) // 2
+    return plate[:middle] + 'I' + plate[middle + 1:]
+
+
+def lookup_benchmarks(directory, size, repeat):
+    """
+    Times exact, missing and fuzzy lookups in a generated registry
+    """
+    if not selected('vehicle_lookup'):
+        return []
+    from dbAspect import DBConnection
+
+    data_file = os.path.join(directory, 'registry.csv')
+    plates = generate_registry(data_file, size)
+    db_aspect = DBConnection(data_file)
+    rng = random.Random(1)
+    queries = {
+        'exact': lambda: (rng.choice(plates),),
+        # as long as the registered plates so the index is searched, 'I' is
+        # not in their alphabet
+        'miss': lambda: (miss_plate(rng.choice(plates)),),
+        'fuzzy': lambda: (rng.choice(plates)[:-1] + 'X', 1.0)
+    }
+    # the fuzzy index is built on the first fuzzy lookup, not timed here
+    db_aspect.get_fuzzy_index()
+
+    results = []
+    for kind, setup in queries.items():
+        result = measure(db_aspect.get_vehicle_info, setup, repeat * 10)
+        result.update(benchmark='vehicle_lookup',
+            input='{}_{}_plates'.format(kind, size))
+        results.append(result)
+    return results
+
+
+_selected = set(BENCHMARKS)
+
+
+def selected(benchmark):
+    return benchmark in _selected
+
+
+def environment():
+    import sklearn
+    import skimage
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'scikit-image': skimage.__version__,
+        'scikit-learn': sklearn.__version__,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+
+
+def compare(baseline, results, threshold):
+    """
+    Prints the median of every benchmark against the baseline
+
+    Returns:
+    --------
+    list of the (benchmark, input) whose median grew by more than threshold
+    """
+    previous = dict(((each['benchmark'], each['input']), each)
+        for each in baseline['results'])
+    regressions = []
+    print('{:<20} {:<28} {:>10} {:>10} {:>8}'.format('benchmark', 'input',
+        'before ms', 'after ms', 'ratio'))
+    for each in results:
+        key = (each['benchmark'], each['input'])
+        if key not in previous:
+            continue
+        before = previous[key]['median_ms']
+        ratio = each['median_ms'] / before if before else float('inf')
+        flag = ''
+        if ratio > 1 + threshold:
+            regressions.append(key)
+            flag = '  REGRESSION'
+        print('{:<20} {:<28} {:>10.3f} {:>10.3f} {:>8.2f}{}'.format(key[0],
+            key[1], before, each['median_ms'], ratio, flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark the stages of the recognition pipeline')
+    parser.add_argument('--output', default=None,
+        help='JSON file for the results (default: stdout)')
+    parser.add_argument('--repeat', type=int, default=20,
+        help='timed runs of every benchmark')
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS, default=None,
+        help='run these benchmarks only')
+    parser.add_argument('--registry-size', type=int, default=REGISTRY_SIZE,
+        help='plates in the generated vehicle registry')
+    parser.add_argument('--no-generated', action='store_true',
+        help='only benchmark the images of test_images/')
+    parser.add_argument('--compare', default=None,
+        help='JSON file of an earlier run to compare the medians with')
+    parser.add_argument('--threshold', type=float, default=0.2,
+        help='with --compare, a median this much slower is a regression')
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH,
+        help='path of the classification model')
+    args = parser.parse_args(argv)
+
+    if args.only:
+        _selected.intersection_update(args.only)
+
+    model = Recognizer(args.model).load()
+    directory = tempfile.mkdtemp()
+    try:
+        results = []
+        resolutions = () if args.no_generated else RESOLUTIONS
+        for name, image_path in image_inputs(directory, resolutions):
+            results.extend(pipeline_benchmarks(name, image_path, model,
+                args.repeat))
+        results.extend(lookup_benchmarks(directory, args.registry_size,
+            args.repeat))
+    finally:
+        shutil.rmtree(directory)
+
+    report = {'environment': environment(), 'results': results}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    elif not args.compare:
+        sys.stdout.write(text + '\n')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(baseline, results, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -31,85 +31,347 @@ class DBConnection():
         finally:
             pass'''''
 
-import pandas as pd
 import os
 import csv
+import time
+import queue
+import atexit
+import threading
 from datetime import datetime
 
+from vehiclecache import VehicleCache, SortedPlateIndex, normalize_plate
+from fuzzymatch import FuzzyPlateIndex
+
+
 class DBConnection:
-    def __init__(self, data_file='vehicles_dataset.xlsx'):
+    registration_col = 'plate_number'  # Ensure this matches your actual dataset
+
+    # key in the returned vehicle info -> column of the dataset
+    info_columns = {
+        'owner': 'owner',
+        'issue_date': 'issue_date',
+        'expiry_date': 'expiry_date',
+        'chassis': 'chasis_number',
+        'type': 'type'
+    }
+
+    def __init__(self, data_file='vehicles_dataset.xlsx', use_cache=True,
+            log_file='alpr_log.csv'):
         """
         Initialize DBConnection with local dataset file.
         Supports Excel (.xlsx) or CSV (.csv) based on file extension.
+
+        With use_cache the dataset is only parsed when it changed, otherwise
+        it is memory mapped from the binary cache (see vehiclecache).
+        Recognized plates are logged to log_file.
         """
-        self.vehicle_df = pd.DataFrame()
         self.data_file = data_file
+        self.log_file = log_file
+        self.log_writer = None
+        self.log_writer_lock = threading.Lock()
+        self.vehicle_table = None
+        self.vehicle_index = {}
+        self.vehicle_columns = {}
+        self.fuzzy_index = None
+        self.fuzzy_index_lock = threading.Lock()
+        self._vehicle_df = None
 
         if not os.path.exists(data_file):
             print(f"Data file {data_file} not found.")
             return
 
         try:
-            if data_file.lower().endswith('.xlsx') or data_file.lower().endswith('.xls'):
-                self.vehicle_df = pd.read_excel(data_file)
-            elif data_file.lower().endswith('.csv'):
-                self.vehicle_df = pd.read_csv(data_file)
+            if use_cache:
+                self.vehicle_table, self.vehicle_index = VehicleCache(data_file,
+                    registration_col=self.registration_col).load()
             else:
-                print("Unsupported file format. Use Excel (.xlsx) or CSV (.csv).")
+                self.vehicle_table = VehicleCache(data_file).read_table()
         except Exception as e:
             print(f"Error loading data file {data_file}: {e}")
-            self.vehicle_df = pd.DataFrame()
+            self.vehicle_table = None
+
+        self.build_index()
+
+    @property
+    def vehicle_df(self):
+        """
+        the dataset as a DataFrame, only built when something asks for it
+        """
+        if self._vehicle_df is None:
+            import pandas as pd
+            if self.vehicle_table is None:
+                self._vehicle_df = pd.DataFrame()
+            else:
+                self._vehicle_df = pd.DataFrame(self.vehicle_table)
+        return self._vehicle_df
 
-    def get_vehicle_info(self, plate_text):
+    def column_names(self):
+        if self.vehicle_table is None:
+            return ()
+        return self.vehicle_table.dtype.names or ()
+
+    def build_index(self):
+        """
+        Prepares the plate number index so a lookup is a binary search in a
+        sorted array instead of a scan of the whole dataset. The index maps
+        the normalized plate number to the row position (the first row wins
+        for duplicated plates) and the info columns are kept as plain arrays.
+        """
+        self.vehicle_columns = {}
+        self.fuzzy_index = None
+        if self.vehicle_table is None or self.registration_col not in self.column_names():
+            self.vehicle_index = {}
+            return
+
+        if not isinstance(self.vehicle_index, SortedPlateIndex):
+            self.vehicle_index = SortedPlateIndex.from_plates(
+                self.vehicle_table[self.registration_col])
+
+        for key, column in self.info_columns.items():
+            if column in self.column_names():
+                self.vehicle_columns[key] = self.vehicle_table[column]
+
+    def get_vehicle_info(self, plate_text, max_distance=0):
         """
         Search the dataset for a matching registration number.
         Returns a dict with vehicle details or None if not found.
+
+        With max_distance above 0 a plate that is not registered falls back
+        to the closest registered plate within that weighted edit distance
+        (see find_similar_vehicles).
         """
-        if self.vehicle_df.empty:
+        if self.vehicle_table is None or len(self.vehicle_table) == 0:
             print("Vehicle dataset is empty or not loaded.")
             return None
 
-        registration_col = 'plate_number'  # Ensure this matches your actual dataset
-        owner_col = 'owner'
-        issue_col = 'issue_date'
-        expiry_col = 'expiry_date'
-        chassis_col = 'chasis_number'
-        type_col = 'type'
-
-        if registration_col not in self.vehicle_df.columns:
-            print(f"Column '{registration_col}' not found in dataset.")
+        if self.registration_col not in self.column_names():
+            print(f"Column '{self.registration_col}' not found in dataset.")
             return None
 
-        matched = self.vehicle_df[self.vehicle_df[registration_col] == plate_text]
+        position = self.vehicle_index.get(normalize_plate(plate_text))
+        if position is None:
+            if max_distance <= 0:
+                return None
+            matches = self.find_similar_vehicles(plate_text, max_distance, limit=1)
+            if not matches:
+                return None
+            return matches[0]
 
-        if matched.empty:
-            return None
+        return self.vehicle_record(position)
 
-        row = matched.iloc[0]
+    def find_similar_vehicles(self, plate_text, max_distance=1.0, limit=5):
+        """
+        Registered plates close to plate_text, for reads with a misrecognized
+        character. Replacing a character by a similar looking one (2/Z/7,
+        8/B/R, 5/S, 0/D/Q) costs 0.5, any other edit costs 1.
+
+        Returns:
+        --------
+        list of vehicle info dicts, closest first, with the matched
+        'plate_number' and its 'distance' added
+        """
+        if self.vehicle_table is None or self.registration_col not in self.column_names():
+            return []
 
-        return {
-            'owner': row.get(owner_col, ''),
-            'issue_date': row.get(issue_col, ''),
-            'expiry_date': row.get(expiry_col, ''),
-            'chassis': row.get(chassis_col, ''),
-            'type': row.get(type_col, '')
-        }
+        matches = []
+        for plate_key, distance, position in self.get_fuzzy_index().search(
+                plate_text, max_distance, limit):
+            vehicle_info = self.vehicle_record(position)
+            vehicle_info['plate_number'] = plate_key
+            vehicle_info['distance'] = distance
+            matches.append(vehicle_info)
+        return matches
+
+    def get_fuzzy_index(self):
+        """
+        the FuzzyPlateIndex of the registry, built on the first fuzzy lookup
+        """
+        if self.fuzzy_index is None:
+            with self.fuzzy_index_lock:
+                if self.fuzzy_index is None:
+                    self.fuzzy_index = FuzzyPlateIndex(zip(
+                        self.vehicle_index.keys.tolist(),
+                        self.vehicle_index.positions.tolist()))
+        return self.fuzzy_index
+
+    def vehicle_record(self, position):
+        """
+        vehicle details of the dataset row at position
+        """
+        return dict((key, self.vehicle_columns[key][position].item()
+            if key in self.vehicle_columns else '') for key in self.info_columns)
 
     def save_alpr(self, plate_text, timestamp=None):
         """
         Save ALPR result to a local CSV log file.
+
+        The row is handed to a background AlprLogWriter, so this returns
+        without waiting for the disk.
         """
         if timestamp is None:
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-        filename = 'alpr_log.csv'
-        file_exists = os.path.isfile(filename)
+        # queueing does not block, the lock keeps close from retiring the
+        # writer in between
+        with self.log_writer_lock:
+            if self.log_writer is None:
+                self.log_writer = AlprLogWriter(self.log_file)
+            self.log_writer.write(plate_text, timestamp)
 
+    def close(self):
+        """
+        writes out the rows still waiting in the log queue, a later
+        save_alpr starts a new writer
+        """
+        with self.log_writer_lock:
+            if self.log_writer is not None:
+                self.log_writer.close()
+                self.log_writer = None
+
+
+# queue markers of AlprLogWriter
+_STOP = object()
+_FLUSH = object()
+
+
+class AlprLogWriter():
+
+    def __init__(self, filename='alpr_log.csv', flush_every=100,
+            flush_interval=0.5, max_bytes=10 * 1024 * 1024, backup_count=5,
+            rotate_interval=None):
+        """
+        Writes the ALPR log from a background thread. Rows are queued and
+        written in batches when flush_every rows are waiting or the oldest
+        one waited flush_interval seconds. Whatever is queued is written
+        when the writer is closed, which also happens at interpreter exit.
+
+        Parameters:
+        -----------
+        filename: str; the CSV log file
+        flush_every: int; number of queued rows that triggers a write
+        flush_interval: float; seconds a row may wait in the queue
+        max_bytes: int; the log is rotated when it reaches this size
+            (None or 0 disables size based rotation)
+        backup_count: int; number of rotated logs kept (alpr_log.1.csv is
+            the newest)
+        rotate_interval: float; seconds after which the log is rotated
+            (None disables time based rotation)
+        """
+        self.filename = filename
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.rotate_interval = rotate_interval
+        self.period_start = time.time()
+        self.closed = False
+        # taken to queue anything, so nothing is queued behind _STOP
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name='alpr-log-writer')
+        self.thread.daemon = True
+        self.thread.start()
+        atexit.register(self.close)
+
+    def write(self, plate_text, timestamp):
+        """
+        queues one row, never blocks
+        """
+        with self.lock:
+            if self.closed:
+                raise ValueError("ALPR log writer is closed")
+            self.queue.put((plate_text, timestamp))
+
+    def flush(self, timeout=None):
+        """
+        waits until every row queued so far is on disk
+        """
+        written = threading.Event()
+        with self.lock:
+            if self.closed:
+                return
+            self.queue.put((_FLUSH, written))
+        written.wait(timeout)
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.queue.put(_STOP)
+        self.thread.join()
+        # the exit handler would keep the writer alive until exit
+        atexit.unregister(self.close)
+
+    def run(self):
+        pending = []
+        deadline = None
+        while True:
+            timeout = None
+            if pending:
+                timeout = max(0.0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self.write_rows(pending)
+                return
+            if isinstance(item, tuple) and item[0] is _FLUSH:
+                self.write_rows(pending)
+                pending = []
+                item[1].set()
+                continue
+            if item is not None:
+                if not pending:
+                    deadline = time.monotonic() + self.flush_interval
+                pending.append(item)
+                if len(pending) < self.flush_every:
+                    continue
+
+            self.write_rows(pending)
+            pending = []
+
+    def write_rows(self, rows):
+        if not rows:
+            return
         try:
-            with open(filename, 'a', newline='') as f:
+            self.rotate_if_needed()
+            file_exists = os.path.isfile(self.filename)
+            with open(self.filename, 'a', newline='') as f:
                 writer = csv.writer(f)
                 if not file_exists:
                     writer.writerow(['Plate Number', 'Timestamp'])
-                writer.writerow([plate_text, timestamp])
+                writer.writerows(rows)
         except Exception as e:
             print(f"Error saving ALPR result: {e}")
+
+    def rotate_if_needed(self):
+        if (self.rotate_interval and
+                time.time() - self.period_start >= self.rotate_interval):
+            self.rotate()
+        elif (self.max_bytes and os.path.exists(self.filename) and
+                os.path.getsize(self.filename) >= self.max_bytes):
+            self.rotate()
+
+    def rotate(self):
+        """
+        alpr_log.csv becomes alpr_log.1.csv, alpr_log.1.csv becomes
+        alpr_log.2.csv and so on, the oldest one is deleted
+        """
+        self.period_start = time.time()
+        if not os.path.exists(self.filename):
+            return
+        if self.backup_count < 1:
+            os.remove(self.filename)
+            return
+        for index in range(self.backup_count - 1, 0, -1):
+            older = self.backup_name(index)
+            if os.path.exists(older):
+                os.replace(older, self.backup_name(index + 1))
+        os.replace(self.filename, self.backup_name(1))
+
+    def backup_name(self, index):
+        root, extension = os.path.splitext(self.filename)
+        return '{}.{}{}'.format(root, index, extension)
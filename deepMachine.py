@@ -1,10 +1,11 @@
-from skimage.transform import resize
-import joblib
+import numpy as np
 import os.path
-import sys
-import types
-import sklearn.svm
+import modelregistry
 import templatematching
+import profiling
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+    'training_data', 'train20X20')
 
 class DeepMachineLearning():
     
@@ -16,7 +17,7 @@ class DeepMachineLearning():
         ]
 
     def learn(self, objects_to_classify, modelDir, tuple_size):
-        model = self.load_model(modelDir)
+        model = modelregistry.get_model(modelDir)
         return self.classify_objects(objects_to_classify, model, tuple_size)
         
     def classify_objects(self, objects, model, tuple_resize):
@@ -28,41 +29,149 @@ class DeepMachineLearning():
         ----------
         objects: Numpy array
         """
-        classificationResult = []
-        for eachObject in objects:
-            eachObject = resize(eachObject, tuple_resize)
-            eachObject = eachObject.reshape(1, -1)
-            result = model.predict(eachObject)
-            probabilities = model.predict_proba(eachObject)
-            result_index = self.letters.index(result[0])
-            prediction_probability = probabilities[0, result_index]
-            # template matching when necessary
-            if result[0] in templatematching.confusing_chars and prediction_probability < 0.15:
-                print('here')
-                result[0] = templatematching.template_match(
-                    result[0],
-                    eachObject,
-                    os.path.join(os.path.dirname(os.path.realpath(__file__)), 'training_data', 'train20X20')
-                )
-            classificationResult.append(result[0])  # Append the predicted char, not array
-        
+        characters, confidences = self.classify_with_confidence(objects, model,
+            tuple_resize)
+
         # Return the full recognized string, not a list
-        return ''.join(classificationResult)
-        
-    def load_model(self, model_dir):
+        return ''.join(characters)
+
+    def classify_with_confidence(self, objects, model, tuple_resize):
+        """
+        Same as classify_objects but keeps the per character result
+
+        Parameters
+        ----------
+        objects: Numpy array of the character images
+        model: the machine learning model object
+        tuple_resize: tuple; size each character is resized to
+
+        Returns
+        -------
+        a tuple containing
+        0: list of the predicted characters
+        1: list of the probability of each predicted character
+        """
+        labels, confidences = self.predict_characters(
+            self.prepare_objects(objects, tuple_resize), model)
+        return labels.tolist(), confidences.tolist()
+
+    def classify_many(self, object_groups, model, tuple_resize, traces=None):
+        """
+        Classifies the characters of many plates with one model call
+
+        Parameters
+        ----------
+        object_groups: list of Numpy arrays, the character images of each plate
+        model: the machine learning model object
+        tuple_resize: tuple; size each character is resized to
+        traces: optional list of profiling.Trace, one per plate, receiving
+            the characters and template fallbacks of their plate (by default
+            the totals go to the active trace)
+
+        Returns
+        -------
+        list of (characters, probabilities) tuples, one for each plate
+        """
+        features = [self.prepare_objects(each_group, tuple_resize)
+            for each_group in object_groups]
+        if not features:
+            return []
+        split_at = np.cumsum([len(each) for each in features])[:-1]
+        if traces is None:
+            labels, confidences = self.predict_characters(
+                np.concatenate(features), model)
+        else:
+            labels, confidences, unsure = self.predict_unsure(
+                np.concatenate(features), model)
+            for trace, each_unsure in zip(traces, np.split(unsure, split_at)):
+                trace.counts['characters'] = (trace.counts.get('characters', 0)
+                    + len(each_unsure))
+                trace.counts['template_fallbacks'] = (trace.counts.get(
+                    'template_fallbacks', 0) + int(np.count_nonzero(each_unsure)))
+        return [(each_labels.tolist(), each_confidences.tolist())
+            for each_labels, each_confidences in zip(np.split(labels, split_at),
+                np.split(confidences, split_at))]
+
+    def prepare_objects(self, objects, tuple_resize):
         """
-        Loads the machine learning model using joblib.
-        model_dir is the directory for the model.
+        Resizes every character image in a single call and flattens them
+
+        Parameters
+        ----------
+        objects: 3D Numpy array of character images (a 2D array is taken
+            as a single character)
+        tuple_resize: tuple; size each character is resized to
+
+        Returns
+        -------
+        2D Numpy array with one flattened character per row
+        """
+        objects = np.asarray(objects, dtype=np.float64)
+        if objects.ndim == 2:
+            objects = objects[None, :, :]
+        if objects.shape[1:] != tuple(tuple_resize):
+            # resizing the stack with its first dimension unchanged resizes
+            # each character on its own
+            from skimage.transform import resize
+            objects = resize(objects, (len(objects),) + tuple(tuple_resize))
+        return objects.reshape(len(objects), -1)
+
+    def predict_characters(self, features, model):
+        """
+        Predicts all the characters with one predict_proba call. The label is
+        the most probable class, confusing characters the model is unsure
+        about are checked again with template matching.
+
+        Parameters
+        ----------
+        features: 2D Numpy array with one flattened character per row
+        model: the machine learning model object
+
+        Returns
+        -------
+        a tuple containing
+        0: 1D Numpy array of the predicted characters
+        1: 1D Numpy array of the probability of each predicted character
+        """
+        labels, confidences, unsure = self.predict_unsure(features, model)
+        profiling.count('characters', len(features))
+        profiling.count('template_fallbacks', int(np.count_nonzero(unsure)))
+        return labels, confidences
+
+    def predict_unsure(self, features, model):
+        """
+        predict_characters without counting into the active trace
+
+        Returns
+        -------
+        the labels and probabilities of predict_characters and a 1D boolean
+        Numpy array of the characters checked with template matching
         """
+        if len(features) == 0:
+            return (np.array([], dtype=str), np.array([], dtype=np.float64),
+                np.zeros(0, dtype=bool))
 
-        # Patch for old scikit-learn pickled models expecting sklearn.externals.joblib
-        import joblib as real_joblib
-        sys.modules['sklearn.externals.joblib'] = real_joblib
+        probabilities = model.predict_proba(features)
+        best = np.argmax(probabilities, axis=1)
+        labels = np.asarray(model.classes_)[best]
+        confidences = probabilities[np.arange(len(best)), best]
 
-        # Patch missing sklearn.svm.classes module to support old pickles
-        sys.modules['sklearn.svm.classes'] = types.ModuleType('classes')
-        sys.modules['sklearn.svm.classes'].SVC = sklearn.svm.SVC
-        sys.modules['sklearn.svm.classes'].LinearSVC = sklearn.svm.LinearSVC
+        # template matching when necessary
+        unsure = ((confidences < 0.15) &
+            np.isin(labels, list(templatematching.confusing_chars)))
+        if np.any(unsure):
+            with profiling.stage('template_match'):
+                labels[unsure] = templatematching.template_match_many(
+                    labels[unsure], features[unsure], TEMPLATE_DIR)
 
-        model = joblib.load(model_dir)
-        return model
+        return labels, confidences, unsure
+
+    def load_model(self, model_dir):
+        """
+        Loads the machine learning model, a modelbundle directory or a
+        joblib pickle. model_dir is the path of the model.
+
+        This always reads the file, use modelregistry.get_model to reuse
+        the already loaded model.
+        """
+        return modelregistry.load_model_file(model_dir)
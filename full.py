@@ -1,16 +1,92 @@
-import os
-from preprocess import PreProcess
-from deepMachine import DeepMachineLearning
-from ocr import OCROnObjects
-from textclassification import TextClassification
+from recognition import Recognizer, RecognitionError, extract_license_plate
 from datetime import datetime
-import wx
+import profiling
+import metrics
+import os
 import time
+import threading
 
+import templatematching
+from deepMachine import TEMPLATE_DIR
 from dbAspect import DBConnection
 
-# instantiate the db connection once
-db_aspect = DBConnection()
+# the db connection is created once, on the first use (see get_db) so
+# importing this module does not parse the vehicle registry
+db_aspect = None
+db_aspect_lock = threading.Lock()
+
+# the model is loaded on the first recognition and reused afterwards
+recognizer = Recognizer()
+
+# what warm_up loads, in order
+WARM_UP_STEPS = ('model', 'templates', 'registry')
+
+# an unregistered plate is matched to the closest registered one within this
+# weighted edit distance: a misread look-alike character costs 0.5, any
+# other edit 1, which would match a different car (ABC128 for ABC123)
+LOOKUP_MAX_DISTANCE = 0.5
+
+# with ALPR_TRACE set to a file name the stage timings of every image are
+# appended to it as JSON lines
+trace_writer = None
+if os.environ.get('ALPR_TRACE'):
+    trace_writer = profiling.TraceWriter(os.environ['ALPR_TRACE'])
+
+# with ALPR_METRICS_PORT set the aggregated metrics are served on
+# http://127.0.0.1:<port>/metrics
+metrics_server = None
+if os.environ.get('ALPR_METRICS_PORT'):
+    metrics_server = metrics.registry.serve(int(os.environ['ALPR_METRICS_PORT']))
+
+def get_db():
+    """
+    Returns the DBConnection, creating it on the first call
+    """
+    global db_aspect
+    if db_aspect is None:
+        with db_aspect_lock:
+            if db_aspect is None:
+                db_aspect = DBConnection()
+    return db_aspect
+
+
+def warm_up(progress=None):
+    """
+    Loads the model, the template bank and the vehicle registry (with its
+    fuzzy index) so the first recognition does not wait for them. Meant for
+    a background thread started with the GUI; a step that fails is left for
+    the first recognition to report.
+
+    Parameters:
+        progress (callable): called with (step, seconds, error) after every
+            step of WARM_UP_STEPS, error is None when it succeeded
+
+    Returns:
+        dict: step -> seconds it took
+    """
+    def warm_registry():
+        db = get_db()
+        if db.vehicle_table is not None and db.registration_col in db.column_names():
+            db.get_fuzzy_index()
+
+    steps = {
+        'model': recognizer.load,
+        'templates': lambda: templatematching.get_template_bank(TEMPLATE_DIR),
+        'registry': warm_registry
+    }
+    timings = {}
+    for step in WARM_UP_STEPS:
+        error = None
+        start_time = time.perf_counter()
+        try:
+            steps[step]()
+        except Exception as e:
+            error = str(e)
+        timings[step] = time.perf_counter() - start_time
+        if progress is not None:
+            progress(step, timings[step], error)
+    return timings
+
 
 def license_plate_extract(plate_like_objects, pre_process):
     """
@@ -23,136 +99,155 @@ def license_plate_extract(plate_like_objects, pre_process):
     Returns:
         list or image: Processed license plate image or empty list if none found.
     """
-    number_of_candidates = len(plate_like_objects)
+    import wx
 
-    if number_of_candidates == 0:
-        wx.MessageBox("License plate could not be located",
-                      "Plate Localization", wx.OK | wx.ICON_ERROR)
+    try:
+        plate_index, license_plate = extract_license_plate(plate_like_objects,
+                                                           pre_process)
+    except RecognitionError as e:
+        wx.MessageBox(e.message, e.title, wx.OK | wx.ICON_ERROR)
         return []
 
-    if number_of_candidates == 1:
-        license_plate = pre_process.inverted_threshold(plate_like_objects[0])
-    else:
-        license_plate = pre_process.validate_plate(plate_like_objects)
-
     return license_plate
 
 
-def execute_ALPR(imagepath, listResult):
+def recognize_image(imagepath, progress=None, cancel_event=None):
     """
-    Runs the full license plate recognition process.
-    Function is called when user clicks on the execute button on the GUI.
+    The part of the ALPR process that does not touch the GUI, safe to run
+    on a worker thread: recognizes the plate, saves it and looks up the
+    vehicle.
 
     Parameters:
         imagepath (str): path to the image file
-        listResult (wx.ListCtrl): List control to display results
+        progress (callable): called with the name of every recognition stage
+        cancel_event (threading.Event): stops the recognition when set
 
     Returns:
-        bool: True if recognition and DB save succeed, False otherwise.
+        tuple: (RecognitionResult, vehicle info dict or None, list of
+        (title, message) of the errors raised by the save and the lookup)
     """
-    start_time = time.time()
+    # Steps 1 to 4: preprocess, segment, classify and reconstruct the text
+    result = recognizer.recognize(imagepath, progress=progress,
+                                  cancel_event=cancel_event)
+    return finish_recognition(result)
 
-    root_folder = os.path.dirname(os.path.realpath(__file__))
-    models_folder = os.path.join(root_folder, 'ml_models')
 
-    # Step 1: Preprocess image and find plate-like objects
-    try:
-        pre_process = PreProcess(imagepath)
-    except Exception as e:
-        wx.MessageBox(f"Error loading image or preprocessing: {str(e)}",
-                      "Preprocessing Error", wx.OK | wx.ICON_ERROR)
-        return False
-
-    plate_like_objects = pre_process.get_plate_like_objects()
+def finish_recognition(result):
+    """
+    The rest of recognize_image for a plate recognized elsewhere, e.g. by
+    the worker processes of recognition.recognize_batch: records the
+    metrics, saves the plate and looks up the vehicle.
 
-    license_plate = license_plate_extract(plate_like_objects, pre_process)
+    Parameters:
+        result (RecognitionResult): the outcome of steps 1 to 4
 
-    if len(license_plate) == 0:
-        return False
+    Returns:
+        tuple: see recognize_image
+    """
+    metrics.record_result(result)
+    if trace_writer is not None:
+        trace_writer.write(result.trace, plate_text=result.plate_text)
+    if result.error:
+        return result, None, []
+
+    plate_text = result.plate_text
+    print('ALPR process took {:.2f} seconds ({})'.format(
+        result.trace.elapsed_ns / 1e9, result.trace.summary()))
+
+    errors = []
+    # Step 5: Save the recognized plate text and timestamp to database
+    try:
+        get_db().save_alpr(plate_text, str(datetime.today()))
+    except Exception as e:
+        errors.append(("Database Error",
+                       f"Error saving to database: {str(e)}"))
 
-    # Step 2: OCR character segmentation
+    # Step 6: Lookup vehicle info from database or CSV via db_aspect
+    vehicle_info = None
     try:
-        ocr_instance = OCROnObjects(license_plate)
+        vehicle_info = get_db().get_vehicle_info(plate_text,
+                                                  LOOKUP_MAX_DISTANCE)
+        metrics.record_lookup(vehicle_info)
     except Exception as e:
-        wx.MessageBox(f"Error during OCR segmentation: {str(e)}",
-                      "OCR Error", wx.OK | wx.ICON_ERROR)
-        return False
+        errors.append(("Information Retrieval Error",
+                       f"Error retrieving vehicle info: {str(e)}"))
 
-    if not ocr_instance.candidates or 'fullscale' not in ocr_instance.candidates:
-        wx.MessageBox("No character was segmented",
-                      "Character Segmentation", wx.OK | wx.ICON_ERROR)
-        return False
+    return result, vehicle_info, errors
 
-    # Step 3: Load SVM model and classify characters
-    model_path = os.path.join(models_folder, 'SVC_model', 'SVC_model.pkl')
-    if not os.path.exists(model_path):
-        wx.MessageBox("SVM model not found!",
-                      "Model Error", wx.OK | wx.ICON_ERROR)
-        return False
 
-    try:
-        deep_learn = DeepMachineLearning()
-        text_result = deep_learn.learn(
-            ocr_instance.candidates['fullscale'],
-            model_path,
-            (20, 20)
-        )
-    except Exception as e:
-        wx.MessageBox(f"Error during deep learning classification: {str(e)}",
-                      "Classification Error", wx.OK | wx.ICON_ERROR)
-        return False
+def display_result(result, vehicle_info, errors, listResult, row_index=None,
+                   show_dialogs=True):
+    """
+    Shows the outcome of recognize_image, must run on the GUI thread.
 
-    # Step 4: Text classification and reconstruction
-    text_phase = TextClassification()
-    scattered_plate_text = text_phase.get_text(text_result)
-    plate_text = text_phase.text_reconstruction(
-        scattered_plate_text,
-        ocr_instance.candidates.get('columnsVal', [])
-    )
-
-    if not plate_text:
-        wx.MessageBox("No license plate text was recognized.",
-                      "Recognition Error", wx.OK | wx.ICON_ERROR)
-        return False
+    Parameters:
+        result, vehicle_info, errors: the return values of recognize_image
+        listResult (wx.ListCtrl): List control to display results
+        row_index (int): row of listResult to fill, a new row is inserted
+            when it is None
+        show_dialogs (bool): report errors and vehicle info in message boxes
 
-    elapsed_time = time.time() - start_time
-    print('ALPR process took {:.2f} seconds'.format(elapsed_time))
+    Returns:
+        bool: True if the plate was recognized, False otherwise.
+    """
+    import wx
 
-    # Step 5: Insert recognized plate text into GUI list control
-    row_index = listResult.InsertItem(listResult.GetItemCount(), plate_text)
+    if result.error:
+        if show_dialogs and not result.cancelled:
+            title, message = result.error
+            wx.MessageBox(message, title, wx.OK | wx.ICON_ERROR)
+        return False
 
-    # Step 6: Save the recognized plate text and timestamp to database
-    try:
-        db_aspect.save_alpr(plate_text, str(datetime.today()))
-    except Exception as e:
-        wx.MessageBox(f"Error saving to database: {str(e)}",
-                      "Database Error", wx.OK | wx.ICON_ERROR)
+    # Insert recognized plate text into GUI list control
+    if row_index is None:
+        row_index = listResult.InsertItem(listResult.GetItemCount(),
+                                          result.plate_text)
+    else:
+        listResult.SetItem(row_index, 0, result.plate_text)
 
-    # Step 7: Lookup vehicle info from database or CSV via db_aspect
-    vehicle_info = None
-    try:
-        vehicle_info = db_aspect.get_vehicle_info(plate_text)
-    except Exception as e:
-        wx.MessageBox(f"Error retrieving vehicle info: {str(e)}",
-                      "Information Retrieval Error", wx.OK | wx.ICON_ERROR)
+    if show_dialogs:
+        for title, message in errors:
+            wx.MessageBox(message, title, wx.OK | wx.ICON_ERROR)
 
     if vehicle_info:
-        wx.MessageBox(
-            f"Owner: {vehicle_info.get('owner','N/A')}\n"
-            f"Issue Date: {vehicle_info.get('issue_date','N/A')}\n"
-            f"Expiry Date: {vehicle_info.get('expiry_date','N/A')}\n"
-            f"Chassis: {vehicle_info.get('chassis','N/A')}\n"
-            f"Type: {vehicle_info.get('type','N/A')}",
-            "Vehicle Information", wx.OK | wx.ICON_INFORMATION
-        )
-
-        listResult.SetItem(row_index, 1, vehicle_info.get('owner', ''))
-        listResult.SetItem(row_index, 2, vehicle_info.get('issue_date', ''))
-        listResult.SetItem(row_index, 3, vehicle_info.get('expiry_date', ''))
-        listResult.SetItem(row_index, 4, vehicle_info.get('chassis', ''))
-        listResult.SetItem(row_index, 5, vehicle_info.get('type', ''))
-    else:
+        matched_plate = ''
+        if 'plate_number' in vehicle_info:
+            matched_plate = f"Closest registered plate: {vehicle_info['plate_number']}\n"
+        if show_dialogs:
+            wx.MessageBox(
+                matched_plate +
+                f"Owner: {vehicle_info.get('owner','N/A')}\n"
+                f"Issue Date: {vehicle_info.get('issue_date','N/A')}\n"
+                f"Expiry Date: {vehicle_info.get('expiry_date','N/A')}\n"
+                f"Chassis: {vehicle_info.get('chassis','N/A')}\n"
+                f"Type: {vehicle_info.get('type','N/A')}",
+                "Vehicle Information", wx.OK | wx.ICON_INFORMATION
+            )
+
+        listResult.SetItem(row_index, 1, str(vehicle_info.get('owner', '')))
+        listResult.SetItem(row_index, 2, str(vehicle_info.get('issue_date', '')))
+        listResult.SetItem(row_index, 3, str(vehicle_info.get('expiry_date', '')))
+        listResult.SetItem(row_index, 4, str(vehicle_info.get('chassis', '')))
+        listResult.SetItem(row_index, 5, str(vehicle_info.get('type', '')))
+    elif show_dialogs:
         wx.MessageBox("Vehicle Information could not be retrieved",
                       "Information Retrieval", wx.OK | wx.ICON_WARNING)
 
     return True
+
+
+def execute_ALPR(imagepath, listResult):
+    """
+    Runs the full license plate recognition process and shows the result.
+    Blocks until it is done, the GUI runs recognize_image on a worker
+    thread and display_result when it finishes instead.
+
+    Parameters:
+        imagepath (str): path to the image file
+        listResult (wx.ListCtrl): List control to display results
+
+    Returns:
+        bool: True if recognition and DB save succeed, False otherwise.
+    """
+    result, vehicle_info, errors = recognize_image(imagepath)
+    return display_result(result, vehicle_info, errors, listResult)
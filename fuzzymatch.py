@@ -0,0 +1,144 @@
+"""
+Confusion aware fuzzy plate lookup.
+
+The classifier mixes up the characters templatematching.similar_characters
+lists (2/Z/7, 8/B/R, 5/S, 0/D/Q). Replacing every character by the first
+character of its confusion class gives a canonical key that is the same for
+all such misreads, so they are found with one dictionary lookup. Plates one
+other edit away are found through an index on the two halves of the
+canonical key: whatever the edit, one half is unchanged. Candidates are then
+ranked by a weighted edit distance where a confusable substitution costs 0.5
+and any other substitution, insertion or deletion costs 1.
+"""
+from templatematching import similar_characters
+from vehiclecache import normalize_plate
+
+# cost of replacing a character by one it is easily confused with
+CONFUSABLE_COST = 0.5
+
+
+def confusion_classes(similar=similar_characters):
+    """
+    Groups the similar characters into classes (if 2 is similar to Z and Z
+    to 7, all three are one class).
+
+    Returns:
+    --------
+    dict of character -> the smallest character of its class
+    """
+    parent = {}
+
+    def find(character):
+        parent.setdefault(character, character)
+        while parent[character] != character:
+            parent[character] = parent[parent[character]]
+            character = parent[character]
+        return character
+
+    for character, similar_list in similar.items():
+        for each_similar in similar_list:
+            first, second = find(character), find(each_similar)
+            if first != second:
+                parent[max(first, second)] = min(first, second)
+
+    return dict((character, find(character)) for character in parent)
+
+
+confusion_class = confusion_classes()
+
+
+def canonical_plate(plate_key):
+    """
+    the plate with every confusable character replaced by its class
+    """
+    return ''.join(confusion_class.get(character, character)
+        for character in plate_key)
+
+
+def plate_distance(first, second):
+    """
+    Edit distance where substituting a confusable character costs 0.5 and
+    every other edit costs 1
+    """
+    previous = [float(index) for index in range(len(second) + 1)]
+    for row, first_char in enumerate(first, 1):
+        current = [float(row)]
+        first_class = confusion_class.get(first_char, first_char)
+        for column, second_char in enumerate(second, 1):
+            if first_char == second_char:
+                substitution = 0.0
+            elif first_class == confusion_class.get(second_char, second_char):
+                substitution = CONFUSABLE_COST
+            else:
+                substitution = 1.0
+            current.append(min(previous[column] + 1.0, current[column - 1] + 1.0,
+                previous[column - 1] + substitution))
+        previous = current
+    return previous[-1]
+
+
+class FuzzyPlateIndex():
+
+    def __init__(self, plates):
+        """
+        Parameters:
+        -----------
+        plates: iterable of (normalized plate number, dataset row) tuples
+        """
+        self.by_canonical = {}
+        self.by_half = {}
+        for plate_key, position in plates:
+            canonical = canonical_plate(plate_key)
+            entries = self.by_canonical.get(canonical)
+            if entries is None:
+                entries = self.by_canonical[canonical] = []
+                half = len(canonical) // 2
+                self.by_half.setdefault(('prefix', len(canonical), canonical[:half]),
+                    []).append(canonical)
+                self.by_half.setdefault(('suffix', len(canonical), canonical[half:]),
+                    []).append(canonical)
+            entries.append((plate_key, position))
+
+    def candidates(self, canonical, max_distance):
+        """
+        canonical keys that can be within max_distance of canonical
+        """
+        found = {canonical}
+        if max_distance < 1.0:
+            return found
+
+        length = len(canonical)
+        for each_length in (length - 1, length, length + 1):
+            half = each_length // 2
+            suffix_length = each_length - half
+            if half < 0 or suffix_length > length:
+                continue
+            found.update(self.by_half.get(('prefix', each_length, canonical[:half]), ()))
+            found.update(self.by_half.get(('suffix', each_length,
+                canonical[length - suffix_length:]), ()))
+        return found
+
+    def search(self, plate_text, max_distance=1.0, limit=5):
+        """
+        Finds the plates closest to plate_text. Matches with any number of
+        confusable substitutions and at most one other edit are found.
+
+        Parameters:
+        -----------
+        plate_text: str; the recognized plate text
+        max_distance: float; largest weighted edit distance returned
+        limit: int; maximum number of matches
+
+        Returns:
+        --------
+        list of (plate number, distance, dataset row) tuples, closest first
+        """
+        plate_key = normalize_plate(plate_text)
+        matches = []
+        for each_canonical in self.candidates(canonical_plate(plate_key), max_distance):
+            for each_key, position in self.by_canonical.get(each_canonical, ()):
+                distance = plate_distance(plate_key, each_key)
+                if distance <= max_distance:
+                    matches.append((each_key, distance, position))
+        matches.sort(key=lambda match: (match[1], match[0]))
+        return matches[:limit]
@@ -1,11 +1,57 @@
 import wx
 import wx.xrc
-import full
 import csv
+import os
+import time
+import itertools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# full and recognition pull in the whole recognition pipeline (skimage,
+# scipy, the model), they are imported by the warm-up thread once the window
+# is up; the methods below use them through self.full and self.recognition,
+# which on_imported sets, so no event handler waits on the import lock
+
+# single images recognized at the same time in the background
+GUI_WORKERS = max(2, min(4, os.cpu_count() or 1))
+
+# images of an opened folder handed to a worker process at a time, small so
+# the rows keep coming in
+BATCH_CHUNKSIZE = 4
+
+# column of the result list showing the state of each image
+STATUS_COLUMN = 6
+
+class AlprJob():
+
+    def __init__(self, imagepath, future, cancel_event, row_index=None, batch=False):
+        """
+        An image waiting for or going through recognition.
+
+        Parameters:
+        -----------
+        imagepath: str; the image being recognized
+        future: Future of full.recognize_image, for the images of a folder
+            one set by the folder thread (see frame_alpr.run_folder)
+        cancel_event: threading.Event stopping the recognition when set
+        row_index: int; row of the result list or None until it finishes
+        batch: bool; True for the images of an opened folder
+        """
+        self.imagepath = imagepath
+        self.future = future
+        self.cancel_event = cancel_event
+        self.row_index = row_index
+        self.batch = batch
+
 
 class frame_alpr(wx.Frame):
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, start_time=None):
+        """
+        start_time: time.perf_counter() of the application start, the
+            start-up time is reported from it (default: now)
+        """
+        self.start_time = time.perf_counter() if start_time is None else start_time
         wx.Frame.__init__(self, parent, id=wx.ID_ANY, title=u"ALPR",
                           pos=wx.DefaultPosition, size=wx.Size(800, 800),
                           style=wx.DEFAULT_FRAME_STYLE | wx.TAB_TRAVERSAL)
@@ -17,6 +63,20 @@ class frame_alpr(wx.Frame):
         self.menuitem_openfile = wx.MenuItem(self.menu_file, wx.ID_ANY,
                                              u"Open File", wx.EmptyString, wx.ITEM_NORMAL)
         self.menu_file.Append(self.menuitem_openfile)
+        self.menuitem_openfolder = wx.MenuItem(self.menu_file, wx.ID_ANY,
+                                               u"Open Folder", wx.EmptyString, wx.ITEM_NORMAL)
+        self.menu_file.Append(self.menuitem_openfolder)
+        self.menu_file.AppendSeparator()
+        self.menuitem_preview = wx.MenuItem(self.menu_file, wx.ID_ANY,
+                                            u"Show Preview", wx.EmptyString, wx.ITEM_CHECK)
+        self.menu_file.Append(self.menuitem_preview)
+        self.menuitem_preview.Check(True)
+        # a bitmap per finished image would slow a folder run down
+        self.menuitem_batch_preview = wx.MenuItem(self.menu_file, wx.ID_ANY,
+                                                  u"Preview Folder Images", wx.EmptyString,
+                                                  wx.ITEM_CHECK)
+        self.menu_file.Append(self.menuitem_batch_preview)
+        self.menuitem_batch_preview.Check(False)
         self.menubar.Append(self.menu_file, u"File")
         self.menu_about = wx.Menu()
         self.menubar.Append(self.menu_about, u"About")
@@ -60,7 +120,7 @@ class frame_alpr(wx.Frame):
         gbSizer1.Add(self.panel_imagearea, wx.GBPosition(1, 0),
                      wx.GBSpan(1, 2), wx.EXPAND | wx.ALL, 5)
 
-        fgSizer2 = wx.FlexGridSizer(0, 3, 0, 0)
+        fgSizer2 = wx.FlexGridSizer(0, 4, 0, 0)
 
         self.btn_remove = wx.Button(self.panel_main, wx.ID_ANY,
                                     u"Remove Image", wx.DefaultPosition, wx.Size(-1, 40), 0)
@@ -74,11 +134,21 @@ class frame_alpr(wx.Frame):
                                   wx.DefaultPosition, wx.Size(-1, 40), 0)
         fgSizer2.Add(self.btn_save, 0, wx.ALL, 5)
 
-        self.enable_or_disable_buttons([self.btn_save, self.btn_execute, self.btn_remove], False)
+        self.btn_cancel = wx.Button(self.panel_main, wx.ID_ANY, u"Cancel",
+                                    wx.DefaultPosition, wx.Size(-1, 40), 0)
+        fgSizer2.Add(self.btn_cancel, 0, wx.ALL, 5)
+
+        self.enable_or_disable_buttons([self.btn_save, self.btn_execute, self.btn_remove,
+                                        self.btn_cancel], False)
 
         gbSizer1.Add(fgSizer2, wx.GBPosition(2, 0), wx.GBSpan(1, 2),
                      wx.ALIGN_CENTER, 5)
 
+        self.gauge_progress = wx.Gauge(self.panel_main, wx.ID_ANY, 1,
+                                       wx.DefaultPosition, wx.Size(780, 10), wx.GA_HORIZONTAL)
+        gbSizer1.Add(self.gauge_progress, wx.GBPosition(3, 0), wx.GBSpan(1, 2),
+                     wx.EXPAND | wx.LEFT | wx.RIGHT, 5)
+
         self.panel_main.SetSizer(gbSizer1)
         self.panel_main.Layout()
         fgSizer1.Add(self.panel_main, 1, wx.EXPAND | wx.ALL, 5)
@@ -95,6 +165,10 @@ class frame_alpr(wx.Frame):
                                            70, 90, 92, True, wx.EmptyString))
         bSizer5.Add(self.m_staticText7, 0, wx.ALIGN_CENTER | wx.ALL, 5)
 
+        self.text_throughput = wx.StaticText(self.panel_result, wx.ID_ANY,
+                                             wx.EmptyString, wx.DefaultPosition, wx.DefaultSize, 0)
+        bSizer5.Add(self.text_throughput, 0, wx.ALIGN_CENTER | wx.ALL, 0)
+
         self.listResult = wx.ListCtrl(self.panel_result, wx.ID_ANY,
                                       size=wx.Size(750, -1), style=wx.LC_REPORT | wx.BORDER_SUNKEN)
         self.listResult.InsertColumn(0, 'PLATE TEXT', width=100)
@@ -103,6 +177,7 @@ class frame_alpr(wx.Frame):
         self.listResult.InsertColumn(3, 'EXPIRY DATE', width=100)
         self.listResult.InsertColumn(4, 'CHASIS', width=100)
         self.listResult.InsertColumn(5, 'TYPE', width=100)
+        self.listResult.InsertColumn(STATUS_COLUMN, 'STATUS', width=150)
         bSizer5.Add(self.listResult, 1, wx.ALIGN_CENTER | wx.ALL, 5)
 
         self.panel_result.SetSizer(bSizer5)
@@ -123,43 +198,151 @@ class frame_alpr(wx.Frame):
 
         # Event Bindings
         self.Bind(wx.EVT_MENU, self.open_image_menu, id=self.menuitem_openfile.GetId())
+        self.Bind(wx.EVT_MENU, self.open_folder_menu, id=self.menuitem_openfolder.GetId())
         self.btn_remove.Bind(wx.EVT_BUTTON, self.remove_image)
         self.btn_execute.Bind(wx.EVT_BUTTON, self.run_alpr)
         self.btn_save.Bind(wx.EVT_BUTTON, self.save_results)
+        self.btn_cancel.Bind(wx.EVT_BUTTON, self.cancel_alpr)
+        self.Bind(wx.EVT_CLOSE, self.on_close)
 
         self.currentState = 1
         self.imagepath = None  # initialize here to avoid attribute errors
+        self.previewImage = None
+
+        # single images are recognized on these threads so the window stays
+        # responsive, the images of a folder by worker processes (see
+        # submit_folder); the results come back to the GUI thread through
+        # wx.CallAfter
+        self.executor = ThreadPoolExecutor(max_workers=GUI_WORKERS)
+        self.job_ids = itertools.count()
+        self.jobs = {}  # job id -> AlprJob of the unfinished images
+        self.stages_done = {}  # job id -> recognition stages done
+        self.failed_images = 0  # folder images of the run without a plate
+        self.run_start = None
+        self.closing = False
+        # the pipeline modules, None until the warm-up imported them
+        self.full = None
+        self.recognition = None
+
+        # nothing can be recognized before the pipeline is imported (see
+        # on_imported)
+        self.menuitem_openfile.Enable(False)
+        self.menuitem_openfolder.Enable(False)
+
+        # the pipeline, the model, the template bank and the vehicle registry
+        # are loaded in the background so the window shows straight away
+        self.text_throughput.SetLabel('Loading...')
+        self.warm_up_thread = threading.Thread(target=self.warm_up,
+                                               name='alpr-warm-up')
+        self.warm_up_thread.daemon = True
+        self.warm_up_thread.start()
+
+    def warm_up(self):
+        """
+        runs on the warm-up thread, see full.warm_up
+        """
+        start_time = time.perf_counter()
+        try:
+            import full
+            import recognition
+        except Exception as e:
+            wx.CallAfter(self.on_import_failed, str(e))
+            return
+        # images can be opened from here on, the steps below are locked and
+        # the first recognition waits for the ones still running
+        wx.CallAfter(self.on_imported, full, recognition)
+        timings = {'imports': time.perf_counter() - start_time}
+
+        def progress(step, seconds, error):
+            wx.CallAfter(self.on_warm_up_step, step, error)
+
+        timings.update(full.warm_up(progress))
+        wx.CallAfter(self.on_warm_up_done, timings)
+
+    def on_imported(self, full, recognition):
+        self.full = full
+        self.recognition = recognition
+        if not self.closing:
+            self.menuitem_openfile.Enable(True)
+            self.menuitem_openfolder.Enable(True)
+
+    def on_import_failed(self, error):
+        if self.closing:
+            return
+        print('warm-up failed after {:.2f} s: {}'.format(
+            time.perf_counter() - self.start_time, error))
+        self.text_throughput.SetLabel('Loading failed')
+        self.panel_result.Layout()
+        wx.MessageBox(f"The recognition pipeline could not be loaded, no image "
+                      f"can be recognized: {error}", "Loading Error",
+                      wx.OK | wx.ICON_ERROR)
+
+    def on_warm_up_step(self, step, error):
+        if self.closing or self.jobs:
+            return
+        if error is not None:
+            print('warm-up: loading the {} failed: {}'.format(step, error))
+        self.text_throughput.SetLabel('Loaded the {}...'.format(step))
+        self.panel_result.Layout()
+
+    def on_warm_up_done(self, timings):
+        if self.closing:
+            return
+        ready = time.perf_counter() - self.start_time
+        print('ready {:.2f} s after start ({})'.format(ready, ', '.join(
+            '{} {:.2f} s'.format(step, seconds) for step, seconds in timings.items())))
+        if not self.jobs:
+            self.text_throughput.SetLabel('Ready')
+            self.panel_result.Layout()
 
     def open_image_menu(self, event):
         wcard = "Image Files(*.jpg, *.jpeg, *.png, *.bmp)|*.jpg;*.jpeg;*.png;*.bmp"
         imgFileDialog = wx.FileDialog(None, 'Select An Image', wildcard=wcard)
         if imgFileDialog.ShowModal() == wx.ID_OK:
             self.imagepath = imgFileDialog.GetPath()
-            full.imagepath = self.imagepath  # if needed elsewhere
-            full.listResult = self.listResult  # if needed elsewhere
+            self.full.imagepath = self.imagepath  # if needed elsewhere
+            self.full.listResult = self.listResult  # if needed elsewhere
             self.text_filepath.SetLabel(self.imagepath)
-            if self.currentState == 1:
-                self.text_placeholder.Hide()
-                self.showPreviewImage()
-                self.currentState = 2
-                self.enable_or_disable_buttons([self.btn_remove, self.btn_execute], True)
-            else:
-                self.previewImage.Destroy()
-                self.showPreviewImage()
+            if self.menuitem_preview.IsChecked():
+                self.showPreviewImage(self.imagepath)
+            self.enable_or_disable_buttons([self.btn_remove, self.btn_execute], True)
+
+    def open_folder_menu(self, event):
+        """
+        Queues every image of a folder, the rows are added as the images
+        finish without any message box
+        """
+        with wx.DirDialog(self, 'Select A Folder') as folderDialog:
+            if folderDialog.ShowModal() != wx.ID_OK:
+                return
+            folder = folderDialog.GetPath()
 
-    def showPreviewImage(self):
+        imagepaths = self.recognition.list_images([folder])
+        if not imagepaths:
+            wx.MessageBox("No image was found in the folder.", "Error", wx.OK | wx.ICON_ERROR)
+            return
+        self.text_filepath.SetLabel(f"{folder} ({len(imagepaths)} images)")
+        self.submit_folder(imagepaths)
+
+    def showPreviewImage(self, imagepath):
+        if self.previewImage is not None:
+            self.previewImage.Destroy()
+        self.text_placeholder.Hide()
         bSizer_action = wx.BoxSizer(wx.VERTICAL)
         self.previewImage = wx.StaticBitmap(self.scrollwindow_action,
-                                            wx.ID_ANY, wx.Bitmap(self.imagepath, wx.BITMAP_TYPE_ANY),
+                                            wx.ID_ANY, wx.Bitmap(imagepath, wx.BITMAP_TYPE_ANY),
                                             wx.DefaultPosition, wx.DefaultSize, 0)
         bSizer_action.Add(self.previewImage, 0, wx.ALIGN_CENTER | wx.ALL, 5)
         self.scrollwindow_action.SetSizer(bSizer_action)
         self.scrollwindow_action.Layout()
         bSizer_action.Fit(self.scrollwindow_action)
         self.scrollwindow_action.Show()
+        self.currentState = 2
 
     def remove_image(self, event):
-        self.previewImage.Destroy()
+        if self.previewImage is not None:
+            self.previewImage.Destroy()
+            self.previewImage = None
         self.scrollwindow_action.Hide()
         self.text_placeholder.Show()
         self.text_filepath.SetLabel('No image file choosen')
@@ -175,9 +358,175 @@ class frame_alpr(wx.Frame):
         if not self.imagepath:
             wx.MessageBox("Please open an image first.", "Error", wx.OK | wx.ICON_ERROR)
             return
-        # Pass the image path and the list control to execute_ALPR
-        full.execute_ALPR(self.imagepath, self.listResult)
-        self.enable_or_disable_buttons([self.btn_save], True)
+        self.submit_image(self.imagepath)
+
+    def new_job_id(self):
+        if not self.jobs:
+            # the pool was idle, a new run starts
+            self.stages_done = {}
+            self.failed_images = 0
+            self.run_start = time.perf_counter()
+        job_id = next(self.job_ids)
+        self.stages_done[job_id] = 0
+        return job_id
+
+    def add_job(self, job_id, job):
+        self.jobs[job_id] = job
+        job.future.add_done_callback(
+            lambda future: wx.CallAfter(self.on_recognized, job_id))
+
+    def submit_image(self, imagepath):
+        """
+        Queues an image for recognition on a worker thread, it gets its row
+        straight away, showing the progress until the result arrives.
+        """
+        job_id = self.new_job_id()
+        row_index = self.listResult.InsertItem(self.listResult.GetItemCount(), '')
+        self.listResult.SetItem(row_index, STATUS_COLUMN, 'Queued')
+
+        def progress(stage):
+            wx.CallAfter(self.on_progress, job_id, stage)
+
+        cancel_event = threading.Event()
+        future = self.executor.submit(self.full.recognize_image, imagepath, progress,
+                                      cancel_event)
+        self.add_job(job_id, AlprJob(imagepath, future, cancel_event, row_index))
+        self.update_progress()
+
+    def submit_folder(self, imagepaths):
+        """
+        Queues the images of a folder, they get their rows when they finish.
+        The pipeline is CPU bound, so they are recognized by the worker
+        processes of recognition.recognize_batch instead of the threads of
+        the executor, which would only take turns on the GIL.
+        """
+        cancel_event = threading.Event()
+        futures = []
+        for each_path in imagepaths:
+            future = Future()
+            self.add_job(self.new_job_id(), AlprJob(each_path, future, cancel_event,
+                                                    batch=True))
+            futures.append(future)
+        thread = threading.Thread(target=self.run_folder, name='alpr-folder',
+                                  args=(imagepaths, futures, cancel_event))
+        thread.daemon = True
+        thread.start()
+        self.update_progress()
+
+    def run_folder(self, imagepaths, futures, cancel_event):
+        """
+        runs on the folder thread: saves and looks up the plates the worker
+        processes recognize and completes the future of every image
+        """
+        full = self.full
+        finished = 0
+        error = None
+        try:
+            for result in self.recognition.recognize_batch(imagepaths, full.recognizer.model_path,
+                                          chunksize=BATCH_CHUNKSIZE,
+                                          cancel_event=cancel_event):
+                future = futures[finished]
+                finished += 1
+                # False when the image was cancelled
+                if future.set_running_or_notify_cancel():
+                    future.set_result(full.finish_recognition(result))
+        except Exception as e:
+            error = e
+        for future in futures[finished:]:
+            if future.set_running_or_notify_cancel():
+                future.set_exception(error or RuntimeError('The image was not recognized'))
+
+    def on_progress(self, job_id, stage):
+        if self.closing or job_id not in self.jobs:
+            return
+        self.stages_done[job_id] = self.recognition.STAGES.index(stage)
+        job = self.jobs[job_id]
+        if job.row_index is not None:
+            self.listResult.SetItem(job.row_index, STATUS_COLUMN, stage.capitalize() + '...')
+        self.update_progress()
+
+    def on_recognized(self, job_id):
+        if self.closing or job_id not in self.jobs:
+            return
+        job = self.jobs.pop(job_id)
+        self.stages_done[job_id] = len(self.recognition.STAGES)
+        # message boxes would stop a folder run on every image
+        show_dialogs = not job.batch
+
+        result = None
+        if job.future.cancelled():
+            status = 'Cancelled'
+        else:
+            try:
+                result, vehicle_info, errors = job.future.result()
+            except Exception as e:
+                status = 'Failed'
+                if show_dialogs:
+                    wx.MessageBox(f"Error during recognition: {str(e)}",
+                                  "Recognition Error", wx.OK | wx.ICON_ERROR)
+            else:
+                if result.cancelled:
+                    status = 'Cancelled'
+                else:
+                    if job.row_index is None and result.success:
+                        job.row_index = self.listResult.InsertItem(
+                            self.listResult.GetItemCount(), '')
+                    if self.full.display_result(result, vehicle_info, errors,
+                                                self.listResult, job.row_index,
+                                                show_dialogs):
+                        status = 'Done'
+                        self.enable_or_disable_buttons([self.btn_save], True)
+                    else:
+                        status = 'Failed: ' + result.error[0]
+
+        if job.batch and job.row_index is None:
+            # only plates get a row, a row without one would end up in the
+            # saved CSV
+            if status != 'Cancelled':
+                self.failed_images += 1
+                print('{}: {}'.format(job.imagepath, status))
+        elif job.batch:
+            status += ' ({})'.format(os.path.basename(job.imagepath))
+            if self.menuitem_batch_preview.IsChecked():
+                self.showPreviewImage(job.imagepath)
+        if job.row_index is not None:
+            self.listResult.SetItem(job.row_index, STATUS_COLUMN, status)
+        self.update_progress()
+
+    def update_progress(self):
+        """
+        the gauge and the throughput cover every image queued since the
+        pool was last idle
+        """
+        stages = len(self.recognition.STAGES)
+        self.gauge_progress.SetRange(max(1, stages * len(self.stages_done)))
+        self.gauge_progress.SetValue(sum(self.stages_done.values()))
+        self.enable_or_disable_buttons([self.btn_cancel], bool(self.jobs))
+
+        finished = len(self.stages_done) - len(self.jobs)
+        elapsed = time.perf_counter() - self.run_start
+        throughput = finished / elapsed if elapsed > 0 else 0.0
+        failed = ''
+        if self.failed_images:
+            failed = ' ({} without a plate, see the console)'.format(self.failed_images)
+        self.text_throughput.SetLabel('{} of {} images{}, {:.2f} images/sec'.format(
+            finished, len(self.stages_done), failed, throughput))
+        self.panel_result.Layout()
+
+    def cancel_alpr(self, event):
+        """
+        cancels every queued image and stops the running ones before
+        their next stage
+        """
+        for job in list(self.jobs.values()):
+            job.cancel_event.set()
+            job.future.cancel()
+
+    def on_close(self, event):
+        self.closing = True
+        self.cancel_alpr(event)
+        self.executor.shutdown(wait=False)
+        event.Skip()
 
     def save_results(self, event):
         with wx.FileDialog(self, "Save CSV file", wildcard="CSV files (*.csv)|*.csv",
@@ -195,6 +544,10 @@ class frame_alpr(wx.Frame):
                     writer.writerow(["PLATE TEXT", "OWNER", "ISSUE DATE", "EXPIRY DATE", "CHASIS", "TYPE"])
                     for row in range(self.listResult.GetItemCount()):
                         row_data = [self.listResult.GetItem(row, col).GetText() for col in range(6)]
+                        # the row of an image that failed or was cancelled
+                        # only shows its status
+                        if not row_data[0]:
+                            continue
                         writer.writerow(row_data)
                 wx.MessageBox("File saved successfully!", "Info", wx.OK | wx.ICON_INFORMATION)
             except IOError:
@@ -0,0 +1,361 @@
+"""
+Aggregated runtime metrics of the recognition service.
+
+A MetricsRegistry holds counters, gauges and histograms and renders them in
+the Prometheus text exposition format, either to a file (write) or on a
+local HTTP endpoint (serve). record_result adds the outcome and the stage
+timings (see profiling) of a RecognitionResult to the registry; histograms
+also keep a window of the latest observations for percentiles.
+
+    metrics.record_result(result)
+    metrics.registry.write('alpr.prom')
+"""
+import os
+import bisect
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import modelregistry
+
+# stage latency buckets in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0)
+
+# percentiles reported from the window of latest observations
+DEFAULT_QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+# error title of RecognitionError -> pipeline stage that failed
+FAILED_STAGES = {
+    'Preprocessing Error': 'preprocess',
+    'Plate Localization': 'localization',
+    'OCR Error': 'segmentation',
+    'Character Segmentation': 'segmentation',
+    'Model Error': 'classification',
+    'Classification Error': 'classification',
+    'Recognition Error': 'reconstruction',
+    'Cancelled': 'cancelled'
+}
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\')
+        .replace('"', '\\"').replace('\n', '\\n')) for name, value in labels) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric():
+
+    metric_type = 'untyped'
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.lock = threading.Lock()
+
+    def header(self):
+        return ['# HELP {} {}'.format(self.name, self.help_text),
+            '# TYPE {} {}'.format(self.name, self.metric_type)]
+
+
+class Counter(Metric):
+
+    metric_type = 'counter'
+
+    def __init__(self, name, help_text, function=None):
+        """
+        function: optional callable returning an amount counted elsewhere
+            (e.g. by the model registry), added to the value without labels
+            at render time
+        """
+        Metric.__init__(self, name, help_text)
+        self.values = {}
+        self.function = function
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def current_values(self):
+        with self.lock:
+            values = dict(self.values)
+        if self.function is not None:
+            values[()] = values.get((), 0) + self.function()
+        return values
+
+    def value(self, **labels):
+        return self.current_values().get(tuple(sorted(labels.items())), 0)
+
+    def render(self):
+        values = sorted(self.current_values().items())
+        return self.header() + ['{}{} {}'.format(self.name, format_labels(key),
+            format_value(value)) for key, value in values]
+
+
+class Gauge(Counter):
+
+    metric_type = 'gauge'
+
+    def __init__(self, name, help_text, function=None):
+        """
+        function: optional callable returning the value, read at render time
+        """
+        Counter.__init__(self, name, help_text, function)
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[tuple(sorted(labels.items()))] = value
+
+    def current_values(self):
+        if self.function is not None:
+            self.set(self.function())
+        with self.lock:
+            return dict(self.values)
+
+
+class Histogram(Metric):
+
+    metric_type = 'histogram'
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS,
+            window=1024, quantiles=DEFAULT_QUANTILES):
+        """
+        Parameters:
+        -----------
+        buckets: upper bounds of the cumulative buckets
+        window: int; number of latest observations kept for the percentiles
+        quantiles: the percentiles exported as <name>_recent gauges
+        """
+        Metric.__init__(self, name, help_text)
+        self.buckets = tuple(sorted(buckets))
+        self.window = window
+        self.quantiles = quantiles
+        self.series = {}
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {'counts': [0] * (len(self.buckets) + 1),
+                    'sum': 0.0, 'count': 0, 'recent': deque(maxlen=self.window)}
+            series['counts'][bisect.bisect_left(self.buckets, value)] += 1
+            series['sum'] += value
+            series['count'] += 1
+            series['recent'].append(value)
+
+    def percentile(self, quantile, **labels):
+        """
+        percentile of the latest observations or None without any
+        """
+        with self.lock:
+            series = self.series.get(tuple(sorted(labels.items())))
+            recent = sorted(series['recent']) if series else []
+        if not recent:
+            return None
+        return recent[min(len(recent) - 1, int(quantile * len(recent)))]
+
+    def count(self, **labels):
+        series = self.series.get(tuple(sorted(labels.items())))
+        return series['count'] if series else 0
+
+    def render(self):
+        lines = self.header()
+        quantile_lines = ['# HELP {}_recent {} (latest {} observations)'.format(
+            self.name, self.help_text, self.window),
+            '# TYPE {}_recent gauge'.format(self.name)]
+        with self.lock:
+            series = sorted((key, dict(value, counts=list(value['counts']),
+                recent=sorted(value['recent']))) for key, value in self.series.items())
+        for key, each in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), each['counts']):
+                cumulative += bucket_count
+                lines.append('{}_bucket{} {}'.format(self.name,
+                    format_labels(key + (('le', format_value(bound)),)), cumulative))
+            lines.append('{}_sum{} {}'.format(self.name, format_labels(key),
+                format_value(each['sum'])))
+            lines.append('{}_count{} {}'.format(self.name, format_labels(key),
+                each['count']))
+            recent = each['recent']
+            for quantile in self.quantiles:
+                if recent:
+                    value = recent[min(len(recent) - 1, int(quantile * len(recent)))]
+                    quantile_lines.append('{}_recent{} {}'.format(self.name,
+                        format_labels(key + (('quantile', str(quantile)),)),
+                        format_value(value)))
+        return lines + quantile_lines
+
+
+class MetricsRegistry():
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        with self.lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help_text, function=None):
+        return self.register(Counter(name, help_text, function))
+
+    def gauge(self, name, help_text, function=None):
+        return self.register(Gauge(name, help_text, function))
+
+    def histogram(self, name, help_text, **kwargs):
+        return self.register(Histogram(name, help_text, **kwargs))
+
+    def render(self):
+        """
+        all the metrics in the Prometheus text format
+        """
+        with self.lock:
+            metrics = [self.metrics[name] for name in sorted(self.metrics)]
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def write(self, filename):
+        """
+        writes render() to filename, replacing it in one step so a reader
+        never sees half a file
+        """
+        temporary_path = filename + '.tmp'
+        with open(temporary_path, 'w') as f:
+            f.write(self.render())
+        os.replace(temporary_path, filename)
+
+    def serve(self, port=9100, host='127.0.0.1'):
+        """
+        Serves render() on http://host:port/metrics from a daemon thread
+
+        Returns:
+        --------
+        the ThreadingHTTPServer, call its shutdown() to stop it
+        """
+        metrics_registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = metrics_registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        thread = threading.Thread(target=server.serve_forever, name='alpr-metrics')
+        thread.daemon = True
+        thread.start()
+        return server
+
+
+class PipelineMetrics():
+
+    def __init__(self, metrics_registry):
+        """
+        The metrics of the recognition pipeline in metrics_registry
+        """
+        self.images = metrics_registry.counter('alpr_images_processed_total',
+            'Images run through the recognition pipeline')
+        self.plates_found = metrics_registry.counter('alpr_plates_found_total',
+            'Images with a recognized plate')
+        self.plates_not_found = metrics_registry.counter('alpr_plates_not_found_total',
+            'Images without a recognized plate by failed stage')
+        self.characters = metrics_registry.counter('alpr_characters_classified_total',
+            'Characters classified by the model')
+        self.fallbacks = metrics_registry.counter('alpr_template_fallbacks_total',
+            'Characters checked again with template matching')
+        self.stage_seconds = metrics_registry.histogram('alpr_stage_seconds',
+            'Wall time of a pipeline stage per image')
+        self.image_seconds = metrics_registry.histogram('alpr_image_seconds',
+            'Wall time of the whole pipeline per image')
+        self.lookups = metrics_registry.counter('alpr_vehicle_lookups_total',
+            'Vehicle registry lookups by outcome (exact, fuzzy, miss)')
+        # the lookups of this process come from its model registry, the ones
+        # of the batch worker processes are added by record_model_cache
+        self.model_cache_hits = metrics_registry.counter(
+            'alpr_model_cache_hits_total',
+            'Model registry lookups served from memory',
+            lambda: modelregistry.registry.hits)
+        self.model_cache_misses = metrics_registry.counter(
+            'alpr_model_cache_misses_total',
+            'Model registry lookups that read the model file',
+            lambda: modelregistry.registry.misses)
+
+
+# the registry of this process
+registry = MetricsRegistry()
+pipeline = PipelineMetrics(registry)
+
+
+def record_result(result, metrics=None):
+    """
+    Adds a RecognitionResult to the pipeline metrics
+
+    Parameters:
+    -----------
+    result: RecognitionResult
+    metrics: PipelineMetrics (default: the one of the process registry)
+    """
+    metrics = metrics or pipeline
+    metrics.images.inc()
+    if result.success:
+        metrics.plates_found.inc()
+    else:
+        title = result.error[0] if result.error else 'Recognition Error'
+        metrics.plates_not_found.inc(stage=FAILED_STAGES.get(title, 'other'))
+
+    trace = result.trace
+    metrics.characters.inc(trace.counts.get('characters', 0))
+    metrics.fallbacks.inc(trace.counts.get('template_fallbacks', 0))
+    for name in trace.stages:
+        metrics.stage_seconds.observe(trace.seconds(name), stage=name)
+    metrics.image_seconds.observe(trace.elapsed_ns / 1e9)
+
+
+def record_model_cache(hits, misses, metrics=None):
+    """
+    Adds the model registry lookups of a batch worker process, which the
+    registry of this process does not see
+    """
+    metrics = metrics or pipeline
+    metrics.model_cache_hits.inc(hits)
+    metrics.model_cache_misses.inc(misses)
+
+
+def record_lookup(vehicle_info, metrics=None):
+    """
+    Adds the outcome of DBConnection.get_vehicle_info to the metrics
+    """
+    metrics = metrics or pipeline
+    if not vehicle_info:
+        metrics.lookups.inc(outcome='miss')
+    elif 'distance' in vehicle_info:
+        metrics.lookups.inc(outcome='fuzzy')
+    else:
+        metrics.lookups.inc(outcome='exact')
@@ -0,0 +1,212 @@
+"""
+Compares the candidate classifiers for DeepMachineLearning on speed as well
+as accuracy.
+
+Every (model, fold) pair of a stratified k-fold split is evaluated on a
+process pool; each worker reads the (cached) training data once. For every
+model the runner reports the mean accuracy, the fit time, the batch predict
+throughput, the latency of classifying a single glyph and the size of the
+pickled model.
+
+Usage:
+    python compare_models.py --folds 4 --workers 4 --output comparison.json
+"""
+import sys
+import json
+import time
+import pickle
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.svm import SVC
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.naive_bayes import GaussianNB
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import StratifiedKFold
+
+from ml_config import MachineLearningConfig
+
+# glyphs classified one at a time for the single glyph latency
+LATENCY_SAMPLES = 50
+
+
+def candidate_models():
+    """
+    name -> function building an untrained model, the classifiers
+    model_comparison2 always compared plus the one the application uses
+    """
+    return {
+        'linearsvm (probability)': lambda: SVC(kernel='linear', probability=True,
+            random_state=42),
+        'linearsvm': lambda: SVC(kernel='linear'),
+        'rbfsvm': lambda: SVC(kernel='rbf'),
+        'Polynomial SVM': lambda: SVC(kernel='poly'),
+        '3-neighbor': lambda: KNeighborsClassifier(n_neighbors=3),
+        '4-neighbor': lambda: KNeighborsClassifier(n_neighbors=4),
+        '5 neighbors': lambda: KNeighborsClassifier(n_neighbors=5),
+        'Gaussian Naive Bayes': lambda: GaussianNB(),
+        'Decision Tree': lambda: DecisionTreeClassifier(random_state=42),
+        'Random Forest': lambda: RandomForestClassifier(random_state=42)
+    }
+
+
+# training data of a worker process, read once by _init_worker
+_image_data = None
+_target_data = None
+
+
+def _init_worker(training_directory):
+    global _image_data, _target_data
+    config = MachineLearningConfig()
+    _image_data, _target_data = config.read_training_data(training_directory)
+
+
+def evaluate_fold(task):
+    """
+    Fits one model on one fold and measures it
+
+    Parameters:
+    -----------
+    task: tuple of (model name, fold index, train indices, test indices)
+
+    Returns:
+    --------
+    dict of the measurements
+    """
+    model_name, fold, train_index, test_index = task
+    model = candidate_models()[model_name]()
+    img_train, target_train = _image_data[train_index], _target_data[train_index]
+    img_test, target_test = _image_data[test_index], _target_data[test_index]
+
+    start = time.perf_counter()
+    model.fit(img_train, target_train)
+    fit_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    prediction = model.predict(img_test)
+    batch_time = time.perf_counter() - start
+
+    # DeepMachineLearning asks for the probabilities when the model has them
+    classify = model.predict_proba if hasattr(model, 'predict_proba') else model.predict
+    latencies = []
+    for glyph in img_test[:LATENCY_SAMPLES]:
+        glyph = glyph.reshape(1, -1)
+        start = time.perf_counter()
+        classify(glyph)
+        latencies.append(time.perf_counter() - start)
+
+    return {
+        'model': model_name,
+        'fold': fold,
+        'accuracy': float(np.mean(prediction == target_test)),
+        'fit_seconds': fit_time,
+        'glyphs_per_second': len(img_test) / batch_time if batch_time else float('inf'),
+        'single_glyph_ms': float(np.median(latencies)) * 1e3,
+        'size_kib': len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)) / 1024.0
+    }
+
+
+def summarize(fold_results):
+    """
+    Averages the fold results of every model
+
+    Returns:
+    --------
+    list of dicts, most accurate model first
+    """
+    by_model = {}
+    for each in fold_results:
+        by_model.setdefault(each['model'], []).append(each)
+
+    summary = []
+    for model_name, results in by_model.items():
+        accuracies = [each['accuracy'] for each in results]
+        summary.append({
+            'model': model_name,
+            'folds': len(results),
+            'accuracy': float(np.mean(accuracies)),
+            'accuracy_std': float(np.std(accuracies)),
+            'fit_seconds': float(np.mean([each['fit_seconds'] for each in results])),
+            'glyphs_per_second': float(np.mean([each['glyphs_per_second']
+                for each in results])),
+            'single_glyph_ms': float(np.median([each['single_glyph_ms']
+                for each in results])),
+            'size_kib': float(np.mean([each['size_kib'] for each in results]))
+        })
+    summary.sort(key=lambda each: (-each['accuracy'], each['single_glyph_ms']))
+    return summary
+
+
+def compare_models(training_directory, model_names=None, folds=4, workers=None,
+        seed=42):
+    """
+    Evaluates every (model, fold) pair on a process pool
+
+    Parameters:
+    -----------
+    training_directory: str; the training data directory
+    model_names: list of the candidate_models to compare (default: all)
+    folds: int; number of stratified folds
+    workers: int; number of processes (default: number of cores)
+    seed: int; seed of the fold split
+
+    Returns:
+    --------
+    a tuple containing
+    0: list of the summary of every model (see summarize)
+    1: list of the result of every (model, fold) pair
+    """
+    config = MachineLearningConfig()
+    image_data, target_data = config.read_training_data(training_directory)
+    model_names = model_names or list(candidate_models())
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    splits = list(splitter.split(image_data, target_data))
+    tasks = [(model_name, fold, train_index, test_index)
+        for model_name in model_names
+        for fold, (train_index, test_index) in enumerate(splits)]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+            initargs=(training_directory,)) as executor:
+        fold_results = list(executor.map(evaluate_fold, tasks))
+    return summarize(fold_results), fold_results
+
+
+def print_summary(summary):
+    print('{:<24} {:>9} {:>9} {:>12} {:>11} {:>10}'.format('model', 'accuracy',
+        'fit s', 'glyphs/s', 'glyph ms', 'size KiB'))
+    print('-' * 80)
+    for each in summary:
+        print('{:<24} {:>8.2f}% {:>9.3f} {:>12.0f} {:>11.3f} {:>10.1f}'.format(
+            each['model'], each['accuracy'] * 100, each['fit_seconds'],
+            each['glyphs_per_second'], each['single_glyph_ms'], each['size_kib']))
+
+
+def main(argv=None):
+    config = MachineLearningConfig()
+    parser = argparse.ArgumentParser(
+        description='Compare classifiers on accuracy, speed and size')
+    parser.add_argument('--training-directory', default=config.training_data[0],
+        help='training data directory (default: the 20X20 set)')
+    parser.add_argument('--models', nargs='+', default=None,
+        choices=list(candidate_models()), help='models to compare (default: all)')
+    parser.add_argument('--folds', type=int, default=4,
+        help='number of cross validation folds')
+    parser.add_argument('--workers', type=int, default=None,
+        help='number of worker processes (default: number of cores)')
+    parser.add_argument('--output', default=None,
+        help='JSON file for the summary and the fold results')
+    args = parser.parse_args(argv)
+
+    summary, fold_results = compare_models(args.training_directory, args.models,
+        args.folds, args.workers)
+    print_summary(summary)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'summary': summary, 'folds': fold_results}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,8 @@
 import os
+import hashlib
+import tempfile
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from skimage.io import imread
 from skimage.filters import threshold_otsu
 import joblib  # Fixed import here
@@ -22,6 +25,9 @@ class MachineLearningConfig():
 
         self.ascertain_characters = {'2', 'Z', 'B', '8', 'D', '0', '5', 'S'}
 
+        # binarized training sets are cached here, see read_training_data
+        self.cache_directory = os.path.join(root_directory, 'training_data', '.cache')
+
     def get_root_directory(self):
         """
         gets the main app root directory
@@ -31,14 +37,21 @@ class MachineLearningConfig():
         root_directory = dir_split[0]
         return root_directory
 
-    def read_training_data(self, training_directory):
+    def read_training_data(self, training_directory, use_cache=True, workers=None):
         """
         Reads each of the training data, thresholds it and appends it
         to a List that is converted to numpy array
 
+        The images are decoded on a thread pool and the result is cached in
+        cache_directory as a bit-packed .npz file, which is read instead as
+        long as the names, sizes and modification times of the images are
+        unchanged.
+
         Parameters:
         -----------
         training_directory: str; of the training directory
+        use_cache: bool; read and write the cache
+        workers: int; number of decoding threads (default: number of cores)
 
         Returns:
         --------
@@ -46,20 +59,84 @@ class MachineLearningConfig():
         0: 2D numpy array of the training data with its features in 1D
         1: 1D numpy array of the labels (classifications)
         """
-
-        image_data = []
+        image_paths = []
         target_data = []
         for each_letter in self.letters:
             for each in range(10):
-                #training_data[1] is for 10X20 training data images
-                img_details = imread(training_directory+'/'+each_letter+'/'+each_letter+'_'+str(each)+'.jpg', as_gray=True)
-                binary_image = img_details < threshold_otsu(img_details)
-                flat_bin_image = binary_image.reshape(-1)
-                image_data.append(flat_bin_image)
+                image_paths.append(os.path.join(training_directory, each_letter,
+                    each_letter+'_'+str(each)+'.jpg'))
                 target_data.append(each_letter)
+        target_data = np.array(target_data)
+
+        cache_path = self.training_cache_path(training_directory)
+        signature = self.training_signature(image_paths)
+        if use_cache:
+            cached = self.read_training_cache(cache_path, signature)
+            if cached is not None:
+                return cached
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            image_data = np.array(list(executor.map(self.read_training_image,
+                image_paths)))
 
-        return (np.array(image_data), np.array(target_data))
+        if use_cache:
+            self.write_training_cache(cache_path, signature, image_data, target_data)
+        return (image_data, target_data)
 
+    def read_training_image(self, image_path):
+        img_details = imread(image_path, as_gray=True)
+        binary_image = img_details < threshold_otsu(img_details)
+        return binary_image.reshape(-1)
+
+    def training_cache_path(self, training_directory):
+        name = os.path.basename(os.path.normpath(training_directory))
+        return os.path.join(self.cache_directory, name+'.npz')
+
+    def training_signature(self, image_paths):
+        """
+        hash of the names, sizes and modification times of the images
+        """
+        digest = hashlib.sha1()
+        for image_path in image_paths:
+            stat = os.stat(image_path)
+            digest.update('{}:{}:{};'.format(image_path, stat.st_size,
+                stat.st_mtime_ns).encode('utf-8'))
+        return digest.hexdigest()
+
+    def read_training_cache(self, cache_path, signature):
+        """
+        the cached (image_data, target_data) or None when the cache is
+        missing or outdated
+        """
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with np.load(cache_path) as cached:
+                if str(cached['signature']) != signature:
+                    return None
+                image_data = np.unpackbits(cached['packed'], axis=1,
+                    count=int(cached['features'])).astype(bool)
+                return (image_data, cached['labels'])
+        except (OSError, ValueError, KeyError):
+            # unreadable cache, it is rebuilt
+            return None
+
+    def write_training_cache(self, cache_path, signature, image_data, target_data):
+        os.makedirs(self.cache_directory, exist_ok=True)
+        # a temporary file of its own, several training processes may
+        # rebuild the same cache at once
+        descriptor, temporary_path = tempfile.mkstemp(suffix='.tmp.npz',
+            dir=os.path.dirname(cache_path))
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                np.savez(f, packed=np.packbits(image_data, axis=1),
+                    features=image_data.shape[1], labels=target_data,
+                    signature=np.array(signature))
+            os.replace(temporary_path, cache_path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
 
     def save_model(self, model, foldername):
         """
@@ -69,13 +146,25 @@ class MachineLearningConfig():
         Parameters:
         -----------
         model: the machine learning model object
-        foldername: str; of the folder to save the model
+        foldername: str; of the folder to save the model, the file is
+            ml_models/<foldername>/<foldername>.pkl
         """
-        save_directory = os.path.join(self.get_root_directory(), 'ml_models/'+foldername+'/')
+        save_directory = os.path.join(self.get_root_directory(), 'ml_models', foldername)
         if not os.path.exists(save_directory):
             os.makedirs(save_directory)
-        joblib.dump(model, save_directory+'/'+foldername+'.pkl')
+        joblib.dump(model, os.path.join(save_directory, foldername+'.pkl'))
 
     def dimension_reduction(self, train_data, number_of_components):
-        pca = PCA(number_of_components)
-        return pca.fit_transform(train_data)
+        """
+        fits a PCA of number_of_components on the training data
+
+        Returns:
+        --------
+        a tuple containing
+        0: the fitted PCA, saved with the classifier so the glyphs are
+            reduced the same way at inference (see modelbundle.save_bundle)
+        1: 2D numpy array of the reduced training data
+        """
+        pca = PCA(number_of_components, random_state=42)
+        reduced = pca.fit_transform(train_data)
+        return (pca, reduced)
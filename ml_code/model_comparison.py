@@ -2,7 +2,7 @@ import numpy as np
 from sklearn.svm import SVC
 from sklearn.neighbors import KNeighborsClassifier
 from ml_config import MachineLearningConfig
-from sklearn.cross_validation import train_test_split
+from sklearn.model_selection import train_test_split
 from ml_validation import AccuracyValidation
 import templatematching
 
@@ -28,35 +28,36 @@ models = {
 img_train, img_test, target_train, target_test = train_test_split(image_data,
     target_data, test_size=0.4, train_size=0.6)
 
-prediction2dlist = []
+predictions = {}
 
 for a_model_name, a_model in models.items():
-    print a_model_name
-    print '-------------------------------'
+    print(a_model_name)
+    print('-------------------------------')
     a_model.fit(img_train, target_train)
     prediction = a_model.predict(img_test)
-    prediction2dlist.append(prediction)
+    predictions[a_model_name] = prediction
     accuracy = (float(np.sum(prediction == target_test)) / len(target_test))
-    print str(round(accuracy * 100, 2))+ "% accuracy was recorded"
-    print '-------------------------------'
-
-num_of_test = len(img_test)
-
-for index in range(num_of_test):
-    if prediction2dlist[2][index] != target_test[index]:
-        print 'Based on LinearSVM'
-        print 'Actual Label : '+ target_test[index]+' Predicted Label: '+prediction2dlist[1][index]
-        for a_model_name in models:
-            print a_model_name
-            print '-------------------------------'
-            prob_predictions = models[a_model_name].predict_proba(
-                img_test[index].reshape(1, -1))
-            validate.top_predictions(prob_predictions)
-            print '-------------------------------'
-
-        if prediction2dlist[1][index] in config.ascertain_characters:
-            print 'Prediction by template matching'
-            print '-------------------------------'
-            print templatematching.template_match(prediction2dlist[1][index],
-                img_test[index], training_directory)
-            print '-------------------------------'
\ No newline at end of file
+    print(str(round(accuracy * 100, 2))+ "% accuracy was recorded")
+    print('-------------------------------')
+
+# the probabilities of every wrongly predicted glyph are computed with one
+# predict_proba call per model instead of one call per glyph
+wrong = np.flatnonzero(predictions['linearsvm'] != target_test)
+probabilities = dict((a_model_name, a_model.predict_proba(img_test[wrong]))
+    for a_model_name, a_model in models.items())
+
+for position, index in enumerate(wrong):
+    print('Based on LinearSVM')
+    print('Actual Label : '+ target_test[index]+' Predicted Label: '+predictions['linearsvm'][index])
+    for a_model_name in models:
+        print(a_model_name)
+        print('-------------------------------')
+        validate.top_predictions(probabilities[a_model_name][position])
+        print('-------------------------------')
+
+    if predictions['linearsvm'][index] in config.ascertain_characters:
+        print('Prediction by template matching')
+        print('-------------------------------')
+        print(templatematching.template_match(predictions['linearsvm'][index],
+            img_test[index], training_directory))
+        print('-------------------------------')
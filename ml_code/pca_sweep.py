@@ -0,0 +1,238 @@
+"""
+Sweeps the number of PCA components the glyphs are reduced to before the
+linear SVM of DeepMachineLearning.
+
+For every component count (and the raw 400 pixels) a PCA and an
+SVC(kernel='linear', probability=True) are fitted on each fold of a
+stratified k-fold split, on a process pool. The fitted pair is exported to
+the svmengine.LinearSVMEngine the application runs, whose accuracy and
+speed are measured one engine at a time in this process: the throughput of
+classifying the whole test fold and the latency of one plate of
+PLATE_GLYPHS glyphs. The smallest count whose accuracy is within the
+tolerance of the raw pixels is recommended and can be saved as the bundle
+the application loads.
+
+Usage:
+    python pca_sweep.py --components 10 20 40 80 --folds 4
+    python pca_sweep.py --save-bundle ../ml_models/SVC_bundle
+"""
+import os
+import sys
+import json
+import time
+import warnings
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.svm import SVC
+from sklearn.model_selection import StratifiedKFold
+
+from ml_config import MachineLearningConfig
+
+# svmengine and modelbundle live in the application root
+sys.path.append(MachineLearningConfig().get_root_directory())
+import svmengine
+import modelbundle
+
+DEFAULT_COMPONENTS = (10, 15, 20, 30, 40, 60, 80, 120)
+
+# glyphs of a plate, the batch size of the latency measurement
+PLATE_GLYPHS = 8
+
+# timed runs of every measurement
+REPEAT = 50
+
+
+def fit_model(image_data, target_data, components, config=None):
+    """
+    Fits the PCA (unless components is None) and the SVM
+
+    Returns:
+    --------
+    a tuple containing
+    0: the fitted SVC
+    1: the fitted PCA or None
+    """
+    config = config or MachineLearningConfig()
+    pca = None
+    if components is not None:
+        pca, image_data = config.dimension_reduction(image_data, components)
+    model = SVC(kernel='linear', probability=True, random_state=42)
+    with warnings.catch_warnings():
+        # probability=True is deprecated in recent scikit-learn
+        warnings.simplefilter('ignore', FutureWarning)
+        model.fit(image_data, target_data)
+    return model, pca
+
+
+# training data of a worker process, read once by _init_worker
+_image_data = None
+_target_data = None
+
+
+def _init_worker(training_directory):
+    global _image_data, _target_data
+    config = MachineLearningConfig()
+    _image_data, _target_data = config.read_training_data(training_directory)
+
+
+def fit_fold(task):
+    """
+    Fits one component count on one fold
+
+    Parameters:
+    -----------
+    task: tuple of (components, fold index, train indices, test indices)
+
+    Returns:
+    --------
+    dict with the fold and the arrays of the exported engine
+    """
+    components, fold, train_index, test_index = task
+    model, pca = fit_model(_image_data[train_index], _target_data[train_index],
+        components)
+    engine = svmengine.LinearSVMEngine.from_model(model, projection=pca)
+    return {'components': components, 'fold': fold, 'test_index': test_index,
+        'arrays': engine.to_arrays()}
+
+
+def median_ms(function, repeat=REPEAT):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1e3
+
+
+def measure_engine(engine, image_data, target_data):
+    """
+    accuracy and speed of an engine on a test fold
+    """
+    features = image_data.astype(np.float64)
+    plate = features[:PLATE_GLYPHS]
+    batch_ms = median_ms(lambda: engine.predict_proba(features))
+    return {
+        'accuracy': float(np.mean(engine.predict(features) == target_data)),
+        'glyphs_per_second': len(features) / (batch_ms / 1e3),
+        'plate_ms': median_ms(lambda: engine.predict_proba(plate)),
+        'size_kib': sum(each.nbytes for each in engine.to_arrays().values()) / 1024.0
+    }
+
+
+def sweep(training_directory, components=DEFAULT_COMPONENTS, folds=4,
+        workers=None, seed=42):
+    """
+    Fits every component count on every fold on a process pool and
+    measures the engines in this process
+
+    Returns:
+    --------
+    list of the summary of every component count, the raw pixels first
+    """
+    config = MachineLearningConfig()
+    image_data, target_data = config.read_training_data(training_directory)
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    splits = list(splitter.split(image_data, target_data))
+    counts = [None] + sorted(components)
+    tasks = [(each, fold, train_index, test_index) for each in counts
+        for fold, (train_index, test_index) in enumerate(splits)]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+            initargs=(training_directory,)) as executor:
+        fitted = list(executor.map(fit_fold, tasks))
+
+    by_count = {}
+    for each in fitted:
+        engine = svmengine.LinearSVMEngine.from_arrays(each['arrays'])
+        test_index = each['test_index']
+        by_count.setdefault(each['components'], []).append(measure_engine(engine,
+            image_data[test_index], target_data[test_index]))
+
+    summary = []
+    for each in counts:
+        results = by_count[each]
+        summary.append({
+            'components': each if each is not None else image_data.shape[1],
+            'pca': each is not None,
+            'accuracy': float(np.mean([result['accuracy'] for result in results])),
+            'glyphs_per_second': float(np.mean([result['glyphs_per_second']
+                for result in results])),
+            'plate_ms': float(np.median([result['plate_ms'] for result in results])),
+            'size_kib': float(np.mean([result['size_kib'] for result in results]))
+        })
+    return summary
+
+
+def recommend(summary, tolerance=0.0):
+    """
+    the smallest PCA component count whose accuracy is at most tolerance
+    below the raw pixels, None when every count loses more
+    """
+    baseline = summary[0]['accuracy']
+    for each in sorted(summary[1:], key=lambda each: each['components']):
+        if each['accuracy'] >= baseline - tolerance - 1e-9:
+            return each['components']
+    return None
+
+
+def print_summary(summary):
+    print('{:>10} {:>9} {:>12} {:>10} {:>10}'.format('components', 'accuracy',
+        'glyphs/s', 'plate ms', 'size KiB'))
+    print('-' * 55)
+    for each in summary:
+        print('{:>10} {:>8.2f}% {:>12.0f} {:>10.3f} {:>10.1f}'.format(
+            each['components'] if each['pca'] else 'raw', each['accuracy'] * 100,
+            each['glyphs_per_second'], each['plate_ms'], each['size_kib']))
+
+
+def main(argv=None):
+    config = MachineLearningConfig()
+    parser = argparse.ArgumentParser(
+        description='Accuracy and speed of the SVM for several PCA sizes')
+    parser.add_argument('--training-directory', default=config.training_data[0],
+        help='training data directory (default: the 20X20 set)')
+    parser.add_argument('--components', type=int, nargs='+',
+        default=list(DEFAULT_COMPONENTS), help='component counts to try')
+    parser.add_argument('--folds', type=int, default=4,
+        help='number of cross validation folds')
+    parser.add_argument('--workers', type=int, default=None,
+        help='number of worker processes (default: number of cores)')
+    parser.add_argument('--tolerance', type=float, default=0.0,
+        help='accuracy a recommended count may lose against the raw pixels')
+    parser.add_argument('--output', default=None,
+        help='JSON file for the summary')
+    parser.add_argument('--save-bundle', default=None,
+        help='fit the recommended count (or --save-components) on all the '
+            'training data and save it as a model bundle here')
+    parser.add_argument('--save-components', type=int, default=None,
+        help='with --save-bundle, the component count to save')
+    args = parser.parse_args(argv)
+
+    summary = sweep(args.training_directory, args.components, args.folds,
+        args.workers)
+    print_summary(summary)
+    best = recommend(summary, args.tolerance)
+    if best is None:
+        print('every component count loses accuracy, keep the raw pixels')
+    else:
+        print('recommended: {} components'.format(best))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'summary': summary, 'recommended': best}, f, indent=2)
+
+    if args.save_bundle:
+        components = args.save_components or best
+        image_data, target_data = config.read_training_data(args.training_directory)
+        model, pca = fit_model(image_data, target_data, components, config)
+        modelbundle.save_bundle(model, args.save_bundle, (20, 20),
+            modelbundle.training_data_hash(args.training_directory),
+            projection=pca)
+        print('saved {} to {}'.format('{} components'.format(components)
+            if components else 'the raw pixel model', args.save_bundle))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
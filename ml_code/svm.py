@@ -1,20 +1,40 @@
+import os
+import sys
 from sklearn.svm import SVC
 from ml_config import MachineLearningConfig
 from ml_validation import AccuracyValidation
 
 config = MachineLearningConfig()
 
+# modelbundle lives in the application root
+sys.path.append(config.get_root_directory())
+import modelbundle
+
 # Assuming read_training_data() returns a tuple (X, y)
 image_data, target_data = config.read_training_data(config.training_data[0])
 
+# Number of PCA components the glyphs are reduced to before the SVM, None
+# keeps the raw 400 pixels (see pca_sweep.py for picking a count)
+PCA_COMPONENTS = None
+
+pca = None
+if PCA_COMPONENTS:
+    pca, image_data = config.dimension_reduction(image_data, PCA_COMPONENTS)
+
 # Create the SVM model (linear kernel, probability=True for predict_proba)
 svc_model = SVC(kernel='linear', probability=True, random_state=42)
 
 # Train the model
 svc_model.fit(image_data, target_data)
 
-# Save the trained model (fix for loading issues by re-saving with current sklearn)
-config.save_model(svc_model, 'SVC_model.pkl')
+# Save the trained model, the bundle the application loads keeps the PCA
+# with it; the pickle for the comparison scripts only without PCA
+if pca is None:
+    config.save_model(svc_model, 'SVC_model')
+modelbundle.save_bundle(svc_model,
+    os.path.join(config.get_root_directory(), 'ml_models', 'SVC_bundle'),
+    (20, 20), modelbundle.training_data_hash(config.training_data[0]),
+    projection=pca)
 
 ###############################################
 # for validation and testing purposes
@@ -51,7 +51,7 @@ def fraction_match(label, training_dir, image_data):
     fraction = 0
     for i in range(10):
         image_dir = os.path.join(training_dir, label, label+'_'+str(i)+'.jpg')
-        image_sample = imread(image_dir, as_grey=True)
+        image_sample = imread(image_dir, as_gray=True)
         image_sample = image_sample < threshold_otsu(image_sample)
         match_fraction = match_template(image_data, image_sample)
 
@@ -0,0 +1,262 @@
+"""
+Versioned model bundles replacing the pickled models.
+
+A bundle is a directory holding a manifest.json and one .npy file per
+array of a svmengine.LinearSVMEngine:
+
+    SVC_bundle/
+        manifest.json   format version, labels, input size, preprocessing,
+                        training data hash and the shape of every array
+        coef.npy
+        intercept.npy
+        prob_a.npy
+        prob_b.npy
+        projection.npy          only for a model trained on PCA reduced
+        projection_offset.npy   glyphs (format version 2)
+
+load_bundle memory-maps the arrays read-only, so loading does not depend on
+the scikit-learn version, costs no unpickling and the worker processes of a
+batch share the same pages of the page cache.
+
+    python modelbundle.py ml_models/SVC_model/SVC_model.pkl ml_models/SVC_bundle \\
+        --training-directory training_data/train20X20
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+
+import numpy as np
+
+import svmengine
+
+# version 2 added the projection arrays, a bundle without them is still
+# written as version 1
+FORMAT_VERSION = 2
+MANIFEST = 'manifest.json'
+
+# the arrays of a LinearSVMEngine stored as .npy files, the labels are kept
+# in the manifest
+ARRAYS = ('coef', 'intercept', 'prob_a', 'prob_b')
+PROJECTION_ARRAYS = ('projection', 'projection_offset')
+
+# how DeepMachineLearning and MachineLearningConfig prepare a glyph
+DEFAULT_PREPROCESSING = {
+    'grayscale': True,
+    'threshold': 'otsu',
+    'foreground': 'below_threshold',
+    'flatten': 'row_major'
+}
+
+
+def is_bundle(path):
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+
+def manifest_path(path):
+    return os.path.join(path, MANIFEST)
+
+
+def read_manifest(path):
+    """
+    Returns:
+    --------
+    dict of the manifest of the bundle at path
+
+    Raises:
+    -------
+    ValueError if the bundle has a newer format than this code reads
+    """
+    with open(manifest_path(path)) as f:
+        manifest = json.load(f)
+    if manifest.get('format_version', 0) > FORMAT_VERSION:
+        raise ValueError('model bundle {} has format version {}, only {} '
+            'and older can be read'.format(path, manifest['format_version'],
+                FORMAT_VERSION))
+    return manifest
+
+
+def feature_count(engine):
+    """
+    number of pixels of a glyph the engine takes
+    """
+    weights = engine.coef if engine.projection is None else engine.projection
+    return weights.shape[1]
+
+
+def check_input(engine, input_size, preprocessing, path):
+    """
+    Raises:
+    -------
+    ValueError if glyphs of input_size do not give the features the engine
+    takes or the glyphs are prepared in a way DeepMachineLearning does not
+    """
+    pixels = int(np.prod(input_size))
+    if len(input_size) != 2 or pixels != feature_count(engine):
+        raise ValueError('model bundle {} takes {} features per glyph, its '
+            'input size {} gives {}'.format(path, feature_count(engine),
+                list(input_size), pixels))
+    steps = dict((name, value) for name, value in preprocessing.items()
+        if name != 'projection')
+    if steps != DEFAULT_PREPROCESSING:
+        raise ValueError('model bundle {} prepares the glyphs as {}, only {} '
+            'is supported'.format(path, steps, DEFAULT_PREPROCESSING))
+
+
+def training_data_hash(training_directory):
+    """
+    sha256 of the relative path and contents of every file of the training
+    data, identifying the data a model was trained on
+    """
+    digest = hashlib.sha256()
+    for directory, subdirectories, filenames in os.walk(training_directory):
+        subdirectories[:] = sorted(each for each in subdirectories
+            if not each.startswith('.'))
+        for filename in sorted(filenames):
+            file_path = os.path.join(directory, filename)
+            digest.update(os.path.relpath(file_path, training_directory)
+                .replace(os.sep, '/').encode('utf-8') + b'\0')
+            with open(file_path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def save_bundle(model, path, input_size=(20, 20), training_hash=None,
+        preprocessing=None, projection=None):
+    """
+    Writes a model as a bundle, the manifest is written last so a bundle
+    with a manifest is complete
+
+    Parameters:
+    -----------
+    model: a fitted linear SVC with probability=True or a LinearSVMEngine
+    path: str; the bundle directory, created when missing
+    input_size: tuple; size each character is resized to, its pixels must
+        be the features of the model
+    training_hash: str; see training_data_hash
+    preprocessing: dict describing how a glyph is prepared
+        (default: DEFAULT_PREPROCESSING)
+    projection: the fitted PCA the SVC was trained behind, when model is
+        an SVC
+
+    Returns:
+    --------
+    dict of the manifest
+
+    Raises:
+    -------
+    ValueError if the model does not fit input_size or preprocessing (see
+    check_input)
+    """
+    engine = model
+    if not isinstance(model, svmengine.LinearSVMEngine):
+        engine = svmengine.LinearSVMEngine.from_model(model, projection)
+    preprocessing = dict(preprocessing or DEFAULT_PREPROCESSING)
+    check_input(engine, input_size, preprocessing, path)
+    if not os.path.exists(path):
+        os.makedirs(path)
+
+    arrays = engine.to_arrays()
+    names = ARRAYS
+    if engine.projection is not None:
+        names = ARRAYS + PROJECTION_ARRAYS
+        preprocessing['projection'] = {'method': type(projection).__name__
+            if projection is not None else 'linear',
+            'components': len(engine.projection)}
+    array_entries = {}
+    for name in names:
+        array = np.ascontiguousarray(arrays[name], dtype=np.float64)
+        filename = name + '.npy'
+        temporary_path = os.path.join(path, filename + '.tmp')
+        with open(temporary_path, 'wb') as f:
+            np.save(f, array)
+        os.replace(temporary_path, os.path.join(path, filename))
+        array_entries[name] = {'file': filename, 'dtype': str(array.dtype),
+            'shape': list(array.shape)}
+
+    manifest = {
+        'format_version': 2 if engine.projection is not None else 1,
+        'model': 'linear_svm',
+        'labels': [str(each) for each in engine.classes_],
+        'input_size': list(input_size),
+        'preprocessing': preprocessing,
+        'training_data_sha256': training_hash,
+        'arrays': array_entries,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+    temporary_path = manifest_path(path) + '.tmp'
+    with open(temporary_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.write('\n')
+    os.replace(temporary_path, manifest_path(path))
+    return manifest
+
+
+def load_bundle(path, mmap=True):
+    """
+    Loads a bundle as a svmengine.LinearSVMEngine, its manifest is kept in
+    the manifest attribute
+
+    Parameters:
+    -----------
+    path: str; the bundle directory
+    mmap: bool; memory-map the arrays read-only instead of reading them
+
+    Raises:
+    -------
+    ValueError if the bundle is not a linear SVM of a known format, an
+    array does not match the manifest or the model does not take glyphs of
+    the input size and preprocessing of the manifest
+    """
+    manifest = read_manifest(path)
+    if manifest.get('model') != 'linear_svm':
+        raise ValueError('model bundle {} holds an unknown model {!r}'.format(
+            path, manifest.get('model')))
+
+    arrays = {'classes': np.array(manifest['labels'])}
+    names = ARRAYS
+    if 'projection' in manifest['arrays']:
+        names = ARRAYS + PROJECTION_ARRAYS
+    for name in names:
+        entry = manifest['arrays'][name]
+        array = np.load(os.path.join(path, entry['file']),
+            mmap_mode='r' if mmap else None, allow_pickle=False)
+        if list(array.shape) != entry['shape'] or str(array.dtype) != entry['dtype']:
+            raise ValueError('array {} of model bundle {} is {} {}, the manifest '
+                'expects {} {}'.format(name, path, array.dtype, list(array.shape),
+                    entry['dtype'], entry['shape']))
+        arrays[name] = array
+
+    engine = svmengine.LinearSVMEngine.from_arrays(arrays)
+    check_input(engine, manifest['input_size'],
+        manifest.get('preprocessing') or DEFAULT_PREPROCESSING, path)
+    engine.manifest = manifest
+    return engine
+
+
+def main(argv=None):
+    import modelregistry
+
+    parser = argparse.ArgumentParser(
+        description='Export a pickled linear SVC to a model bundle')
+    parser.add_argument('model', help='path of the pickled model')
+    parser.add_argument('bundle', help='directory of the bundle')
+    parser.add_argument('--training-directory', default=None,
+        help='training data of the model, its hash goes in the manifest')
+    parser.add_argument('--input-size', type=int, nargs=2, default=(20, 20),
+        help='size each character is resized to')
+    args = parser.parse_args(argv)
+
+    model = modelregistry.load_model_file(args.model, engine=False)
+    training_hash = None
+    if args.training_directory:
+        training_hash = training_data_hash(args.training_directory)
+    manifest = save_bundle(model, args.bundle, args.input_size, training_hash)
+    print('saved {} labels to {}'.format(len(manifest['labels']), args.bundle))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+Process wide cache of the classification models.
+
+A model is loaded once per process and kept in memory keyed by its path.
+The file modification time is checked on every lookup so a retrained model
+replaces the cached one without restarting the application.
+
+A model is either a modelbundle directory, memory-mapped as a
+svmengine.LinearSVMEngine, or a pickle. A pickled linear SVC is exported to
+a LinearSVMEngine as well, the rest of the pipeline only uses predict_proba
+and classes_.
+"""
+import os
+import sys
+import types
+import threading
+
+import svmengine
+import modelbundle
+
+
+def patch_legacy_modules():
+    """
+    Old scikit-learn pickles reference sklearn.externals.joblib and
+    sklearn.svm.classes which no longer exist, register stand-ins for them
+    """
+    # scikit-learn takes seconds to import, only pickles need it
+    import joblib
+    import sklearn.svm
+
+    # Patch for old scikit-learn pickled models expecting sklearn.externals.joblib
+    sys.modules.setdefault('sklearn.externals.joblib', joblib)
+
+    # Patch missing sklearn.svm.classes module to support old pickles
+    if 'sklearn.svm.classes' not in sys.modules:
+        classes = types.ModuleType('classes')
+        classes.SVC = sklearn.svm.SVC
+        classes.LinearSVC = sklearn.svm.LinearSVC
+        sys.modules['sklearn.svm.classes'] = classes
+
+
+def load_model_file(model_path, engine=True):
+    """
+    Loads a model bundle or unpickles a model from disk, bypassing the
+    registry
+
+    Parameters:
+    -----------
+    model_path: str; path of the bundle directory or the model file
+    engine: bool; return a pickled linear SVC as a svmengine.LinearSVMEngine
+    """
+    if modelbundle.is_bundle(model_path):
+        return modelbundle.load_bundle(model_path)
+    patch_legacy_modules()
+    import joblib
+    model = joblib.load(model_path)
+    if engine:
+        model = svmengine.compile_model(model)
+    return model
+
+
+def model_mtime(model_path):
+    """
+    modification time of the model file, the manifest of a bundle
+    """
+    if modelbundle.is_bundle(model_path):
+        return os.path.getmtime(modelbundle.manifest_path(model_path))
+    return os.path.getmtime(model_path)
+
+
+class ModelRegistry():
+
+    def __init__(self, loader=load_model_file):
+        """
+        Parameters:
+        -----------
+        loader: function that takes a path and returns the loaded model
+        """
+        self.loader = loader
+        self.models = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get_model(self, model_path):
+        """
+        Returns the model stored at model_path, loading it only on the first
+        request or when the file changed since it was loaded.
+
+        Parameters:
+        -----------
+        model_path: str; path of the model file or bundle directory
+
+        Returns:
+        --------
+        the model object
+        """
+        key = os.path.realpath(model_path)
+        mtime = model_mtime(key)
+        with self.lock:
+            cached = self.models.get(key)
+            if cached is not None and cached[0] == mtime:
+                self.hits += 1
+                return cached[1]
+
+            self.misses += 1
+            model = self.loader(key)
+            self.models[key] = (mtime, model)
+            return model
+
+    def preload(self, model_paths):
+        """
+        Loads the models up front, e.g. at application startup
+        """
+        for each_path in model_paths:
+            self.get_model(each_path)
+
+    def evict(self, model_path=None):
+        """
+        Drops one model (or every model when model_path is None)
+        """
+        with self.lock:
+            if model_path is None:
+                self.models.clear()
+            else:
+                self.models.pop(os.path.realpath(model_path), None)
+
+
+# registry shared by everything running in this process
+registry = ModelRegistry()
+
+
+def get_model(model_path):
+    return registry.get_model(model_path)
+
+
+def preload(model_paths):
+    registry.preload(model_paths)
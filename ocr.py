@@ -1,13 +1,14 @@
 import numpy as np
+from scipy import ndimage
 from skimage.transform import resize
 from skimage import measure
 from skimage.measure import regionprops
 
 class OCROnObjects():
     
-    def __init__(self, license_plate):
+    def __init__(self, license_plate, glyph_dtype=None):
         character_objects = self.identify_boundary_objects(license_plate)
-        self.get_regions(character_objects, license_plate)
+        self.get_regions(character_objects, license_plate, glyph_dtype)
         
     def identify_boundary_objects(self, a_license_plate):
         labelImage = measure.label(a_license_plate)
@@ -16,7 +17,7 @@ class OCROnObjects():
         regionLists = regionprops(labelImage)
         return regionLists
     
-    def get_regions(self, character_objects, a_license_plate):
+    def get_regions(self, character_objects, a_license_plate, glyph_dtype=None):
         """
         used to map out regions where the license plate charcters are 
         the principle of connected component analysis and labelling
@@ -25,6 +26,9 @@ class OCROnObjects():
         Parameters:
         -----------
         a_license_plate: 2D numpy binary image of the license plate
+        glyph_dtype: dtype of the character images, default is bool for a
+            binary plate and float64 otherwise. bool or uint8 give binary
+            (0 or 1) characters for any plate
 
         Returns:
         --------
@@ -33,38 +37,64 @@ class OCROnObjects():
         columnsVal: 1D array the starting column of each character
         coordinates:
         """
-        cord = []
-        counter=0
-        column_list = []
         character_dimensions = (0.35*a_license_plate.shape[0], 0.60*a_license_plate.shape[0], 0.05*a_license_plate.shape[1], 0.15*a_license_plate.shape[1])
         minHeight, maxHeight, minWidth, maxWidth = character_dimensions
-        for regions in character_objects:
-            minimumRow, minimumCol, maximumRow, maximumCol = regions.bbox
-            character_height = maximumRow - minimumRow
-            character_width = maximumCol - minimumCol
-            roi = a_license_plate[minimumRow:maximumRow, minimumCol:maximumCol]
-            if character_height > minHeight and character_height < maxHeight and character_width > minWidth and character_width < maxWidth:
-                if counter == 0:
-                    samples = resize(roi, (20,20))
-                    cord.append(regions.bbox)
-                    counter += 1
-                elif counter == 1:
-                    roismall = resize(roi, (20,20))
-                    samples = np.concatenate((samples[None,:,:], roismall[None,:,:]), axis=0)
-                    cord.append(regions.bbox)
-                    counter+=1
-                else:
-                    roismall = resize(roi, (20,20))
-                    samples = np.concatenate((samples[:,:,:], roismall[None,:,:]), axis=0)
-                    cord.append(regions.bbox)
-                column_list.append(minimumCol)
-        if len(column_list) == 0:
+
+        # filter all the bounding boxes first so only the characters are
+        # resized
+        cord = np.array([regions.bbox for regions in character_objects],
+            dtype=np.intp).reshape(-1, 4)
+        character_height = cord[:, 2] - cord[:, 0]
+        character_width = cord[:, 3] - cord[:, 1]
+        is_character = ((character_height > minHeight) & (character_height < maxHeight) &
+            (character_width > minWidth) & (character_width < maxWidth))
+        cord = cord[is_character]
+
+        if len(cord) == 0:
             self.candidates = {}
         else:
             self.candidates = {
-                        'fullscale': samples,
-                        'coordinates': np.array(cord),
-                        'columnsVal': column_list
+                        'fullscale': self.normalize_characters(a_license_plate, cord, glyph_dtype),
+                        'coordinates': cord,
+                        'columnsVal': cord[:, 1].tolist()
                         }
         
-        return self.candidates
\ No newline at end of file
+        return self.candidates
+
+    def normalize_characters(self, a_license_plate, cord, glyph_dtype=None,
+            tuple_resize=(20, 20)):
+        """
+        resizes every character region straight into one preallocated
+        3D array
+
+        Parameters:
+        -----------
+        a_license_plate: 2D numpy image of the license plate
+        cord: 2D array of the (minRow, minCol, maxRow, maxCol) of each character
+        glyph_dtype: dtype of the returned characters, see get_regions
+        tuple_resize: tuple; size of each character
+
+        Returns:
+        --------
+        3D array with the 2D array of each character
+        """
+        binary_plate = a_license_plate.dtype == bool
+        if glyph_dtype is None:
+            glyph_dtype = bool if binary_plate else np.float64
+        samples = np.empty((len(cord),) + tuple(tuple_resize), dtype=glyph_dtype)
+        binary_samples = not np.issubdtype(samples.dtype, np.floating)
+
+        for index, (minimumRow, minimumCol, maximumRow, maximumCol) in enumerate(cord):
+            roi = a_license_plate[minimumRow:maximumRow, minimumCol:maximumCol]
+            if binary_plate:
+                # the nearest neighbour zoom resize uses for binary images,
+                # written into the stack without an intermediate array
+                ndimage.zoom(roi, (float(tuple_resize[0]) / roi.shape[0],
+                    float(tuple_resize[1]) / roi.shape[1]), output=samples[index],
+                    order=0, mode='mirror', grid_mode=True)
+            elif binary_samples:
+                samples[index] = resize(roi, tuple_resize) >= 0.5
+            else:
+                samples[index] = resize(roi, tuple_resize)
+
+        return samples
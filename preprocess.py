@@ -1,25 +1,54 @@
 import numpy as np
+from scipy import ndimage
 from skimage.io import imread
 from skimage.color import rgb2gray
+from skimage.util import img_as_float
 from skimage import restoration
 from skimage import measure
-from skimage.measure import regionprops
 from skimage.filters import threshold_otsu
 from skimage.transform import resize
 
+import profiling
+
 class PreProcess():
     
     def __init__(self, image_location):
         """
-        Reads the image in grayscale and thresholds the image.
+        Reads the image in grayscale, the thresholded image (binary_image)
+        is computed when it is first needed.
 
         Parameters:
         -----------
-        image_location: str; full image directory path
+        image_location: str; full image directory path, or an image that
+            is already decoded (RGB or grayscale array), e.g. a video frame
+        """
+        with profiling.stage('decode'):
+            if isinstance(image_location, str):
+                car_image = imread(image_location)
+            else:
+                car_image = np.asarray(image_location)
+        with profiling.stage('grayscale'):
+            if car_image.ndim == 3:
+                self.full_car_image = rgb2gray(car_image)
+            else:
+                self.full_car_image = img_as_float(car_image)
+        with profiling.stage('resize'):
+            self.full_car_image = self.resize_if_necessary(self.full_car_image)
+        self._binary_image = None
+
+    @property
+    def binary_image(self):
+        """
+        the thresholded full_car_image, computed on first use so a search
+        in part of the image (see tracking.PlateTracker) can skip it
         """
-        self.full_car_image = rgb2gray(imread(image_location))
-        self.full_car_image = self.resize_if_necessary(self.full_car_image)
-        self.binary_image = self.threshold(self.full_car_image)
+        if self._binary_image is None:
+            self._binary_image = self.threshold(self.full_car_image)
+        return self._binary_image
+
+    @binary_image.setter
+    def binary_image(self, value):
+        self._binary_image = value
         
     def denoise(self, imgDetails):
         return restoration.denoise_tv_chambolle(imgDetails)
@@ -36,8 +65,10 @@ class PreProcess():
         --------
         2-D array of the binary image each pixel is either 1 or 0
         """
-        thresholdValue = threshold_otsu(gray_image)
-        return gray_image > thresholdValue
+        with profiling.stage('otsu'):
+            thresholdValue = threshold_otsu(gray_image)
+            self.threshold_value = thresholdValue
+            return gray_image > thresholdValue
         
     def get_plate_like_objects(self):
         """
@@ -47,33 +78,73 @@ class PreProcess():
         --------
         3-D array of license plate candidate regions.
         """
-        self.label_image = measure.label(self.binary_image)
-        self.plate_objects_cordinates = []
-        threshold = self.binary_image
-        plate_dimensions = (
-            0.08 * threshold.shape[0], 0.2 * threshold.shape[0], 
-            0.15 * threshold.shape[1], 0.4 * threshold.shape[1]
+        binary_image = self.binary_image
+        with profiling.stage('label'):
+            self.label_image = measure.label(binary_image)
+            bboxes = self.filter_plate_regions(self.label_image,
+                self.plate_dimensions(binary_image.shape))
+        self.plate_objects_cordinates = [tuple(each) for each in bboxes.tolist()]
+
+        # slicing keeps the candidates as views of full_car_image
+        return [self.full_car_image[minRow:maxRow, minCol:maxCol]
+            for minRow, minCol, maxRow, maxCol in self.plate_objects_cordinates]
+
+    def plate_dimensions(self, image_shape):
+        """
+        minimum height, maximum height, minimum width and maximum width a
+        license plate can have in an image of image_shape
+        """
+        return (
+            0.08 * image_shape[0], 0.2 * image_shape[0],
+            0.15 * image_shape[1], 0.4 * image_shape[1]
         )
+
+    def region_bboxes(self, label_image):
+        """
+        Bounding box and area of every labelled region in one pass over the
+        label image, without building regionprops objects.
+
+        Parameters:
+        -----------
+        label_image: 2D array of labels (0 is the background)
+
+        Returns:
+        --------
+        a tuple containing
+        0: 2D array of the (minRow, minCol, maxRow, maxCol) of each region
+        1: 1D array of the area of each region
+        """
+        slices = ndimage.find_objects(label_image)
+        areas = np.bincount(label_image.ravel(), minlength=len(slices) + 1)[1:]
+        present = np.array([each is not None for each in slices], dtype=bool)
+        bboxes = np.array([(each[0].start, each[1].start, each[0].stop, each[1].stop)
+            for each in slices if each is not None], dtype=np.intp).reshape(-1, 4)
+        return bboxes, areas[:len(slices)][present]
+
+    def filter_plate_regions(self, label_image, plate_dimensions):
+        """
+        Applies the plate size rules to every region with array masks.
+
+        Parameters:
+        -----------
+        label_image: 2D array of labels
+        plate_dimensions: tuple; (minHeight, maxHeight, minWidth, maxWidth)
+
+        Returns:
+        --------
+        2D array of the (minRow, minCol, maxRow, maxCol) of the regions
+        that look like a plate, in label order
+        """
         minHeight, maxHeight, minWidth, maxWidth = plate_dimensions
-        plate_like_objects = []
-
-        for region in regionprops(self.label_image):
-            if region.area < 10:
-                continue
-
-            minRow, minCol, maxRow, maxCol = region.bbox
-            regionHeight = maxRow - minRow
-            regionWidth = maxCol - minCol
-
-            if (minHeight <= regionHeight <= maxHeight and
-                minWidth <= regionWidth <= maxWidth and
-                regionWidth > regionHeight):
-                plate_like_objects.append(
-                    self.full_car_image[minRow:maxRow, minCol:maxCol]
-                )
-                self.plate_objects_cordinates.append((minRow, minCol, maxRow, maxCol))
-                
-        return plate_like_objects
+        bboxes, areas = self.region_bboxes(label_image)
+        regionHeight = bboxes[:, 2] - bboxes[:, 0]
+        regionWidth = bboxes[:, 3] - bboxes[:, 1]
+
+        plate_like = ((areas >= 10) &
+            (minHeight <= regionHeight) & (regionHeight <= maxHeight) &
+            (minWidth <= regionWidth) & (regionWidth <= maxWidth) &
+            (regionWidth > regionHeight))
+        return bboxes[plate_like]
 
     def validate_plate(self, candidates):
         """
@@ -86,22 +157,99 @@ class PreProcess():
         Returns:
         --------
         2D array of the most likely license plate region.
+        The ranking of every candidate is kept in plate_ranking and the
+        index of the selected one in plate_index.
         """
-        license_plate = []
-        highest_average = 0
+        self.plate_ranking = self.rank_plates(candidates)
+        if not self.plate_ranking:
+            self.plate_index = None
+            return []
 
-        for each_candidate in candidates:
-            height, width = each_candidate.shape
-            each_candidate = self.inverted_threshold(each_candidate)
+        self.plate_index, highest_average, license_plate = self.plate_ranking[0]
+        return license_plate
 
-            total_white_pixels = sum(np.sum(each_candidate[:, col]) for col in range(width))
-            average = float(total_white_pixels) / width
+    def rank_plates(self, candidates):
+        """
+        Scores every candidate at once: the inverted Otsu threshold of all
+        of them comes from one shared histogram computation and the score
+        (white pixels per column) from whole array reductions.
 
-            if average >= highest_average:
-                highest_average = average
-                license_plate = each_candidate
+        Parameters:
+        -----------
+        candidates: list of 2D grayscale arrays
 
-        return license_plate
+        Returns:
+        --------
+        list of (index, score, binary plate) tuples, best candidate first.
+        Candidates with the same score keep the order validate_plate
+        always used (the later candidate wins).
+        """
+        candidates = [each for each in candidates if np.size(each)]
+        if not candidates:
+            return []
+
+        sizes = np.array([each.size for each in candidates])
+        widths = np.array([each.shape[1] for each in candidates])
+        offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        pixels = np.concatenate([np.ravel(each) for each in candidates])
+
+        thresholds = self.otsu_thresholds(pixels, offsets) - 0.05
+        binary = pixels < np.repeat(thresholds, sizes)
+        scores = np.add.reduceat(binary, offsets, dtype=np.intp) / widths.astype(float)
+
+        order = np.lexsort((-np.arange(len(candidates)), -scores))
+        return [(int(index), float(scores[index]),
+            binary[offsets[index]:offsets[index] + sizes[index]].reshape(
+                candidates[index].shape)) for index in order]
+
+    def otsu_thresholds(self, pixels, offsets, nbins=256):
+        """
+        threshold_otsu of many images concatenated in one 1D array
+
+        Parameters:
+        -----------
+        pixels: 1D array of all the image pixels one image after the other
+        offsets: 1D array of the position where each image starts
+        nbins: int; number of histogram bins (same default as threshold_otsu)
+
+        Returns:
+        --------
+        1D array of the threshold of each image
+        """
+        sizes = np.diff(np.append(offsets, len(pixels)))
+        segment = np.repeat(np.arange(len(offsets)), sizes)
+        minimum = np.minimum.reduceat(pixels, offsets).astype(np.float64)
+        maximum = np.maximum.reduceat(pixels, offsets).astype(np.float64)
+        constant = minimum == maximum
+        span = np.where(constant, 1.0, maximum - minimum)
+
+        # the same bins np.histogram builds for each image
+        edges = np.linspace(minimum, maximum, nbins + 1, axis=1)
+        bin_index = ((pixels - minimum[segment]) * (nbins / span)[segment]).astype(np.intp)
+        np.clip(bin_index, 0, nbins - 1, out=bin_index)
+        flat_edges = edges.reshape(-1)
+        edge_index = segment * (nbins + 1) + bin_index
+        bin_index -= pixels < flat_edges[edge_index]
+        bin_index += (pixels >= flat_edges[edge_index + 1]) & (bin_index != nbins - 1)
+
+        counts = np.bincount(segment * nbins + bin_index,
+            minlength=len(offsets) * nbins).reshape(-1, nbins).astype(np.float32)
+        bin_centers = (edges[:, :-1] + edges[:, 1:]) / 2.0
+
+        # class probabilities and means for all possible thresholds
+        weight1 = np.cumsum(counts, axis=1)
+        weight2 = np.cumsum(counts[:, ::-1], axis=1)[:, ::-1]
+        # empty bins give 0/0, those thresholds never win and a constant
+        # image is replaced below
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean1 = np.cumsum(counts * bin_centers, axis=1) / weight1
+            mean2 = (np.cumsum((counts * bin_centers)[:, ::-1], axis=1) /
+                weight2[:, ::-1])[:, ::-1]
+        variance12 = weight1[:, :-1] * weight2[:, 1:] * (mean1[:, :-1] - mean2[:, 1:]) ** 2
+
+        thresholds = bin_centers[np.arange(len(offsets)), np.argmax(variance12, axis=1)]
+        # an image with a single intensity is thresholded at that value
+        return np.where(constant, minimum, thresholds)
 
     def inverted_threshold(self, grayscale_image):
         """
@@ -0,0 +1,235 @@
+"""
+Per stage timing of the recognition pipeline.
+
+The pipeline marks its hot stages with
+
+    with profiling.stage('otsu'):
+        ...
+
+Each stage adds its wall time (time.perf_counter_ns) to the Trace that is
+active on the current thread; without an active trace a stage does nothing.
+The Recognizer activates one Trace per image, optionally together with a
+cProfile profiler, and TraceWriter stores the traces as JSON lines.
+
+Stages may nest: template_match runs inside classification and label
+includes the region filtering.
+"""
+import json
+import time
+import pstats
+import cProfile
+import threading
+from contextlib import nullcontext
+
+# the stages of the pipeline in the order they run
+STAGES = ('decode', 'grayscale', 'resize', 'otsu', 'label', 'validation',
+    'segmentation', 'classification', 'template_match')
+
+# number of functions kept in the summary of a cProfile run
+PROFILE_TOP = 20
+
+_local = threading.local()
+_no_stage = nullcontext()
+
+
+class Trace():
+
+    def __init__(self, source=None):
+        """
+        Wall time of every stage of one image.
+
+        Parameters:
+        -----------
+        source: str; the image path (None for an image array)
+
+        Attributes:
+        -----------
+        stages: dict of stage name -> nanoseconds spent in it
+        calls: dict of stage name -> number of times it ran
+        counts: dict of name -> amount of the events counted with count
+        shared: dict of stage name -> number of images the stage was shared
+            with (the characters of a batch are classified together, each
+            image gets its part of the time)
+        profile: list of the functions that took longest, when profiled
+        """
+        self.source = source
+        self.stages = {}
+        self.calls = {}
+        self.counts = {}
+        self.shared = {}
+        self.profile = None
+        self.profilers = []
+        self.elapsed_ns = 0
+
+    def add(self, name, elapsed_ns, calls=1):
+        self.stages[name] = self.stages.get(name, 0) + elapsed_ns
+        self.calls[name] = self.calls.get(name, 0) + calls
+
+    def add_share(self, trace, shared_with):
+        """
+        adds the stages of a trace shared by shared_with images, divided
+        between them. Counts are not shared, they are counted per image
+        (see DeepMachineLearning.classify_many)
+        """
+        for name, elapsed_ns in trace.stages.items():
+            self.add(name, elapsed_ns // shared_with, trace.calls[name])
+            self.shared[name] = shared_with
+        self.elapsed_ns += trace.elapsed_ns // shared_with
+        self.profilers.extend(trace.profilers)
+
+    def seconds(self, name):
+        return self.stages.get(name, 0) / 1e9
+
+    def finish(self):
+        """
+        Summarizes the cProfile runs, after this the trace can be pickled
+        """
+        if self.profilers:
+            self.profile = summarize_profile(self.profilers)
+            self.profilers = []
+
+    def to_dict(self):
+        trace = {
+            'source': self.source,
+            'total_ms': self.elapsed_ns / 1e6,
+            'stages_ms': dict((name, elapsed_ns / 1e6)
+                for name, elapsed_ns in self.stages.items()),
+            'calls': self.calls
+        }
+        if self.counts:
+            trace['counts'] = self.counts
+        if self.shared:
+            trace['shared'] = self.shared
+        if self.profile is not None:
+            trace['profile'] = self.profile
+        return trace
+
+    def summary(self):
+        """
+        one line of the stage times, e.g. for the console
+        """
+        return ', '.join('{} {:.1f}ms'.format(name, self.stages[name] / 1e6)
+            for name in sorted(self.stages, key=stage_order))
+
+
+def stage_order(name):
+    return STAGES.index(name) if name in STAGES else len(STAGES)
+
+
+def current_trace():
+    return getattr(_local, 'trace', None)
+
+
+class _Stage():
+
+    __slots__ = ('trace', 'name', 'start')
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+
+    def __exit__(self, *exc_info):
+        self.trace.add(self.name, time.perf_counter_ns() - self.start)
+
+
+def stage(name):
+    """
+    Context manager timing a stage into the active trace of the thread
+    """
+    trace = getattr(_local, 'trace', None)
+    if trace is None:
+        return _no_stage
+    return _Stage(trace, name)
+
+
+def count(name, amount=1):
+    """
+    Adds amount to a counter of the active trace, e.g. the characters that
+    needed template matching
+    """
+    trace = getattr(_local, 'trace', None)
+    if trace is not None:
+        trace.counts[name] = trace.counts.get(name, 0) + amount
+
+
+def activate(trace, profile=False):
+    """
+    Context manager making trace the active trace of the current thread
+    while the block runs, the block wall time is added to it.
+
+    Parameters:
+    -----------
+    trace: Trace
+    profile: bool; also run cProfile over the block
+    """
+    return _ActiveTrace(trace, profile)
+
+
+class _ActiveTrace():
+
+    def __init__(self, trace, profile):
+        self.trace = trace
+        self.profiler = cProfile.Profile() if profile else None
+
+    def __enter__(self):
+        self.previous = getattr(_local, 'trace', None)
+        _local.trace = self.trace
+        if self.profiler is not None:
+            self.profiler.enable()
+        self.start = time.perf_counter_ns()
+        return self.trace
+
+    def __exit__(self, *exc_info):
+        self.trace.elapsed_ns += time.perf_counter_ns() - self.start
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.trace.profilers.append(self.profiler)
+        _local.trace = self.previous
+
+
+def summarize_profile(profilers, top=PROFILE_TOP):
+    """
+    Returns:
+    --------
+    list of dicts (function, calls, tottime_ms, cumtime_ms) of the top
+    functions of the profilers by cumulative time
+    """
+    stats = pstats.Stats(*profilers)
+    rows = []
+    for (filename, line, function), (primitive, calls, tottime, cumtime,
+            callers) in stats.stats.items():
+        rows.append({
+            'function': '{}:{}({})'.format(filename, line, function),
+            'calls': calls,
+            'tottime_ms': tottime * 1e3,
+            'cumtime_ms': cumtime * 1e3
+        })
+    rows.sort(key=lambda row: row['cumtime_ms'], reverse=True)
+    return rows[:top]
+
+
+class TraceWriter():
+
+    def __init__(self, filename):
+        """
+        Appends one JSON line per image trace to filename, can be shared
+        by threads
+        """
+        self.filename = filename
+        self.file = open(filename, 'a')
+        self.lock = threading.Lock()
+
+    def write(self, trace, **extra):
+        record = trace.to_dict()
+        record.update(extra)
+        line = json.dumps(record) + '\n'
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
@@ -4,10 +4,17 @@
 __author__ = 'othreecodes'
 
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
 BASE_URL = 'http://www.lsmvaapvs.org'
 import re
 
+TAG_PATTERN = re.compile('<.*?>')
+
 def parse_response(response):
     soup = BeautifulSoup(response.text,"html.parser")
     try:
@@ -26,17 +33,120 @@ def parse_response(response):
 
 '''Clean the HTML tags from response'''
 def clean_html_tags(raw_html):
-    clean = re.compile('<.*?>')
-    clean_text = re.sub(clean, '', raw_html)
+    clean_text = TAG_PATTERN.sub('', raw_html)
     return clean_text
 
+
+'''Least recently used responses, each kept for ttl seconds'''
+class ResponseCache:
+    def __init__(self, max_entries=1024, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if time.monotonic() >= expires:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self.max_entries < 1:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+'''Lookup client reusing its connections and caching the answers'''
+class MvrdClient:
+    def __init__(self, base_url=BASE_URL, timeout=10, max_workers=8,
+                 cache_size=1024, cache_ttl=3600):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.cache = ResponseCache(cache_size, cache_ttl)
+        self.session = requests.Session()
+        # one connection per worker so concurrent lookups do not wait for
+        # a free connection
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, max_workers))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    '''Getting the data of one plate, from the cache when possible.
+    False when the server answers with an HTTP error, like parse_response'''
+    def get_data(self, plate_number):
+        data = self.cache.get(plate_number)
+        if data is not None:
+            return data
+        response = self.session.get(self.base_url+'/search.php',
+                                    params={'vpn':plate_number},
+                                    timeout=self.timeout)
+        if not response.ok:
+            return False
+        data = parse_response(response=response)
+        if data is not False:
+            self.cache.put(plate_number, data)
+        return data
+
+    '''Getting the data of several plates, at most max_workers at a time.
+    Returns a dict of plate number -> data, None for failed lookups'''
+    def get_data_many(self, plates):
+        plates = list(OrderedDict.fromkeys(plates))
+        if not plates:
+            return {}
+
+        def lookup(plate_number):
+            try:
+                data = self.get_data(plate_number)
+            except requests.RequestException:
+                return None
+            return None if data is False else data
+
+        workers = max(1, min(self.max_workers, len(plates)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return dict(zip(plates, executor.map(lookup, plates)))
+
+    def close(self):
+        self.session.close()
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+'''The client shared by Mvrd objects'''
+def get_client():
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = MvrdClient()
+    return _default_client
+
+
 '''MVRD class'''
 class Mvrd:
-    def __init__(self,plate_number):
+    def __init__(self,plate_number,client=None):
         self.plate_number = plate_number
+        self.client = client
 
     '''Getting the raw html from www.lsmvaapvs.org'''
     def get_data(self):
-        response = requests.get(BASE_URL+'/search.php',{'vpn':self.plate_number})
-        data = parse_response(response=response)
-        return data
+        client = self.client if self.client is not None else get_client()
+        return client.get_data(self.plate_number)
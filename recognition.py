@@ -0,0 +1,542 @@
+"""
+GUI free license plate recognition.
+
+Runs the same PreProcess -> OCROnObjects -> DeepMachineLearning pipeline as
+full.execute_ALPR but reports the outcome as a RecognitionResult instead of
+wx dialogs, so it can run on headless machines. recognize_batch fans a list
+of images out across a process pool where every worker loads the model once.
+
+Usage:
+    python recognition.py test_images/ --workers 4 --output results.jsonl
+    python recognition.py test_images/ --trace traces.jsonl --profile
+    python recognition.py test_images/ --metrics alpr.prom --metrics-port 9100
+"""
+import os
+import sys
+import time
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import modelregistry
+import profiling
+import metrics
+from preprocess import PreProcess
+from ocr import OCROnObjects
+from deepMachine import DeepMachineLearning
+from textclassification import TextClassification
+
+ROOT_FOLDER = os.path.dirname(os.path.realpath(__file__))
+DEFAULT_MODEL_PATH = os.path.join(ROOT_FOLDER, 'ml_models', 'SVC_bundle')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+# size the characters are resized to for a pickled model
+DEFAULT_INPUT_SIZE = (20, 20)
+
+# the stages reported to the progress function of Recognizer.recognize
+STAGES = ('preprocess', 'segmentation', 'classification')
+
+
+class RecognitionError(Exception):
+    """
+    Raised when a stage of the pipeline fails. title and message are the
+    same texts the GUI shows in its message boxes.
+    """
+
+    def __init__(self, title, message):
+        Exception.__init__(self, message)
+        self.title = title
+        self.message = message
+
+
+class RecognitionCancelled(RecognitionError):
+    """
+    Raised between two stages when the recognition was cancelled
+    """
+
+    def __init__(self):
+        RecognitionError.__init__(self, "Cancelled",
+            "The recognition was cancelled")
+
+
+class RecognitionResult():
+
+    def __init__(self, source):
+        """
+        Outcome of recognizing a single image.
+
+        Parameters:
+        -----------
+        source: str; the image path that was recognized (None for an image
+            passed as an array)
+
+        Attributes:
+        -----------
+        plate_text: str; the recognized plate text ('' on failure)
+        characters: list of the characters in reading order
+        confidences: list of the classifier probability of each character
+        character_boxes: list of (minRow, minCol, maxRow, maxCol) of each
+            character in the working (resized) image
+        plate_box: (minRow, minCol, maxRow, maxCol) of the plate in the
+            working image or None
+        timings: dict of stage name -> seconds
+        error: (title, message) tuple when a stage failed, otherwise None
+        cancelled: bool; True when the recognition was cancelled
+        trace: profiling.Trace with the wall time of every stage
+        """
+        self.source = source
+        self.plate_text = ''
+        self.characters = []
+        self.confidences = []
+        self.character_boxes = []
+        self.plate_box = None
+        self.timings = {}
+        self.error = None
+        self.cancelled = False
+        self.trace = profiling.Trace(source)
+
+    @property
+    def success(self):
+        return self.error is None and bool(self.plate_text)
+
+    @property
+    def confidence(self):
+        """
+        mean probability of the characters on the plate
+        """
+        if not self.confidences:
+            return 0.0
+        return float(sum(self.confidences)) / len(self.confidences)
+
+    def to_dict(self):
+        return {
+            'source': self.source,
+            'plate_text': self.plate_text,
+            'characters': self.characters,
+            'confidences': self.confidences,
+            'confidence': self.confidence,
+            'character_boxes': self.character_boxes,
+            'plate_box': self.plate_box,
+            'timings': self.timings,
+            'stages_ms': self.trace.to_dict()['stages_ms'],
+            'error': list(self.error) if self.error else None
+        }
+
+
+def extract_license_plate(plate_like_objects, pre_process):
+    """
+    Selects and validates candidate plate regions.
+
+    Parameters:
+    -----------
+    plate_like_objects: list of candidate plate images
+    pre_process: PreProcess instance the candidates came from
+
+    Returns:
+    --------
+    a tuple containing
+    0: int; index of the selected candidate
+    1: 2D binary image of the license plate
+    """
+    number_of_candidates = len(plate_like_objects)
+
+    if number_of_candidates == 0:
+        raise RecognitionError("Plate Localization",
+            "License plate could not be located")
+
+    if number_of_candidates == 1:
+        return 0, pre_process.inverted_threshold(plate_like_objects[0])
+
+    license_plate = pre_process.validate_plate(plate_like_objects)
+    return pre_process.plate_index, license_plate
+
+
+class Recognizer():
+
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, tuple_size=None,
+            profile=False):
+        """
+        Runs the pipeline with the model from the process wide
+        modelregistry, so it is loaded once and reused for every image.
+
+        Parameters:
+        -----------
+        model_path: str; path of the classification model, a modelbundle
+            directory or a pickle
+        tuple_size: tuple; size each character is resized to (default:
+            the input size of a bundle, DEFAULT_INPUT_SIZE for a pickle)
+        profile: bool; run cProfile over every image, the top functions
+            end up in the trace of the result
+        """
+        self.model_path = model_path
+        self.tuple_size = tuple_size
+        self.profile = profile
+        self.deep_learn = DeepMachineLearning()
+        self.text_phase = TextClassification()
+
+    def load(self):
+        """
+        Returns the model, only reading it from disk when it is not loaded
+        yet or the file changed
+        """
+        if not os.path.exists(self.model_path):
+            raise RecognitionError("Model Error", "SVM model not found!")
+        return modelregistry.get_model(self.model_path)
+
+    def input_size(self, model):
+        """
+        Returns the size the characters are resized to for model, a bundle
+        records the size it was trained on
+        """
+        manifest = getattr(model, 'manifest', None)
+        if manifest is None:
+            return self.tuple_size or DEFAULT_INPUT_SIZE
+        input_size = tuple(manifest['input_size'])
+        if self.tuple_size is not None and tuple(self.tuple_size) != input_size:
+            raise RecognitionError("Model Error",
+                "The model takes {}x{} characters, not {}x{}".format(
+                    *(input_size + tuple(self.tuple_size))))
+        return input_size
+
+    def recognize(self, imagepath, tracker=None, progress=None,
+            cancel_event=None):
+        """
+        Runs the full pipeline on one image. Never raises for a failing
+        stage, the failure is recorded in the error of the result.
+
+        Parameters:
+        -----------
+        imagepath: str; path to the image file or a decoded image array
+        tracker: optional tracking.PlateTracker of the frame sequence the
+            image belongs to, it locates the plate and is told the outcome
+        progress: optional function called with the name of every stage
+            (see STAGES) before it starts
+        cancel_event: optional threading.Event, when it is set the
+            recognition stops before the next stage and the result is
+            marked as cancelled
+
+        Returns:
+        --------
+        RecognitionResult
+        """
+        result = self.recognize_many([imagepath], tracker, progress,
+            cancel_event)[0]
+        if tracker is not None:
+            tracker.observe(result)
+        return result
+
+    def recognize_many(self, imagepaths, tracker=None, progress=None,
+            cancel_event=None):
+        """
+        Recognizes several images, the characters of all of them are
+        classified with a single model call.
+
+        Parameters:
+        -----------
+        imagepaths: list of image paths (or decoded image arrays)
+        tracker: optional tracking.PlateTracker used to locate the plates
+        progress, cancel_event: see recognize
+
+        Returns:
+        --------
+        list of RecognitionResult in the order of imagepaths
+        """
+        results = []
+        segmented = []
+        for each_path in imagepaths:
+            source = each_path if isinstance(each_path, str) else None
+            result = RecognitionResult(source)
+            try:
+                with profiling.activate(result.trace, self.profile):
+                    segmented.append((result, self.segment(each_path, result,
+                        tracker, progress, cancel_event)))
+            except RecognitionError as e:
+                self.record_error(result, e)
+            results.append(result)
+
+        if segmented:
+            self.classify(segmented, progress, cancel_event)
+
+        for result in results:
+            result.trace.finish()
+        return results
+
+    def classify(self, segmented, progress=None, cancel_event=None):
+        """
+        Steps 3 and 4 for every (result, candidates) pair of segmented
+        """
+        # Step 3: classify the characters of every plate at once, each
+        # image gets its share of the time
+        stage_start = time.perf_counter()
+        batch_trace = profiling.Trace()
+        try:
+            self.start_stage('classification', progress, cancel_event)
+            with profiling.activate(batch_trace, self.profile):
+                with profiling.stage('classification'):
+                    model = self.load()
+                    classified = self.deep_learn.classify_many(
+                        [candidates['fullscale'] for result, candidates in segmented],
+                        model, self.input_size(model),
+                        [result.trace for result, candidates in segmented])
+        except RecognitionError as e:
+            classified = e
+        except Exception as e:
+            classified = RecognitionError("Classification Error",
+                "Error during deep learning classification: {}".format(e))
+        classification_time = (time.perf_counter() - stage_start) / len(segmented)
+
+        for index, (result, candidates) in enumerate(segmented):
+            result.trace.add_share(batch_trace, len(segmented))
+            if isinstance(classified, RecognitionError):
+                self.record_error(result, classified)
+                continue
+            result.timings['classification'] = classification_time
+            characters, confidences = classified[index]
+            try:
+                self.reconstruct(result, candidates, characters, confidences)
+            except RecognitionError as e:
+                self.record_error(result, e)
+                continue
+            result.timings['total'] = (result.timings['preprocess'] +
+                result.timings['segmentation'] + classification_time)
+
+    def start_stage(self, stage, progress=None, cancel_event=None):
+        if cancel_event is not None and cancel_event.is_set():
+            raise RecognitionCancelled()
+        if progress is not None:
+            progress(stage)
+
+    def record_error(self, result, error):
+        result.error = (error.title, error.message)
+        result.cancelled = isinstance(error, RecognitionCancelled)
+
+    def segment(self, imagepath, result, tracker=None, progress=None,
+            cancel_event=None):
+        """
+        Locates the plate and segments its characters
+
+        Returns:
+        --------
+        the candidates dictionary of OCROnObjects
+        """
+        # Step 1: Preprocess image and find plate-like objects
+        stage_start = time.perf_counter()
+        self.start_stage('preprocess', progress, cancel_event)
+        try:
+            pre_process = PreProcess(imagepath)
+        except Exception as e:
+            raise RecognitionError("Preprocessing Error",
+                "Error loading image or preprocessing: {}".format(e))
+        if tracker is not None:
+            plate_like_objects = tracker.locate(pre_process)
+        else:
+            plate_like_objects = pre_process.get_plate_like_objects()
+        with profiling.stage('validation'):
+            plate_index, license_plate = extract_license_plate(
+                plate_like_objects, pre_process)
+        result.plate_box = tuple(int(each) for each in
+            pre_process.plate_objects_cordinates[plate_index])
+        result.timings['preprocess'] = time.perf_counter() - stage_start
+
+        # Step 2: OCR character segmentation
+        stage_start = time.perf_counter()
+        self.start_stage('segmentation', progress, cancel_event)
+        try:
+            with profiling.stage('segmentation'):
+                ocr_instance = OCROnObjects(license_plate)
+        except Exception as e:
+            raise RecognitionError("OCR Error",
+                "Error during OCR segmentation: {}".format(e))
+
+        if not ocr_instance.candidates or 'fullscale' not in ocr_instance.candidates:
+            raise RecognitionError("Character Segmentation",
+                "No character was segmented")
+        result.timings['segmentation'] = time.perf_counter() - stage_start
+        return ocr_instance.candidates
+
+    def reconstruct(self, result, candidates, characters, confidences):
+        """
+        Step 4: puts the classified characters in reading order and fills
+        in the text, confidences and boxes of the result
+        """
+        columns = candidates.get('columnsVal', [])
+        coordinates = candidates['coordinates']
+        plate_text = self.text_phase.text_reconstruction(
+            self.text_phase.get_text(characters), list(columns))
+
+        if not plate_text:
+            raise RecognitionError("Recognition Error",
+                "No license plate text was recognized.")
+
+        plate_row, plate_col = result.plate_box[:2]
+        for index in np.argsort(columns, kind='stable'):
+            minRow, minCol, maxRow, maxCol = coordinates[index]
+            result.characters.append(str(characters[index]))
+            result.confidences.append(float(confidences[index]))
+            result.character_boxes.append((int(minRow + plate_row),
+                int(minCol + plate_col), int(maxRow + plate_row),
+                int(maxCol + plate_col)))
+        result.plate_text = plate_text
+
+
+# the recognizer of a batch worker process, created once by _init_worker
+_worker_recognizer = None
+# model registry (hits, misses) of the worker already sent to the parent
+_worker_cache_reported = (0, 0)
+
+
+def _init_worker(model_path, profile=False):
+    global _worker_recognizer
+    _worker_recognizer = Recognizer(model_path, profile=profile)
+    try:
+        # warm the registry of the worker before the first image arrives
+        _worker_recognizer.load()
+    except RecognitionError:
+        # reported on every image by Recognizer.recognize instead
+        pass
+
+
+def _recognize_in_worker(imagepaths):
+    """
+    Returns:
+    --------
+    a tuple containing
+    0: list of RecognitionResult of imagepaths
+    1: tuple of the model registry (hits, misses) of the worker since its
+        last chunk, the model is only loaded in the workers
+    """
+    global _worker_cache_reported
+    results = _worker_recognizer.recognize_many(imagepaths)
+    hits, misses = modelregistry.registry.hits, modelregistry.registry.misses
+    cache_lookups = (hits - _worker_cache_reported[0],
+        misses - _worker_cache_reported[1])
+    _worker_cache_reported = (hits, misses)
+    return results, cache_lookups
+
+
+def list_images(sources):
+    """
+    Expands directories into the image files they contain.
+
+    Parameters:
+    -----------
+    sources: list of image paths and/or directories
+
+    Returns:
+    --------
+    list of image paths, directories are expanded in sorted order
+    """
+    image_paths = []
+    for each_source in sources:
+        if os.path.isdir(each_source):
+            for each_file in sorted(os.listdir(each_source)):
+                if each_file.lower().endswith(IMAGE_EXTENSIONS):
+                    image_paths.append(os.path.join(each_source, each_file))
+        else:
+            image_paths.append(each_source)
+    return image_paths
+
+
+def recognize_batch(sources, model_path=DEFAULT_MODEL_PATH, workers=None,
+        chunksize=16, profile=False, cancel_event=None):
+    """
+    Recognizes many images across a pool of processes.
+
+    Parameters:
+    -----------
+    sources: list of image paths and/or directories
+    model_path: str; path of the classification model
+    workers: int; number of processes (default is the number of cores)
+    chunksize: int; images handed to a worker at a time, their characters
+        are classified together
+    profile: bool; run cProfile over every image (see Recognizer)
+    cancel_event: threading.Event; when set the chunks not started yet are
+        dropped and the generator ends after the running ones
+
+    Returns:
+    --------
+    generator of RecognitionResult in the order of the images, the model
+    registry lookups of the workers are added to metrics.pipeline
+    """
+    image_paths = list_images(sources)
+    if not image_paths:
+        return
+    chunks = [image_paths[index:index + chunksize]
+        for index in range(0, len(image_paths), chunksize)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+            initargs=(model_path, profile)) as executor:
+        for results, cache_lookups in executor.map(_recognize_in_worker, chunks):
+            metrics.record_model_cache(*cache_lookups)
+            for result in results:
+                yield result
+            if cancel_event is not None and cancel_event.is_set():
+                executor.shutdown(wait=False, cancel_futures=True)
+                return
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Recognize license plates without the GUI')
+    parser.add_argument('sources', nargs='+',
+        help='image files and/or directories of images')
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH,
+        help='path of the classification model')
+    parser.add_argument('--workers', type=int, default=None,
+        help='number of worker processes (default: number of cores)')
+    parser.add_argument('--chunksize', type=int, default=16,
+        help='images handed to a worker at a time')
+    parser.add_argument('--output', default=None,
+        help='JSON lines file for the results (default: stdout)')
+    parser.add_argument('--trace', default=None,
+        help='JSON lines file receiving the stage timings of every image')
+    parser.add_argument('--profile', action='store_true',
+        help='run cProfile over every image and add the top functions '
+            'to its trace')
+    parser.add_argument('--metrics', default=None,
+        help='Prometheus text file receiving the aggregated metrics')
+    parser.add_argument('--metrics-every', type=int, default=100,
+        help='with --metrics, rewrite the file after this many images')
+    parser.add_argument('--metrics-port', type=int, default=None,
+        help='serve the aggregated metrics on this local port while running')
+    args = parser.parse_args(argv)
+
+    metrics_server = None
+    if args.metrics_port is not None:
+        metrics_server = metrics.registry.serve(args.metrics_port)
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    trace_writer = profiling.TraceWriter(args.trace) if args.trace else None
+    start_time = time.perf_counter()
+    processed = 0
+    recognized = 0
+    try:
+        for result in recognize_batch(args.sources, args.model, args.workers,
+                args.chunksize, args.profile):
+            processed += 1
+            recognized += result.success
+            metrics.record_result(result)
+            output.write(json.dumps(result.to_dict()) + '\n')
+            if args.metrics and processed % args.metrics_every == 0:
+                metrics.registry.write(args.metrics)
+            if trace_writer is not None:
+                trace_writer.write(result.trace, plate_text=result.plate_text,
+                    error=list(result.error) if result.error else None)
+    finally:
+        if args.output:
+            output.close()
+        if trace_writer is not None:
+            trace_writer.close()
+        if args.metrics:
+            metrics.registry.write(args.metrics)
+        if metrics_server is not None:
+            metrics_server.shutdown()
+
+    elapsed_time = time.perf_counter() - start_time
+    sys.stderr.write('{} of {} images recognized in {:.2f} seconds\n'.format(
+        recognized, processed, elapsed_time))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
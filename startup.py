@@ -0,0 +1,149 @@
+"""
+Start-up cost of the application.
+
+The window only imports wx and gui; the recognition pipeline (full and
+everything under it) is imported by the warm-up thread of the window, which
+then loads the model, the template bank and the vehicle registry (see
+full.warm_up). profile_imports runs an import in a fresh interpreter with
+python -X importtime and report prints the modules that cost the most:
+
+    python ALPR.py --profile-startup
+    python startup.py --top 30
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+ROOT_FOLDER = os.path.dirname(os.path.realpath(__file__))
+
+# what the window imports before it shows, and what the warm-up thread
+# imports after
+STARTUP_IMPORTS = ('wx', 'gui')
+BACKGROUND_IMPORTS = ('full',)
+
+
+def parse_importtime(text):
+    """
+    Parses the -X importtime lines of stderr
+
+    Returns:
+    --------
+    list of dicts (module, self_us, cumulative_us, depth) in import order,
+    depth 0 for the modules imported by the script itself
+    """
+    rows = []
+    for line in text.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # the header line
+            continue
+        name = fields[2].rstrip()
+        stripped = name.lstrip()
+        rows.append({
+            'module': stripped,
+            'self_us': int(fields[0]),
+            'cumulative_us': int(fields[1]),
+            'depth': (len(name) - len(stripped) - 1) // 2
+        })
+    return rows
+
+
+def profile_imports(modules, after=()):
+    """
+    Imports modules in a fresh interpreter with -X importtime
+
+    Parameters:
+    -----------
+    modules: list of the module names to time
+    after: list of modules imported first and left out of the report, e.g.
+        what the window already imported before the warm-up thread runs
+
+    Returns:
+    --------
+    a tuple containing
+    0: list of the rows of parse_importtime for modules
+    1: float; wall time of the imports in seconds
+    2: str; the error output when the interpreter failed, else None
+    """
+    script = ('import sys, time\n'
+        + ''.join('import {}\n'.format(each) for each in after)
+        + "sys.stderr.write('--- profiled ---\\n')\n"
+        + 'start = time.perf_counter()\n'
+        + ''.join('import {}\n'.format(each) for each in modules)
+        + "sys.stderr.write('--- wall {} ---\\n'.format(time.perf_counter() - start))\n")
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', script],
+        cwd=ROOT_FOLDER, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True)
+    if process.returncode != 0:
+        return [], 0.0, process.stderr.strip().splitlines()[-1]
+
+    profiled = process.stderr.split('--- profiled ---', 1)[-1]
+    wall = float(profiled.rsplit('--- wall ', 1)[1].split(' ---')[0])
+    return parse_importtime(profiled), wall, None
+
+
+def report(title, rows, wall, error=None, top=20):
+    """
+    prints the modules with the highest cumulative and self import time
+    """
+    print(title)
+    print('=' * len(title))
+    if error is not None:
+        print('failed: ' + error)
+        print('')
+        return
+    print('{} modules imported in {:.3f} s'.format(len(rows), wall))
+    for heading, key in (('cumulative', 'cumulative_us'), ('self', 'self_us')):
+        print('')
+        print('{:>10}  module (top {} by {} time)'.format('ms', top, heading))
+        for row in sorted(rows, key=lambda row: row[key], reverse=True)[:top]:
+            print('{:>10.1f}  {}'.format(row[key] / 1e3, row['module']))
+    print('')
+
+
+def profile_warm_up():
+    """
+    Runs full.warm_up in this process
+
+    Returns:
+    --------
+    dict of step -> seconds, with the import of full as 'imports'
+    """
+    start_time = time.perf_counter()
+    import full
+    timings = {'imports': time.perf_counter() - start_time}
+    timings.update(full.warm_up())
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Report the import time of every module at start-up')
+    parser.add_argument('--top', type=int, default=20,
+        help='modules listed per table')
+    parser.add_argument('--no-warm-up', action='store_true',
+        help='skip timing the warm-up steps')
+    args = parser.parse_args(argv)
+
+    rows, wall, error = profile_imports(STARTUP_IMPORTS)
+    report('Before the window shows (import {})'.format(
+        ', '.join(STARTUP_IMPORTS)), rows, wall, error, args.top)
+    rows, wall, error = profile_imports(BACKGROUND_IMPORTS, STARTUP_IMPORTS
+        if error is None else ())
+    report('On the warm-up thread (import {})'.format(
+        ', '.join(BACKGROUND_IMPORTS)), rows, wall, error, args.top)
+
+    if not args.no_warm_up:
+        print('Warm-up steps')
+        print('=============')
+        for step, seconds in profile_warm_up().items():
+            print('{:>10.1f}  {}'.format(seconds * 1e3, step))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
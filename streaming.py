@@ -0,0 +1,251 @@
+"""
+License plate recognition over continuous frame sequences.
+
+A PlateStream runs the recognition pipeline on every stride-th frame and
+merges the reads of the same plate in consecutive frames into a single
+Sighting, so a car passing the camera is reported (and saved) once with the
+most confident read instead of once per frame. A read with a look-alike
+character misread still belongs to the sighting (see
+PlateStream.max_distance).
+
+Usage:
+    python streaming.py frames_directory --stride 3 --save
+"""
+import sys
+import json
+import argparse
+import itertools
+from datetime import datetime
+
+from fuzzymatch import CONFUSABLE_COST, plate_distance
+from recognition import Recognizer, DEFAULT_MODEL_PATH, list_images
+from tracking import PlateTracker
+
+
+class Sighting():
+
+    def __init__(self, result, frame_index):
+        """
+        Every read of one plate while it stays in view.
+
+        Parameters:
+        -----------
+        result: the first successful RecognitionResult of the plate
+        frame_index: int; the frame the plate was read in
+
+        Attributes:
+        -----------
+        plate_text: str; text of the most confident read
+        confidence: float; confidence of the most confident read
+        best_result: RecognitionResult of the most confident read
+        best_frame: int; frame of the most confident read
+        first_frame, last_frame: int; first and last frame with a read
+        reads: int; number of frames the plate was read in
+        texts: set of every text the plate was read as
+        """
+        self.plate_text = result.plate_text
+        self.texts = {result.plate_text}
+        self.confidence = result.confidence
+        self.best_result = result
+        self.best_frame = frame_index
+        self.first_frame = frame_index
+        self.last_frame = frame_index
+        self.reads = 1
+
+    def add(self, result, frame_index):
+        self.reads += 1
+        self.texts.add(result.plate_text)
+        self.last_frame = frame_index
+        if result.confidence > self.confidence:
+            self.plate_text = result.plate_text
+            self.confidence = result.confidence
+            self.best_result = result
+            self.best_frame = frame_index
+
+    def to_dict(self):
+        return {
+            'plate_text': self.plate_text,
+            'confidence': self.confidence,
+            'best_frame': self.best_frame,
+            'first_frame': self.first_frame,
+            'last_frame': self.last_frame,
+            'reads': self.reads,
+            'source': self.best_result.source
+        }
+
+
+def iter_frames(source):
+    """
+    Numbers the frames of a source.
+
+    Parameters:
+    -----------
+    source: a directory of sequential frame images (read in sorted name
+        order) or any iterable/generator of image paths or image arrays
+
+    Returns:
+    --------
+    generator of (frame_index, frame) tuples
+    """
+    if isinstance(source, str):
+        source = list_images([source])
+    for frame_index, frame in enumerate(source):
+        yield frame_index, frame
+
+
+class PlateStream():
+
+    def __init__(self, recognizer=None, stride=1, max_gap=15, min_reads=1,
+            on_sighting=None, tracker=None, max_distance=CONFUSABLE_COST):
+        """
+        Parameters:
+        -----------
+        recognizer: Recognizer used on the frames (default: a new one with
+            the default model)
+        stride: int; only every stride-th frame is recognized
+        max_gap: int; a sighting ends when its plate was not read for more
+            than max_gap frames
+        min_reads: int; sightings read in fewer frames are dropped as noise
+        on_sighting: function called with every finished Sighting
+        tracker: optional tracking.PlateTracker so the plate is searched
+            around its last position before the whole frame
+        max_distance: float; a read within this fuzzymatch.plate_distance
+            of a text of an open sighting is the same plate misread. The
+            default accepts one look-alike character (2/Z, 8/B, ...); 1.0
+            would also merge a different car in view (ABC128 for ABC123)
+        """
+        self.recognizer = recognizer if recognizer is not None else Recognizer()
+        self.stride = max(1, int(stride))
+        self.max_gap = max_gap
+        self.min_reads = min_reads
+        self.on_sighting = on_sighting
+        self.tracker = tracker
+        self.max_distance = max_distance
+        self.sighting_ids = itertools.count()
+        self.open_sightings = {}
+
+    def find_sighting(self, plate_text):
+        """
+        The id of the open sighting plate_text is a read of: the one with a
+        text closest to it within max_distance, the most recently read one
+        on a tie. None when the plate is not in view yet.
+        """
+        best = None
+        for sighting_id, sighting in self.open_sightings.items():
+            if plate_text in sighting.texts:
+                distance = 0.0
+            else:
+                distance = min(plate_distance(plate_text, each)
+                    for each in sighting.texts)
+            if distance > self.max_distance:
+                continue
+            rank = (distance, -sighting.last_frame)
+            if best is None or rank < best[0]:
+                best = (rank, sighting_id)
+        return best[1] if best is not None else None
+
+    def process(self, frames):
+        """
+        Recognizes a frame sequence.
+
+        Parameters:
+        -----------
+        frames: see iter_frames
+
+        Returns:
+        --------
+        generator of the finished Sighting objects, in the order they end
+        """
+        for frame_index, frame in iter_frames(frames):
+            if frame_index % self.stride:
+                continue
+            if self.tracker is not None:
+                result = self.recognizer.recognize(frame, self.tracker)
+            else:
+                result = self.recognizer.recognize(frame)
+            if result.source is None and isinstance(frame, str):
+                result.source = frame
+            if result.success:
+                self.update(result, frame_index)
+            for each_sighting in self.expire(frame_index):
+                yield each_sighting
+
+        for each_sighting in self.flush():
+            yield each_sighting
+
+    def update(self, result, frame_index):
+        sighting_id = self.find_sighting(result.plate_text)
+        if sighting_id is None:
+            self.open_sightings[next(self.sighting_ids)] = Sighting(result,
+                frame_index)
+        else:
+            self.open_sightings[sighting_id].add(result, frame_index)
+
+    def expire(self, frame_index):
+        """
+        finishes the sightings whose plate left the view
+        """
+        expired = [key for key, sighting in self.open_sightings.items()
+            if frame_index - sighting.last_frame > self.max_gap]
+        return self.finish(expired)
+
+    def flush(self):
+        """
+        finishes every open sighting, e.g. at the end of the stream
+        """
+        return self.finish(list(self.open_sightings))
+
+    def finish(self, keys):
+        finished = []
+        for key in keys:
+            sighting = self.open_sightings.pop(key)
+            if sighting.reads < self.min_reads:
+                continue
+            if self.on_sighting is not None:
+                self.on_sighting(sighting)
+            finished.append(sighting)
+        finished.sort(key=lambda sighting: sighting.first_frame)
+        return finished
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Recognize license plates in a sequence of frames')
+    parser.add_argument('frames', help='directory of sequential frame images')
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH,
+        help='path of the classification model')
+    parser.add_argument('--stride', type=int, default=1,
+        help='recognize every n-th frame only')
+    parser.add_argument('--max-gap', type=int, default=15,
+        help='frames without a read before a sighting ends')
+    parser.add_argument('--min-reads', type=int, default=1,
+        help='drop sightings read in fewer frames')
+    parser.add_argument('--track', action='store_true',
+        help='search around the last plate position before the whole frame')
+    parser.add_argument('--refresh-every', type=int, default=30,
+        help='with --track, search the whole frame at least this often')
+    parser.add_argument('--max-distance', type=float, default=CONFUSABLE_COST,
+        help='reads this close (a misread character costs 1, a look-alike '
+            '0.5) are the same plate')
+    parser.add_argument('--save', action='store_true',
+        help='save every sighting to the ALPR log')
+    args = parser.parse_args(argv)
+
+    on_sighting = None
+    if args.save:
+        from dbAspect import DBConnection
+        db_aspect = DBConnection()
+
+        def on_sighting(sighting):
+            db_aspect.save_alpr(sighting.plate_text, str(datetime.today()))
+
+    tracker = PlateTracker(refresh_every=args.refresh_every) if args.track else None
+    stream = PlateStream(Recognizer(args.model), args.stride, args.max_gap,
+        args.min_reads, on_sighting, tracker, args.max_distance)
+    for each_sighting in stream.process(args.frames):
+        sys.stdout.write(json.dumps(each_sighting.to_dict()) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""
+NumPy inference for the linear SVC of DeepMachineLearning.
+
+SVC(kernel='linear', probability=True) classifies through libsvm: one
+decision value per pair of classes (one-vs-one), a Platt sigmoid turning
+each into a pairwise probability and the pairwise coupling of Wu, Lin and
+Weng combining those into the class probabilities. For a linear kernel the
+decision values are a single matrix multiply, so LinearSVMEngine keeps the
+plain weight and bias arrays of every pair and does the rest with
+vectorized NumPy:
+
+    engine = svmengine.LinearSVMEngine.from_model(svc_model)
+    probabilities = engine.predict_proba(features)
+
+libsvm approximates the coupling iteratively for every glyph, the engine
+solves the same linear system directly for the whole batch; the
+probabilities agree within the libsvm stopping tolerance and the predicted
+classes are the same.
+
+A model trained on PCA reduced glyphs is exported together with the fitted
+projection, which the engine applies to the batch as one more matrix
+multiply before the decision values:
+
+    engine = svmengine.LinearSVMEngine.from_model(svc_model, projection=pca)
+"""
+import warnings
+
+import numpy as np
+
+# libsvm clips the pairwise probabilities to [MIN_PROB, 1 - MIN_PROB]
+MIN_PROB = 1e-7
+
+
+class LinearSVMEngine():
+
+    def __init__(self, coef, intercept, prob_a, prob_b, classes,
+            projection=None, projection_offset=None):
+        """
+        Parameters:
+        -----------
+        coef: 2D array; weights of every pair of classes (i, j), i < j, in the
+            order of numpy.triu_indices, one row per pair
+        intercept: 1D array; bias of every pair
+        prob_a, prob_b: 1D arrays; Platt sigmoid parameters of every pair
+        classes: 1D array of the class labels
+        projection: optional 2D array, one row per component; the features
+            are reduced to features @ projection.T - projection_offset
+        projection_offset: 1D array, one value per component
+
+        A positive decision value of the pair (i, j) votes for class i.
+        """
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.intercept = np.asarray(intercept, dtype=np.float64)
+        self.prob_a = np.asarray(prob_a, dtype=np.float64)
+        self.prob_b = np.asarray(prob_b, dtype=np.float64)
+        self.classes_ = np.asarray(classes)
+        self.projection = None
+        self.projection_offset = None
+        if projection is not None:
+            self.projection = np.asarray(projection, dtype=np.float64)
+            self.projection_offset = np.zeros(len(self.projection))
+            if projection_offset is not None:
+                self.projection_offset = np.asarray(projection_offset,
+                    dtype=np.float64)
+            if self.projection.shape[0] != self.coef.shape[1]:
+                raise ValueError('the projection has {} components, the weights '
+                    'expect {}'.format(self.projection.shape[0], self.coef.shape[1]))
+        self.pair_i, self.pair_j = np.triu_indices(len(self.classes_), 1)
+        if not (len(self.coef) == len(self.intercept) == len(self.prob_a) ==
+                len(self.prob_b) == len(self.pair_i)):
+            raise ValueError('{} classes need {} pairs of weights, got {}'.format(
+                len(self.classes_), len(self.pair_i), len(self.coef)))
+
+    @classmethod
+    def from_model(cls, model, projection=None):
+        """
+        Exports a fitted SVC(kernel='linear', probability=True)
+
+        Parameters:
+        -----------
+        model: the fitted SVC
+        projection: optional fitted PCA (or another linear projection with
+            components_ and mean_) the SVC was trained behind
+
+        Raises:
+        -------
+        ValueError if the model is not such an SVC
+        """
+        if not is_exportable(model):
+            raise ValueError('only a fitted linear SVC with probability=True '
+                'can be exported, got {}'.format(type(model).__name__))
+        with warnings.catch_warnings():
+            # probA_ and probB_ are deprecated together with probability=True
+            warnings.simplefilter('ignore', FutureWarning)
+            prob_a, prob_b = model.probA_, model.probB_
+        coef, intercept = model.coef_, model.intercept_
+        if len(model.classes_) == 2:
+            # scikit-learn flips the sign of the libsvm decision value of a
+            # binary problem, the sigmoid is fitted on the libsvm one
+            coef, intercept = -coef, -intercept
+        projection_matrix = projection_offset = None
+        if projection is not None:
+            projection_matrix, projection_offset = projection_arrays(projection)
+        return cls(coef, intercept, prob_a, prob_b, model.classes_,
+            projection_matrix, projection_offset)
+
+    def project(self, features):
+        """
+        the features reduced by the projection (unchanged without one)
+        """
+        features = np.asarray(features, dtype=np.float64)
+        if self.projection is None:
+            return features
+        return features @ self.projection.T - self.projection_offset
+
+    def decision_function(self, features):
+        """
+        one-vs-one decision values, one column per pair of classes
+
+        Parameters:
+        -----------
+        features: 2D Numpy array with one flattened character per row
+        """
+        return self.project(features) @ self.coef.T + self.intercept
+
+    def pairwise_probabilities(self, decision_values):
+        """
+        The probability r[n, i, j] that sample n is class i rather than
+        class j, from the Platt sigmoid of the decision values
+        """
+        # 1 / (1 + exp(f)) without overflowing for a large f
+        pairwise = np.exp(-np.logaddexp(0, decision_values * self.prob_a +
+            self.prob_b))
+        np.clip(pairwise, MIN_PROB, 1 - MIN_PROB, out=pairwise)
+        coupled = np.zeros((len(decision_values), len(self.classes_),
+            len(self.classes_)))
+        coupled[:, self.pair_i, self.pair_j] = pairwise
+        coupled[:, self.pair_j, self.pair_i] = 1 - pairwise
+        return coupled
+
+    def couple(self, pairwise):
+        """
+        Class probabilities p minimizing p'Qp with sum(p) = 1 where
+        Q[t, t] = sum of r[j, t]^2 over j != t and Q[t, j] = -r[j, t] r[t, j],
+        the method 2 of Wu, Lin and Weng used by libsvm. Q is positive
+        definite, so p is Q^-1 1 normalized; all samples are solved at once.
+        With two classes Q is singular and the minimum is the pairwise
+        probability itself.
+        """
+        if len(self.classes_) == 2:
+            return np.stack([pairwise[:, 0, 1], pairwise[:, 1, 0]], axis=1)
+        transposed = pairwise.transpose(0, 2, 1)
+        q_matrix = -transposed * pairwise
+        diagonal = np.arange(len(self.classes_))
+        squares = transposed ** 2
+        q_matrix[:, diagonal, diagonal] = (squares.sum(axis=2) -
+            squares[:, diagonal, diagonal])
+        solution = np.linalg.solve(q_matrix,
+            np.ones(q_matrix.shape[:2] + (1,)))[..., 0]
+        return solution / solution.sum(axis=1, keepdims=True)
+
+    def predict_proba(self, features):
+        """
+        Same as SVC.predict_proba, one column per class of classes_
+        """
+        features = np.asarray(features, dtype=np.float64)
+        if len(features) == 0:
+            return np.zeros((0, len(self.classes_)))
+        return self.couple(self.pairwise_probabilities(
+            self.decision_function(features)))
+
+    def predict(self, features):
+        """
+        the most probable class of every row
+        """
+        return self.classes_[np.argmax(self.predict_proba(features), axis=1)]
+
+    def to_arrays(self):
+        """
+        dict of the plain arrays of the model, see from_arrays
+        """
+        arrays = {
+            'coef': self.coef,
+            'intercept': self.intercept,
+            'prob_a': self.prob_a,
+            'prob_b': self.prob_b,
+            'classes': self.classes_
+        }
+        if self.projection is not None:
+            arrays['projection'] = self.projection
+            arrays['projection_offset'] = self.projection_offset
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(arrays['coef'], arrays['intercept'], arrays['prob_a'],
+            arrays['prob_b'], arrays['classes'], arrays.get('projection'),
+            arrays.get('projection_offset'))
+
+
+def projection_arrays(projection):
+    """
+    The matrix and offset with projection.transform(features) equal to
+    features @ matrix.T - offset
+
+    Parameters:
+    -----------
+    projection: fitted PCA, or any linear projection with components_ and
+        optionally mean_ (e.g. TruncatedSVD)
+    """
+    matrix = np.asarray(projection.components_, dtype=np.float64)
+    if getattr(projection, 'whiten', False):
+        matrix = matrix / np.sqrt(projection.explained_variance_)[:, None]
+    mean = getattr(projection, 'mean_', None)
+    if mean is None:
+        return matrix, np.zeros(len(matrix))
+    return matrix, matrix @ np.asarray(mean, dtype=np.float64)
+
+
+def is_exportable(model):
+    """
+    whether model is a fitted SVC with a linear kernel and probabilities
+    """
+    return (getattr(model, 'kernel', None) == 'linear' and
+        getattr(model, 'probability', False) and
+        hasattr(model, 'support_vectors_') and
+        hasattr(model, 'classes_') and
+        len(getattr(model, 'classes_', ())) > 1)
+
+
+def compile_model(model):
+    """
+    The LinearSVMEngine of model when it can be exported, else model itself
+    """
+    if is_exportable(model):
+        return LinearSVMEngine.from_model(model)
+    return model
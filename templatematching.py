@@ -1,6 +1,6 @@
-from skimage.feature import match_template
-from skimage.filters import threshold_otsu
-from skimage.io import imread
+import numpy as np
+import hashlib
+import threading
 import os.path
 
 # characters that should be clearly examined using template matching
@@ -13,6 +13,162 @@ similar_characters = {
     '0':['D', 'Q'], 'D':['0', 'Q'], 'Q':['D', '0'], '7':['Z']
 }
 
+# number of template images of each character in the training directory
+templates_per_label = 10
+
+# every character that can take part in a template match
+template_labels = sorted(confusing_chars.union(*similar_characters.values()))
+
+
+class TemplateBank():
+
+    def __init__(self, labels, templates):
+        """
+        Binarized template images kept in memory so each match is a single
+        matrix multiplication instead of reading images from disk.
+
+        Parameters:
+        -----------
+        labels: list of the characters in the bank
+        templates: 4D numpy array (label, template, row, column) of the
+            binary template images
+        """
+        self.labels = list(labels)
+        self.label_index = {label: index for index, label in enumerate(self.labels)}
+        self.templates = np.ascontiguousarray(templates, dtype=np.float64)
+
+        # the normalized cross correlation of match_template is the dot
+        # product of the mean centred image and template divided by their
+        # norms, the template half of it is done here once
+        flat = self.templates.reshape(-1, self.templates[0, 0].size)
+        centred = flat - flat.mean(axis=1, keepdims=True)
+        self.template_norms = np.sqrt(np.sum(centred ** 2, axis=1))
+        valid = self.template_norms > 0
+        self.normalized = np.zeros_like(centred)
+        self.normalized[valid] = centred[valid] / self.template_norms[valid, None]
+
+    @classmethod
+    def from_directory(cls, training_dir, labels=None, cache_path=None):
+        """
+        Reads and thresholds the template images of the labels. When
+        cache_path is given the bank is stored there as a .npz file and read
+        back on the next call as long as the template images did not change.
+
+        Parameters:
+        -----------
+        training_dir: the directory for the images that will be used in matching
+        labels: list of the characters to load (default: template_labels)
+        cache_path: str; optional .npz file caching the decoded bank
+
+        Returns:
+        --------
+        TemplateBank
+        """
+        if labels is None:
+            labels = template_labels
+        image_paths = [[os.path.join(training_dir, label, label+'_'+str(i)+'.jpg')
+            for i in range(templates_per_label)] for label in labels]
+        signature = template_signature([each for label_paths in image_paths
+            for each in label_paths])
+
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with np.load(cache_path) as cached:
+                    if (str(cached['signature']) == signature and
+                            cached['labels'].tolist() == list(labels)):
+                        return cls(labels, cached['templates'])
+            except (OSError, ValueError, KeyError):
+                # unreadable cache, it is rebuilt below
+                pass
+
+        templates = np.array([[read_template(image_dir)
+            for image_dir in label_paths] for label_paths in image_paths])
+        bank = cls(labels, templates)
+        if cache_path:
+            bank.save(cache_path, signature)
+        return bank
+
+    def save(self, cache_path, signature=''):
+        np.savez(cache_path, labels=np.array(self.labels),
+            templates=self.templates.astype(bool), signature=np.array(signature))
+
+    def fraction_scores(self, images, labels=None):
+        """
+        Average normalized cross correlation of every image against the ten
+        templates of every label, computed in one vectorized operation.
+
+        Parameters:
+        -----------
+        images: 2D numpy array with one flattened 20X20 image per row
+        labels: list of the characters to score (default: every label)
+
+        Returns:
+        --------
+        2D numpy array (image, label) of the match fractions
+        """
+        images = np.asarray(images, dtype=np.float64).reshape(len(images), -1)
+        if labels is None:
+            label_indices = np.arange(len(self.labels))
+        else:
+            label_indices = np.array([self.label_index[label] for label in labels])
+        normalized = self.normalized.reshape(len(self.labels),
+            templates_per_label, -1)[label_indices].reshape(
+            len(label_indices) * templates_per_label, -1)
+
+        centred = images - images.mean(axis=1, keepdims=True)
+        image_norms = np.sqrt(np.sum(centred ** 2, axis=1))
+        correlation = centred.dot(normalized.T)
+        valid = image_norms > np.finfo(np.float64).eps
+        correlation[valid] /= image_norms[valid, None]
+        # match_template returns zero where the image has no contrast
+        correlation[~valid] = 0
+        return correlation.reshape(len(images), len(label_indices),
+            templates_per_label).mean(axis=2)
+
+
+def read_template(image_dir):
+    # skimage is only imported when the bank is built from the images, the
+    # character tables above are imported by dbAspect and fuzzymatch too
+    from skimage.filters import threshold_otsu
+    from skimage.io import imread
+
+    image_sample = imread(image_dir, as_gray=True)
+    return image_sample < threshold_otsu(image_sample)
+
+
+def template_signature(image_paths):
+    """
+    hash of the names, sizes and modification times of the template images
+    """
+    digest = hashlib.sha1()
+    for image_dir in image_paths:
+        stat = os.stat(image_dir)
+        digest.update('{}:{}:{};'.format(os.path.basename(image_dir),
+            stat.st_size, stat.st_mtime_ns).encode('utf-8'))
+    return digest.hexdigest()
+
+
+# template banks already loaded in this process keyed by training directory
+# and labels
+_banks = {}
+_banks_lock = threading.Lock()
+
+
+def get_template_bank(training_dir, cache_path=None, labels=None):
+    """
+    Returns the template bank of training_dir, reading the images only on
+    the first call
+
+    labels: list of the characters of the bank (default: template_labels)
+    """
+    key = (os.path.realpath(training_dir), tuple(labels) if labels else None)
+    with _banks_lock:
+        if key not in _banks:
+            _banks[key] = TemplateBank.from_directory(training_dir, labels,
+                cache_path=cache_path)
+        return _banks[key]
+
+
 def template_match(predicted_label, image_data, training_dir):
     """
     applies the concept of template matching to determine the
@@ -30,30 +186,52 @@ def template_match(predicted_label, image_data, training_dir):
     ---------
     The label with the highest match value
     """
-    image_data = image_data.reshape(20, 20)
-    prediction_fraction = fraction_match(predicted_label, training_dir,
-        image_data)
-    highest_fraction = prediction_fraction
-    highest_fraction_label = predicted_label
-    similar_labels_list = similar_characters[predicted_label]
+    return template_match_many([predicted_label], [image_data], training_dir)[0]
 
-    for each_similar_label in similar_labels_list:
-        match_value = fraction_match(each_similar_label, training_dir,
-            image_data)
-        if match_value > highest_fraction:
-            highest_fraction = match_value
-            highest_fraction_label = each_similar_label
 
-    return highest_fraction_label
-    
+def template_match_many(predicted_labels, images, training_dir):
+    """
+    template_match for several characters, every image is matched against
+    the whole template bank in one operation
+
+    Parameters:
+    ------------
+    predicted_labels: list of the characters predicted by the model
+    images: list of the 20X20 images (or flattened ones) of the characters
+    training_dir: the directory for the images that will be used in matching
+
+    Returns:
+    ---------
+    list of the label with the highest match value of each character
+    """
+    bank = get_template_bank(training_dir)
+    images = np.array([np.reshape(each, -1) for each in images])
+    scores = bank.fraction_scores(images)
+
+    best_labels = []
+    for image_scores, predicted_label in zip(scores, predicted_labels):
+        if predicted_label not in similar_characters:
+            # nothing it could be mistaken for
+            best_labels.append(predicted_label)
+            continue
+        highest_fraction_label = predicted_label
+        highest_fraction = image_scores[bank.label_index[predicted_label]]
+        for each_similar_label in similar_characters.get(predicted_label, []):
+            match_value = image_scores[bank.label_index[each_similar_label]]
+            if match_value > highest_fraction:
+                highest_fraction = match_value
+                highest_fraction_label = each_similar_label
+        best_labels.append(highest_fraction_label)
+
+    return best_labels
+
 
 def fraction_match(label, training_dir, image_data):
-    fraction = 0
-    for i in range(10):
-        image_dir = os.path.join(training_dir, label, label+'_'+str(i)+'.jpg')
-        image_sample = imread(image_dir, as_grey=True)
-        image_sample = image_sample < threshold_otsu(image_sample)
-        match_fraction = match_template(image_data, image_sample)
-
-        fraction += (match_fraction[0, 0] / 10)
-    return fraction
\ No newline at end of file
+    """
+    average match of image_data against the templates of any label, the
+    ones outside template_labels are read into a bank of their own
+    """
+    bank = get_template_bank(training_dir)
+    if label not in bank.label_index:
+        bank = get_template_bank(training_dir, labels=[label])
+    return bank.fraction_scores(np.reshape(image_data, (1, -1)), [label])[0, 0]
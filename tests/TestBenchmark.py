@@ -0,0 +1,43 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+from benchmark import generate_scene, measure, compare, generate_registry, miss_plate
+from recognition import Recognizer
+
+
+class TestBenchmark():
+
+    def test_generated_scene(self):
+        print('The generated scenes should go through the whole pipeline')
+        scene = generate_scene(480, 640)
+        assert scene.shape == (480, 640) and scene.dtype == np.uint8
+        assert Recognizer().recognize(scene).plate_text == 'EGB626AA'
+
+    def test_measure(self):
+        result = measure(sorted, lambda: (list(range(1000, 0, -1)),), repeat=5)
+        assert result['runs'] == 5
+        assert 0 < result['min_ms'] <= result['median_ms'] <= result['p95_ms']
+        assert result['peak_kib'] > 0
+
+    def test_compare(self):
+        print('A median slower than the threshold should be a regression')
+        baseline = {'results': [
+            {'benchmark': 'ocr', 'input': 'car10.jpg', 'median_ms': 1.0},
+            {'benchmark': 'preprocess', 'input': 'car10.jpg', 'median_ms': 1.0}]}
+        results = [
+            {'benchmark': 'ocr', 'input': 'car10.jpg', 'median_ms': 1.1},
+            {'benchmark': 'preprocess', 'input': 'car10.jpg', 'median_ms': 1.5}]
+        assert compare(baseline, results, 0.2) == [('preprocess', 'car10.jpg')]
+
+    def test_miss_query(self):
+        print('The missing plate should be as long as the registered ones so')
+        print('the lookup searches the index')
+        directory = tempfile.mkdtemp()
+        try:
+            plates = generate_registry(os.path.join(directory, 'registry.csv'), 50)
+            missing = [miss_plate(plate) for plate in plates]
+            assert all(len(each) == len(plates[0]) for each in missing)
+            assert not set(missing) & set(plates)
+        finally:
+            shutil.rmtree(directory)
@@ -0,0 +1,34 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)),
+    '..', 'ml_code'))
+from ml_config import MachineLearningConfig
+from compare_models import compare_models, summarize
+
+
+class TestCompareModels():
+
+    def test_summarize(self):
+        print('Fold results should be averaged per model, best model first')
+        fold_results = [
+            {'model': 'a', 'accuracy': 0.8, 'fit_seconds': 1.0,
+                'glyphs_per_second': 100.0, 'single_glyph_ms': 1.0, 'size_kib': 10.0},
+            {'model': 'a', 'accuracy': 0.9, 'fit_seconds': 3.0,
+                'glyphs_per_second': 300.0, 'single_glyph_ms': 2.0, 'size_kib': 10.0},
+            {'model': 'b', 'accuracy': 0.95, 'fit_seconds': 1.0,
+                'glyphs_per_second': 50.0, 'single_glyph_ms': 5.0, 'size_kib': 99.0}]
+        summary = summarize(fold_results)
+        assert [each['model'] for each in summary] == ['b', 'a']
+        assert summary[1]['folds'] == 2
+        assert abs(summary[1]['accuracy'] - 0.85) < 1e-9
+        assert summary[1]['fit_seconds'] == 2.0
+
+    def test_compare_models(self):
+        training_directory = MachineLearningConfig().training_data[0]
+        summary, fold_results = compare_models(training_directory,
+            ['Decision Tree', '3-neighbor'], folds=2, workers=2)
+        assert len(fold_results) == 4
+        for each in summary:
+            assert each['accuracy'] > 0.5
+            assert each['glyphs_per_second'] > 0 and each['size_kib'] > 0
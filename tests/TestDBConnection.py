@@ -0,0 +1,170 @@
+import gc
+import os
+import shutil
+import weakref
+import tempfile
+import threading
+import numpy as np
+from full import LOOKUP_MAX_DISTANCE
+from dbAspect import DBConnection, AlprLogWriter, normalize_plate
+
+
+class TestDBConnection():
+
+    @classmethod
+    def setup_class(self):
+        self.directory = tempfile.mkdtemp()
+        data_file = os.path.join(self.directory, 'vehicles.csv')
+        with open(data_file, 'w') as f:
+            f.write('plate_number,owner,issue_date,expiry_date,chasis_number,type\n')
+            f.write('EGB-626AA,Ada Obi,2020-01-01,2025-01-01,CH123,Car\n')
+            f.write('KJA 123 XY,Tunde Ola,2019-05-05,2024-05-05,CH456,Bus\n')
+            f.write('EGB626AA,Duplicate,2021-01-01,2026-01-01,CH789,Car\n')
+        self.data_file = data_file
+        self.db_aspect = DBConnection(data_file)
+
+    @classmethod
+    def teardown_class(self):
+        shutil.rmtree(self.directory)
+
+    def test_normalize_plate(self):
+        print('Plates are compared without case, spaces or dashes')
+        assert normalize_plate('kja 123-xy') == 'KJA123XY'
+
+    def test_get_vehicle_info(self):
+        print('A lookup should ignore the formatting of the plate')
+        vehicle_info = self.db_aspect.get_vehicle_info('KJA123XY')
+        assert vehicle_info['owner'] == 'Tunde Ola'
+        assert vehicle_info['chassis'] == 'CH456'
+
+    def test_first_duplicate_wins(self):
+        print('The first row of a duplicated plate should be returned')
+        assert self.db_aspect.get_vehicle_info('EGB626AA')['owner'] == 'Ada Obi'
+
+    def test_unknown_plate(self):
+        assert self.db_aspect.get_vehicle_info('XXX000XX') is None
+
+    def test_fuzzy_lookup(self):
+        print('A misread look-alike character should find the closest plate')
+        assert self.db_aspect.get_vehicle_info('KJA1Z3XY') is None
+        vehicle_info = self.db_aspect.get_vehicle_info('KJA1Z3XY', max_distance=1.0)
+        assert vehicle_info['owner'] == 'Tunde Ola'
+        assert vehicle_info['plate_number'] == 'KJA123XY'
+        assert vehicle_info['distance'] == 0.5
+
+    def test_lookup_distance(self):
+        print('The GUI lookup should only forgive look-alike characters')
+        vehicle_info = self.db_aspect.get_vehicle_info('KJA1Z3XY', LOOKUP_MAX_DISTANCE)
+        assert vehicle_info['plate_number'] == 'KJA123XY'
+        assert self.db_aspect.get_vehicle_info('KJA128XY', LOOKUP_MAX_DISTANCE) is None
+
+    def test_find_similar_vehicles(self):
+        matches = self.db_aspect.find_similar_vehicles('EG8626A', max_distance=1.5)
+        assert [each['owner'] for each in matches] == ['Ada Obi']
+        assert self.db_aspect.find_similar_vehicles('XXX000XX') == []
+
+    def test_cached_dataset(self):
+        print('A second connection should read the binary cache')
+        cached = DBConnection(self.data_file)
+        assert isinstance(cached.vehicle_table, np.memmap)
+        assert cached.get_vehicle_info('egb 626aa')['owner'] == 'Ada Obi'
+
+    def test_cache_rebuilt_on_change(self):
+        print('The cache should be rebuilt when the dataset changes')
+        data_file = os.path.join(self.directory, 'changed.csv')
+        shutil.copy(self.data_file, data_file)
+        DBConnection(data_file)
+        with open(data_file, 'a') as f:
+            f.write('LND555AB,New Owner,2022-01-01,2027-01-01,CH999,Car\n')
+        assert DBConnection(data_file).get_vehicle_info('LND555AB')['owner'] == 'New Owner'
+
+
+class TestAlprLogWriter():
+
+    @classmethod
+    def setup_class(self):
+        self.directory = tempfile.mkdtemp()
+
+    @classmethod
+    def teardown_class(self):
+        shutil.rmtree(self.directory)
+
+    def test_rows_written_on_flush(self):
+        print('Queued rows should be on disk after a flush')
+        filename = os.path.join(self.directory, 'log.csv')
+        writer = AlprLogWriter(filename, flush_every=1000, flush_interval=60)
+        for index in range(5):
+            writer.write('EGB626AA', str(index))
+        writer.flush()
+        with open(filename) as f:
+            assert len(f.readlines()) == 6
+        writer.close()
+
+    def test_rows_written_on_close(self):
+        print('Closing the writer should write the queued rows')
+        filename = os.path.join(self.directory, 'closed.csv')
+        db_aspect = DBConnection(os.path.join(self.directory, 'none.csv'),
+            log_file=filename)
+        db_aspect.save_alpr('KJA123XY', 'now')
+        db_aspect.close()
+        with open(filename) as f:
+            assert f.read().splitlines() == ['Plate Number,Timestamp', 'KJA123XY,now']
+
+    def test_save_after_close(self):
+        print('Saving after close should start a new writer')
+        filename = os.path.join(self.directory, 'reopened.csv')
+        db_aspect = DBConnection(os.path.join(self.directory, 'none.csv'),
+            log_file=filename)
+        db_aspect.save_alpr('KJA123XY', 'first')
+        db_aspect.close()
+        db_aspect.save_alpr('EGB626AA', 'second')
+        db_aspect.close()
+        with open(filename) as f:
+            assert f.read().splitlines() == ['Plate Number,Timestamp',
+                'KJA123XY,first', 'EGB626AA,second']
+
+    def test_write_during_close(self):
+        print('A row should be written or refused, never lost, while closing')
+        filename = os.path.join(self.directory, 'racing.csv')
+        writer = AlprLogWriter(filename, flush_every=1000, flush_interval=60)
+        accepted = []
+
+        def write_rows(name):
+            for index in range(200):
+                try:
+                    writer.write(name, str(index))
+                except ValueError:
+                    return
+                accepted.append(name)
+
+        threads = [threading.Thread(target=write_rows, args=(name,))
+            for name in ('EGB626AA', 'KJA123XY')]
+        for thread in threads:
+            thread.start()
+        writer.close()
+        for thread in threads:
+            thread.join()
+        with open(filename) as f:
+            assert len(f.readlines()) == len(accepted) + 1
+
+    def test_closed_writer_released(self):
+        print('A closed writer should not be kept alive by the exit handler')
+        writer = AlprLogWriter(os.path.join(self.directory, 'released.csv'))
+        writer.close()
+        reference = weakref.ref(writer)
+        del writer
+        gc.collect()
+        assert reference() is None
+
+    def test_size_rotation(self):
+        print('The log should be rotated when it reaches max_bytes')
+        filename = os.path.join(self.directory, 'rotated.csv')
+        writer = AlprLogWriter(filename, flush_every=1, max_bytes=50,
+            backup_count=2)
+        for index in range(20):
+            writer.write('EGB626AA', str(index))
+            writer.flush()
+        writer.close()
+        assert os.path.exists(os.path.join(self.directory, 'rotated.1.csv'))
+        assert os.path.exists(os.path.join(self.directory, 'rotated.2.csv'))
+        assert not os.path.exists(os.path.join(self.directory, 'rotated.3.csv'))
@@ -0,0 +1,39 @@
+import os.path as path
+import numpy as np
+from skimage.io import imread
+from skimage.filters import threshold_otsu
+from deepMachine import DeepMachineLearning
+import modelregistry
+
+
+class TestDeepMachine():
+
+    @classmethod
+    def setup_class(self):
+        root = path.split(path.dirname(path.realpath(__file__)))[0]
+        self.model = modelregistry.get_model(path.join(root, 'ml_models',
+            'SVC_model', 'SVC_model.pkl'))
+        self.deep_learn = DeepMachineLearning()
+        glyphs = []
+        for each_letter in ['A', 'B', 'E', 'G', '6', '2']:
+            image = imread(path.join(root, 'training_data', 'train20X20',
+                each_letter, each_letter + '_0.jpg'), as_gray=True)
+            glyphs.append(image < threshold_otsu(image))
+        self.glyphs = np.array(glyphs)
+
+    def test_classify_many_matches_single_plates(self):
+        print('Classifying several plates at once should give the same result')
+        print('as classifying each plate on its own')
+        plates = [self.glyphs[:4], self.glyphs[4:]]
+        together = self.deep_learn.classify_many(plates, self.model, (20, 20))
+        for each_plate, each_result in zip(plates, together):
+            alone = self.deep_learn.classify_with_confidence(each_plate,
+                self.model, (20, 20))
+            assert each_result[0] == alone[0]
+            assert np.allclose(each_result[1], alone[1])
+
+    def test_single_character_image(self):
+        print('A 2D array is classified as one character')
+        text = self.deep_learn.classify_objects(self.glyphs[0], self.model,
+            (20, 20))
+        assert len(text) == 1
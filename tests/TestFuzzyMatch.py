@@ -0,0 +1,62 @@
+import random
+from fuzzymatch import (FuzzyPlateIndex, canonical_plate, confusion_class,
+    plate_distance)
+
+
+class TestFuzzyMatch():
+
+    @classmethod
+    def setup_class(self):
+        plates = ['EGB626AA', 'KJA123XY', 'LND555AB', 'ABC1234', 'ZZ8800QD']
+        self.index = FuzzyPlateIndex((plate, position)
+            for position, plate in enumerate(plates))
+
+    def test_confusion_classes(self):
+        print('Characters similar to each other should share a class')
+        assert confusion_class['Z'] == confusion_class['7'] == '2'
+        assert confusion_class['B'] == confusion_class['R'] == '8'
+        assert canonical_plate('EG8626AA') == canonical_plate('EGB626AA')
+
+    def test_plate_distance(self):
+        print('A confusable substitution should cost less than other edits')
+        assert plate_distance('EGB626AA', 'EGB626AA') == 0
+        assert plate_distance('EG8626AA', 'EGB626AA') == 0.5
+        assert plate_distance('EGX626AA', 'EGB626AA') == 1
+        assert plate_distance('EGB626A', 'EGB626AA') == 1
+        assert plate_distance('E6B626AA', 'EGB626AA') == 1
+
+    def test_confusable_misreads(self):
+        print('Several look-alike misreads should still find the plate')
+        assert self.index.search('EG86Z6AA', 1.0) == [('EGB626AA', 1.0, 0)]
+        assert self.index.search('LND5SSA8', 0.5) == []
+        assert self.index.search('LND5SSA8', 1.5)[0][0] == 'LND555AB'
+
+    def test_one_other_edit(self):
+        print('A missing, extra or wrong character should be found')
+        assert self.index.search('KJA12XY')[0][:2] == ('KJA123XY', 1.0)
+        assert self.index.search('KJA1234XY')[0][:2] == ('KJA123XY', 1.0)
+        assert self.index.search('KJM123XY')[0][:2] == ('KJA123XY', 1.0)
+        assert self.index.search('KJM123XY', 0.5) == []
+
+    def test_same_as_scan(self):
+        print('The index should return what a scan of every plate returns')
+        rng = random.Random(4)
+        alphabet = '0123456789ABCDEFGHJKLMNPQRSTUVWXYZ'
+        plates = [''.join(rng.choice(alphabet) for _ in range(rng.randint(6, 8)))
+            for _ in range(500)]
+        index = FuzzyPlateIndex((plate, position)
+            for position, plate in enumerate(plates))
+        for plate in plates[:100]:
+            query = list(plate)
+            query[rng.randrange(len(query))] = rng.choice(alphabet)
+            if rng.random() < 0.5:
+                del query[rng.randrange(len(query))]
+            query = ''.join(query)
+            expected = sorted((each, plate_distance(query, each), position)
+                for position, each in enumerate(plates)
+                if plate_distance(query, each) <= 1.5)
+            found = index.search(query, 1.5, limit=len(plates))
+            # more than one other edit is out of the index reach
+            expected = [each for each in expected
+                if plate_distance(canonical_plate(query), canonical_plate(each[0])) <= 1]
+            assert sorted(found) == expected
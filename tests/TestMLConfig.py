@@ -0,0 +1,77 @@
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)),
+    '..', 'ml_code'))
+from ml_config import MachineLearningConfig
+
+
+class TestMLConfig():
+
+    @classmethod
+    def setup_class(self):
+        self.directory = tempfile.mkdtemp()
+        self.config = MachineLearningConfig()
+        self.config.letters = ['A', '8']
+        self.config.cache_directory = os.path.join(self.directory, 'cache')
+        self.training_dir = os.path.join(self.directory, 'train20X20')
+        for letter in self.config.letters:
+            shutil.copytree(os.path.join(self.config.training_data[0], letter),
+                os.path.join(self.training_dir, letter))
+
+    @classmethod
+    def teardown_class(self):
+        shutil.rmtree(self.directory)
+
+    def test_cached_training_data(self):
+        print('The cached training data should equal the decoded one')
+        image_data, target_data = self.config.read_training_data(
+            self.training_dir, use_cache=False)
+        assert image_data.shape == (20, 400) and image_data.dtype == bool
+        assert target_data.tolist() == ['A'] * 10 + ['8'] * 10
+
+        self.config.read_training_data(self.training_dir)
+        assert os.path.exists(self.config.training_cache_path(self.training_dir))
+        cached_data, cached_target = self.config.read_training_data(self.training_dir)
+        assert cached_data.dtype == bool
+        assert np.array_equal(cached_data, image_data)
+        assert np.array_equal(cached_target, target_data)
+
+    def test_cache_invalidated(self):
+        print('Changing an image should rebuild the cache')
+        image_data, target_data = self.config.read_training_data(self.training_dir)
+        changed = os.path.join(self.training_dir, 'A', 'A_0.jpg')
+        shutil.copy(os.path.join(self.training_dir, '8', '8_0.jpg'), changed)
+        os.utime(changed, ns=(0, 0))
+        new_data, new_target = self.config.read_training_data(self.training_dir)
+        assert np.array_equal(new_data[0], image_data[10])
+
+    def test_concurrent_cache_writes(self):
+        print('Writers of the same cache should not share a temporary file')
+        image_data, target_data = self.config.read_training_data(
+            self.training_dir, use_cache=False)
+        cache_path = os.path.join(self.config.cache_directory, 'shared.npz')
+        errors = []
+
+        def write_cache():
+            try:
+                self.config.write_training_cache(cache_path, 'signature',
+                    image_data, target_data)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=write_cache) for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        assert not [each for each in os.listdir(self.config.cache_directory)
+            if each.endswith('.tmp.npz')]
+        cached_data, cached_target = self.config.read_training_cache(cache_path,
+            'signature')
+        assert np.array_equal(cached_data, image_data)
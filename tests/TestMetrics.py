@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import urllib.request
+import modelregistry
+from metrics import (MetricsRegistry, PipelineMetrics, record_result,
+    record_lookup, record_model_cache)
+from recognition import RecognitionResult
+
+
+class TestMetrics():
+
+    @classmethod
+    def setup_class(self):
+        self.directory = tempfile.mkdtemp()
+
+    @classmethod
+    def teardown_class(self):
+        shutil.rmtree(self.directory)
+
+    def test_counter(self):
+        registry = MetricsRegistry()
+        counter = registry.counter('alpr_test_total', 'Test counter')
+        counter.inc()
+        counter.inc(2, stage='ocr')
+        assert registry.counter('alpr_test_total', 'Test counter') is counter
+        text = registry.render()
+        assert '# TYPE alpr_test_total counter' in text
+        assert 'alpr_test_total 1\n' in text
+        assert 'alpr_test_total{stage="ocr"} 2\n' in text
+
+    def test_histogram(self):
+        print('Buckets should be cumulative and percentiles recent')
+        registry = MetricsRegistry()
+        histogram = registry.histogram('alpr_test_seconds', 'Test histogram',
+            buckets=(0.1, 1.0), window=4)
+        for value in (0.05, 0.5, 0.5, 2.0, 3.0, 4.0):
+            histogram.observe(value)
+        text = registry.render()
+        assert 'alpr_test_seconds_bucket{le="0.1"} 1\n' in text
+        assert 'alpr_test_seconds_bucket{le="1"} 3\n' in text
+        assert 'alpr_test_seconds_bucket{le="+Inf"} 6\n' in text
+        assert 'alpr_test_seconds_count 6\n' in text
+        # only the latest four observations count for the percentiles
+        assert histogram.percentile(0.5) == 3.0
+        assert histogram.percentile(0.0) == 0.5
+
+    def test_record_result(self):
+        metrics = PipelineMetrics(MetricsRegistry())
+        found = RecognitionResult('car.jpg')
+        found.plate_text = 'EGB626AA'
+        found.trace.add('decode', 5000000)
+        found.trace.counts.update(characters=8, template_fallbacks=1)
+        failed = RecognitionResult('empty.jpg')
+        failed.error = ('Character Segmentation', 'No character was segmented')
+        record_result(found, metrics)
+        record_result(failed, metrics)
+        record_lookup(None, metrics)
+        record_lookup({'owner': 'Ada Obi', 'distance': 0.5}, metrics)
+
+        assert metrics.images.value() == 2
+        assert metrics.plates_found.value() == 1
+        assert metrics.plates_not_found.value(stage='segmentation') == 1
+        assert metrics.fallbacks.value() == 1
+        assert metrics.characters.value() == 8
+        assert metrics.stage_seconds.percentile(0.5, stage='decode') == 0.005
+        assert metrics.lookups.value(outcome='fuzzy') == 1
+        assert metrics.lookups.value(outcome='miss') == 1
+
+    def test_worker_model_cache(self):
+        print('Model cache lookups of the batch workers should be added to')
+        print('the counters of this process')
+        registry = MetricsRegistry()
+        metrics = PipelineMetrics(registry)
+        record_model_cache(0, 1, metrics)
+        record_model_cache(3, 0, metrics)
+        text = registry.render()
+        assert '# TYPE alpr_model_cache_hits_total counter' in text
+        assert 'alpr_model_cache_hits_total {}\n'.format(
+            modelregistry.registry.hits + 3) in text
+        assert 'alpr_model_cache_misses_total {}\n'.format(
+            modelregistry.registry.misses + 1) in text
+
+    def test_write_and_serve(self):
+        registry = MetricsRegistry()
+        registry.counter('alpr_test_total', 'Test counter').inc(3)
+        filename = os.path.join(self.directory, 'alpr.prom')
+        registry.write(filename)
+        with open(filename) as f:
+            assert f.read() == registry.render()
+
+        server = registry.serve(0)
+        try:
+            url = 'http://127.0.0.1:{}/metrics'.format(server.server_port)
+            with urllib.request.urlopen(url, timeout=5) as response:
+                assert 'alpr_test_total 3' in response.read().decode('utf-8')
+        finally:
+            server.shutdown()
+            server.server_close()
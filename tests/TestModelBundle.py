@@ -0,0 +1,123 @@
+import os
+import json
+import shutil
+import tempfile
+import numpy as np
+import modelbundle
+import modelregistry
+from modelregistry import ModelRegistry
+from svmengine import LinearSVMEngine
+from recognition import DEFAULT_MODEL_PATH, Recognizer, RecognitionError
+
+
+class TestModelBundle():
+
+    @classmethod
+    def setup_class(self):
+        root = os.path.split(os.path.dirname(os.path.realpath(__file__)))[0]
+        self.directory = tempfile.mkdtemp()
+        self.bundle_path = os.path.join(self.directory, 'bundle')
+        self.engine = modelregistry.load_model_file(os.path.join(root,
+            'ml_models', 'SVC_model', 'SVC_model.pkl'))
+        modelbundle.save_bundle(self.engine, self.bundle_path,
+            training_hash='abc')
+        self.features = np.random.RandomState(0).randint(0, 2,
+            (8, 400)).astype(np.float64)
+
+    @classmethod
+    def teardown_class(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        print('A loaded bundle should classify like the model it was saved from')
+        bundle = modelbundle.load_bundle(self.bundle_path)
+        # a read-only view of the mapped file, not a copy
+        assert not bundle.coef.flags.owndata and not bundle.coef.flags.writeable
+        assert np.array_equal(bundle.classes_, self.engine.classes_)
+        assert np.allclose(bundle.predict_proba(self.features),
+            self.engine.predict_proba(self.features))
+        assert bundle.manifest['training_data_sha256'] == 'abc'
+        assert bundle.manifest['input_size'] == [20, 20]
+
+    def test_shipped_bundle(self):
+        print('The default model should be the shipped bundle')
+        assert modelbundle.is_bundle(DEFAULT_MODEL_PATH)
+        bundle = modelbundle.load_bundle(DEFAULT_MODEL_PATH)
+        assert np.allclose(bundle.predict_proba(self.features),
+            self.engine.predict_proba(self.features))
+
+    def test_projection_bundle(self):
+        print('A bundle with a PCA should keep it and apply it to the glyphs')
+        projection = np.random.RandomState(1).normal(size=(16, 400))
+        coef = np.random.RandomState(2).normal(size=(len(self.engine.coef), 16))
+        engine = LinearSVMEngine(coef, self.engine.intercept, self.engine.prob_a,
+            self.engine.prob_b, self.engine.classes_, projection,
+            np.ones(16))
+        path = os.path.join(self.directory, 'projection')
+        manifest = modelbundle.save_bundle(engine, path)
+        assert manifest['format_version'] == 2
+        assert manifest['preprocessing']['projection']['components'] == 16
+        bundle = modelbundle.load_bundle(path)
+        assert np.allclose(bundle.projection, projection)
+        assert np.allclose(bundle.predict_proba(self.features),
+            engine.predict_proba(self.features))
+
+    def test_newer_format_rejected(self):
+        print('A bundle of a newer format or with a wrong array should not load')
+        path = os.path.join(self.directory, 'newer')
+        manifest = modelbundle.save_bundle(self.engine, path)
+        manifest['format_version'] = modelbundle.FORMAT_VERSION + 1
+        with open(modelbundle.manifest_path(path), 'w') as f:
+            json.dump(manifest, f)
+        try:
+            modelbundle.load_bundle(path)
+            assert False, 'expected a ValueError'
+        except ValueError:
+            pass
+
+        manifest['format_version'] = modelbundle.FORMAT_VERSION
+        manifest['arrays']['coef']['shape'] = [1, 400]
+        with open(modelbundle.manifest_path(path), 'w') as f:
+            json.dump(manifest, f)
+        try:
+            modelbundle.load_bundle(path)
+            assert False, 'expected a ValueError'
+        except ValueError:
+            pass
+
+    def test_input_size(self):
+        print('The recognizer should resize the characters to the input size')
+        print('of the bundle, a bundle of another size should not load')
+        bundle = modelbundle.load_bundle(self.bundle_path)
+        assert Recognizer().input_size(bundle) == (20, 20)
+        try:
+            Recognizer(tuple_size=(32, 32)).input_size(bundle)
+            assert False, 'expected a RecognitionError'
+        except RecognitionError:
+            pass
+
+        path = os.path.join(self.directory, 'resized')
+        try:
+            modelbundle.save_bundle(self.engine, path, input_size=(32, 32))
+            assert False, 'expected a ValueError'
+        except ValueError:
+            pass
+        manifest = modelbundle.save_bundle(self.engine, path)
+        manifest['input_size'] = [32, 32]
+        with open(modelbundle.manifest_path(path), 'w') as f:
+            json.dump(manifest, f)
+        try:
+            modelbundle.load_bundle(path)
+            assert False, 'expected a ValueError'
+        except ValueError:
+            pass
+
+    def test_registry_reloads_changed_bundle(self):
+        print('The registry should reload a bundle when its manifest changes')
+        registry = ModelRegistry()
+        first = registry.get_model(self.bundle_path)
+        assert registry.get_model(self.bundle_path) is first
+        manifest_path = modelbundle.manifest_path(self.bundle_path)
+        mtime = os.path.getmtime(manifest_path)
+        os.utime(manifest_path, (mtime + 10, mtime + 10))
+        assert registry.get_model(self.bundle_path) is not first
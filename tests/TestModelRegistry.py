@@ -0,0 +1,37 @@
+import os
+import tempfile
+from modelregistry import ModelRegistry
+
+
+class TestModelRegistry():
+
+    @classmethod
+    def setup_class(self):
+        self.loaded = []
+        self.registry = ModelRegistry(loader=self.fake_loader)
+        handle, self.model_path = tempfile.mkstemp(suffix='.pkl')
+        os.close(handle)
+
+    @classmethod
+    def teardown_class(self):
+        os.remove(self.model_path)
+
+    @classmethod
+    def fake_loader(self, model_path):
+        self.loaded.append(model_path)
+        return object()
+
+    def test_model_loaded_once(self):
+        print('The model should only be read on the first request')
+        first = self.registry.get_model(self.model_path)
+        second = self.registry.get_model(self.model_path)
+        assert first is second
+        assert len(self.loaded) == 1
+
+    def test_reload_when_file_changes(self):
+        print('A changed modification time should reload the model')
+        first = self.registry.get_model(self.model_path)
+        mtime = os.path.getmtime(self.model_path)
+        os.utime(self.model_path, (mtime + 10, mtime + 10))
+        second = self.registry.get_model(self.model_path)
+        assert first is not second
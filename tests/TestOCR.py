@@ -0,0 +1,24 @@
+import numpy as np
+from ocr import OCROnObjects
+
+
+class TestOCR():
+
+    @classmethod
+    def setup_class(self):
+        # a 100X300 plate with three character like blocks
+        self.plate = np.zeros((100, 300), dtype=bool)
+        for start_col in (40, 120, 200):
+            self.plate[30:75, start_col:start_col + 25] = True
+
+    def test_get_regions(self):
+        print('Every character should be resized into one 3D array')
+        candidates = OCROnObjects(self.plate).candidates
+        assert candidates['fullscale'].shape == (3, 20, 20)
+        assert candidates['columnsVal'] == [40, 120, 200]
+
+    def test_compact_dtype(self):
+        print('The characters can be returned as uint8')
+        candidates = OCROnObjects(self.plate, np.uint8).candidates
+        assert candidates['fullscale'].dtype == np.uint8
+        assert candidates['fullscale'].max() == 1
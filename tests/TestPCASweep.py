@@ -0,0 +1,29 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)),
+    '..', 'ml_code'))
+from ml_config import MachineLearningConfig
+from pca_sweep import recommend, sweep
+
+
+class TestPCASweep():
+
+    def test_recommend(self):
+        print('The smallest count without an accuracy loss should be picked')
+        summary = [{'components': 400, 'accuracy': 0.95},
+            {'components': 10, 'accuracy': 0.90},
+            {'components': 40, 'accuracy': 0.95},
+            {'components': 20, 'accuracy': 0.96}]
+        assert recommend(summary) == 20
+        assert recommend(summary, tolerance=0.05) == 10
+        assert recommend(summary[:2]) is None
+
+    def test_sweep(self):
+        training_directory = MachineLearningConfig().training_data[0]
+        summary = sweep(training_directory, [20], folds=2, workers=2)
+        assert [each['pca'] for each in summary] == [False, True]
+        assert summary[0]['components'] == 400 and summary[1]['components'] == 20
+        for each in summary:
+            assert each['accuracy'] > 0.5 and each['glyphs_per_second'] > 0
+        assert summary[1]['size_kib'] < summary[0]['size_kib']
@@ -1,18 +1,87 @@
 from preprocess import PreProcess
 import os.path as path
+import warnings
+import numpy as np
 from skimage.io import imread
+from skimage.filters import threshold_otsu
+from skimage import measure
+
+
+def regionprops_plate_regions(label_image, plate_dimensions):
+    """
+    the regionprops loop filter_plate_regions replaced
+    """
+    minHeight, maxHeight, minWidth, maxWidth = plate_dimensions
+    bboxes = []
+    for region in measure.regionprops(label_image):
+        if region.area < 10:
+            continue
+        minRow, minCol, maxRow, maxCol = region.bbox
+        regionHeight = maxRow - minRow
+        regionWidth = maxCol - minCol
+        if (minHeight <= regionHeight <= maxHeight and
+                minWidth <= regionWidth <= maxWidth and
+                regionWidth > regionHeight):
+            bboxes.append((minRow, minCol, maxRow, maxCol))
+    return bboxes
+
+
 class TestPreProcess():
 
     @classmethod
     def setup_class(self):
         image_path = path.join(path.dirname(path.realpath(__file__)))
-        image_path = path.join(path.split(image_path)[0], 'test_images',
-            'car6.jpg')
-        self.image_array = imread(image_path, as_grey=True)
+        self.image_directory = path.join(path.split(image_path)[0], 'test_images')
+        image_path = path.join(self.image_directory, 'car6.jpg')
+        self.image_array = imread(image_path, as_gray=True)
         self.pre_process = PreProcess(image_path)
 
     def test_resize_if_necessary(self):
-        print 'Testing the resize function'
+        print('Testing the resize function')
         resized_image = self.pre_process.resize_if_necessary(
             self.image_array)
-        assert resized_image.shape == (470, 600)
\ No newline at end of file
+        assert resized_image.shape == (470, 600)
+
+    def test_otsu_thresholds(self):
+        print('The shared histogram thresholds should equal threshold_otsu')
+        rng = np.random.RandomState(0)
+        candidates = [rng.rand(20, 60) ** 2, rng.rand(15, 40), np.full((5, 9), 0.3)]
+        offsets = np.cumsum([0] + [each.size for each in candidates[:-1]])
+        with warnings.catch_warnings():
+            # a constant candidate must not warn about dividing by zero
+            warnings.simplefilter('error', RuntimeWarning)
+            thresholds = self.pre_process.otsu_thresholds(
+                np.concatenate([each.ravel() for each in candidates]), offsets)
+        for each_candidate, each_threshold in zip(candidates, thresholds):
+            assert each_threshold == threshold_otsu(each_candidate)
+
+    def test_filter_plate_regions(self):
+        print('The array filter should keep the regions the regionprops loop kept')
+        for image_name in ('car6.jpg', 'car10.jpg'):
+            pre_process = PreProcess(path.join(self.image_directory, image_name))
+            pre_process.get_plate_like_objects()
+            dimensions = pre_process.plate_dimensions(pre_process.binary_image.shape)
+            assert pre_process.plate_objects_cordinates
+            assert pre_process.plate_objects_cordinates == regionprops_plate_regions(
+                pre_process.label_image, dimensions)
+
+        label_image = np.zeros((60, 100), dtype=int)
+        label_image[2:8, 2:30] = 1     # a plate
+        label_image[10, 2] = label_image[16, 29] = 2    # plate box, area 2
+        label_image[20:48, 40:52] = 3  # taller than wide
+        label_image[50:58, 60:68] = 4  # square
+        label_image[20:28, 60:99] = 5  # another plate
+        dimensions = (5, 30, 10, 40)
+        bboxes = self.pre_process.filter_plate_regions(label_image, dimensions)
+        assert [tuple(each) for each in bboxes.tolist()] == \
+            regionprops_plate_regions(label_image, dimensions) == \
+            [(2, 2, 8, 30), (20, 60, 28, 99)]
+
+    def test_validate_plate_ranking(self):
+        print('validate_plate should return the best ranked candidate')
+        candidates = self.pre_process.get_plate_like_objects()
+        license_plate = self.pre_process.validate_plate(candidates)
+        scores = [score for index, score, plate in self.pre_process.plate_ranking]
+        assert scores == sorted(scores, reverse=True)
+        assert np.array_equal(license_plate, self.pre_process.inverted_threshold(
+            candidates[self.pre_process.plate_index]))
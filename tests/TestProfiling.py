@@ -0,0 +1,75 @@
+import os
+import json
+import shutil
+import tempfile
+import threading
+import profiling
+from profiling import Trace, TraceWriter
+
+
+class TestProfiling():
+
+    @classmethod
+    def setup_class(self):
+        self.directory = tempfile.mkdtemp()
+
+    @classmethod
+    def teardown_class(self):
+        shutil.rmtree(self.directory)
+
+    def test_stage_without_trace(self):
+        print('A stage should do nothing when no trace is active')
+        with profiling.stage('decode'):
+            pass
+        assert profiling.current_trace() is None
+
+    def test_stages_are_recorded(self):
+        trace = Trace('car.jpg')
+        with profiling.activate(trace):
+            with profiling.stage('otsu'):
+                pass
+            with profiling.stage('otsu'):
+                pass
+        assert trace.calls == {'otsu': 2}
+        assert 0 < trace.stages['otsu'] <= trace.elapsed_ns
+        assert profiling.current_trace() is None
+
+    def test_trace_is_per_thread(self):
+        print('A stage on another thread should not reach the active trace')
+        trace = Trace()
+        with profiling.activate(trace):
+            thread = threading.Thread(target=lambda: profiling.stage('label').__enter__())
+            thread.start()
+            thread.join()
+        assert trace.stages == {}
+
+    def test_shared_stage(self):
+        print('A batch stage should be divided between the images')
+        batch = Trace()
+        batch.add('classification', 900)
+        trace = Trace()
+        trace.add_share(batch, 3)
+        assert trace.stages['classification'] == 300
+        assert trace.to_dict()['shared'] == {'classification': 3}
+
+    def test_profile(self):
+        trace = Trace()
+        with profiling.activate(trace, profile=True):
+            sorted(range(1000), key=lambda each: -each)
+        trace.finish()
+        assert trace.profilers == []
+        assert any('sorted' in row['function'] for row in trace.profile)
+
+    def test_trace_writer(self):
+        filename = os.path.join(self.directory, 'traces.jsonl')
+        writer = TraceWriter(filename)
+        trace = Trace('car.jpg')
+        trace.add('decode', 2000000)
+        writer.write(trace, plate_text='EGB626AA')
+        writer.write(trace)
+        writer.close()
+        with open(filename) as f:
+            records = [json.loads(line) for line in f]
+        assert len(records) == 2
+        assert records[0]['stages_ms'] == {'decode': 2.0}
+        assert records[0]['plate_text'] == 'EGB626AA'
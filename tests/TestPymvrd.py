@@ -0,0 +1,97 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from pymvrd import Mvrd, MvrdClient, ResponseCache, clean_html_tags
+
+# canned search.php answer of the stand-in server
+SEARCH_PAGE = ('<html><body><table>'
+    '<tr><td>Plate Number</td><td><b>{plate}</b></td></tr>'
+    '<tr><td>Owner</td><td>Ada Obi</td></tr>'
+    '</table></body></html>')
+
+
+class SearchHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.server.requests.append(self.path)
+        if url.path != '/search.php':
+            self.send_error(404)
+            return
+        plate = parse_qs(url.query).get('vpn', [''])[0]
+        if plate == 'FAIL':
+            self.send_error(500)
+            return
+        body = SEARCH_PAGE.format(plate=plate).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestPymvrd():
+
+    @classmethod
+    def setup_class(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), SearchHandler)
+        self.server.requests = []
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.base_url = 'http://127.0.0.1:{}'.format(self.server.server_port)
+
+    @classmethod
+    def teardown_class(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_clean_html_tags(self):
+        assert clean_html_tags('<td><b>EGB626AA</b></td>') == 'EGB626AA'
+
+    def test_get_data(self):
+        client = MvrdClient(self.base_url, timeout=5)
+        data = Mvrd('EGB626AA', client).get_data()
+        assert data == {'Plate Number': 'EGB626AA', 'Owner': 'Ada Obi'}
+
+    def test_http_error(self):
+        print('An HTTP error should give False, not raise, and not be cached')
+        client = MvrdClient(self.base_url, timeout=5)
+        assert client.get_data('FAIL') is False
+        assert Mvrd('FAIL', client).get_data() is False
+        assert len(client.cache) == 0
+
+    def test_cached_lookup(self):
+        print('A second lookup of a plate should not reach the server')
+        client = MvrdClient(self.base_url, timeout=5)
+        client.get_data('KJA123XY')
+        sent = len(self.server.requests)
+        assert client.get_data('KJA123XY')['Plate Number'] == 'KJA123XY'
+        assert len(self.server.requests) == sent
+
+    def test_get_data_many(self):
+        print('Bulk lookups should answer every plate, None for failures')
+        client = MvrdClient(self.base_url, timeout=5, max_workers=4)
+        plates = ['LND{}AB'.format(index) for index in range(10)] + ['FAIL']
+        results = client.get_data_many(plates + plates[:3])
+        assert list(results) == plates
+        assert results['FAIL'] is None
+        assert all(results[plate]['Plate Number'] == plate for plate in plates[:-1])
+
+    def test_cache_expiry(self):
+        cache = ResponseCache(max_entries=2, ttl=0)
+        cache.put('A', 1)
+        assert cache.get('A') is None
+
+    def test_cache_eviction(self):
+        print('The least recently used entry should be evicted first')
+        cache = ResponseCache(max_entries=2, ttl=60)
+        cache.put('A', 1)
+        cache.put('B', 2)
+        cache.get('A')
+        cache.put('C', 3)
+        assert cache.get('B') is None
+        assert cache.get('A') == 1 and cache.get('C') == 3
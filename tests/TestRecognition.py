@@ -0,0 +1,69 @@
+import os
+import threading
+from recognition import Recognizer, STAGES, recognize_batch
+
+TEST_IMAGE = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..',
+    'test_images', 'car10.jpg')
+OTHER_IMAGE = os.path.join(os.path.dirname(TEST_IMAGE), 'car6.jpg')
+
+
+class TestRecognition():
+
+    def test_progress(self):
+        print('Every stage should be reported before it starts')
+        stages = []
+        result = Recognizer().recognize(TEST_IMAGE, progress=stages.append)
+        assert result.success
+        assert tuple(stages) == STAGES
+
+    def test_cancel(self):
+        print('A cancelled recognition should stop before the next stage')
+        cancel_event = threading.Event()
+        stages = []
+
+        def progress(stage):
+            stages.append(stage)
+            cancel_event.set()
+
+        result = Recognizer().recognize(TEST_IMAGE, progress=progress,
+            cancel_event=cancel_event)
+        assert result.cancelled and not result.success
+        assert result.error[0] == 'Cancelled'
+        assert stages == ['preprocess']
+
+    def test_trace(self):
+        print('The result should carry the time of every pipeline stage')
+        result = Recognizer().recognize(TEST_IMAGE)
+        for stage in ('decode', 'grayscale', 'otsu', 'label', 'validation',
+                'segmentation', 'classification'):
+            assert result.trace.stages[stage] > 0
+        assert set(result.to_dict()['stages_ms']) == set(result.trace.stages)
+
+    def test_counts_per_image(self):
+        print('Images classified together should keep their own counts')
+        results = Recognizer().recognize_many([TEST_IMAGE, OTHER_IMAGE])
+        for result in results:
+            assert result.success
+            assert result.trace.counts['characters'] == len(result.characters)
+            assert isinstance(result.trace.counts['template_fallbacks'], int)
+
+    def test_batch(self):
+        print('A batch should keep the order of the images and report a bad')
+        print('image in its result')
+        missing = os.path.join(os.path.dirname(TEST_IMAGE), 'missing.jpg')
+        sources = [TEST_IMAGE, missing, OTHER_IMAGE, TEST_IMAGE]
+        results = list(recognize_batch(sources, workers=2, chunksize=1))
+        assert [result.source for result in results] == sources
+        assert results[1].error[0] == 'Preprocessing Error'
+        assert results[0].plate_text == results[3].plate_text == 'EGB626AA'
+        assert results[0].success and results[2].success
+
+    def test_batch_cancel(self):
+        print('A cancelled batch should stop without the queued images')
+        cancel_event = threading.Event()
+        results = []
+        for result in recognize_batch([TEST_IMAGE] * 16, workers=2, chunksize=1,
+                cancel_event=cancel_event):
+            results.append(result)
+            cancel_event.set()
+        assert 1 <= len(results) < 16
@@ -0,0 +1,90 @@
+import os
+import sys
+import warnings
+import numpy as np
+from sklearn.svm import SVC
+from sklearn.decomposition import PCA
+
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)),
+    '..', 'ml_code'))
+from ml_config import MachineLearningConfig
+import modelregistry
+from svmengine import LinearSVMEngine, compile_model
+
+
+class TestSVMEngine():
+
+    @classmethod
+    def setup_class(self):
+        root = os.path.split(os.path.dirname(os.path.realpath(__file__)))[0]
+        self.model = modelregistry.load_model_file(os.path.join(root,
+            'ml_models', 'SVC_model', 'SVC_model.pkl'), engine=False)
+        self.engine = LinearSVMEngine.from_model(self.model)
+        config = MachineLearningConfig()
+        image_data, self.target_data = config.read_training_data(
+            config.training_data[0])
+        self.features = image_data.astype(np.float64)
+
+    def test_parity_with_sklearn(self):
+        print('The engine should give the probabilities of the sklearn model')
+        print('on the 20X20 training set')
+        expected = self.model.predict_proba(self.features)
+        probabilities = self.engine.predict_proba(self.features)
+        assert probabilities.shape == expected.shape
+        assert np.allclose(probabilities, expected, atol=1e-3)
+        assert np.array_equal(np.argmax(probabilities, axis=1),
+            np.argmax(expected, axis=1))
+        assert np.array_equal(self.engine.classes_, self.model.classes_)
+        assert np.array_equal(self.engine.predict(self.features),
+            self.model.predict(self.features))
+
+    def test_decision_function(self):
+        print('The decision values should be the one-vs-one ones of libsvm')
+        self.model.decision_function_shape = 'ovo'
+        try:
+            expected = self.model.decision_function(self.features[:50])
+        finally:
+            self.model.decision_function_shape = 'ovr'
+        assert np.allclose(self.engine.decision_function(self.features[:50]),
+            expected)
+
+    def test_binary_model(self):
+        print('A binary model has the opposite sign in sklearn')
+        features = self.features[np.isin(self.target_data, ['8', 'B'])]
+        labels = self.target_data[np.isin(self.target_data, ['8', 'B'])]
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', FutureWarning)
+            model = SVC(kernel='linear', probability=True,
+                random_state=0).fit(features, labels)
+        engine = LinearSVMEngine.from_model(model)
+        # libsvm stops its coupling iterations early, more so with two classes
+        assert np.allclose(engine.predict_proba(features),
+            model.predict_proba(features), atol=1e-2)
+        assert np.array_equal(engine.predict(features), model.predict(features))
+
+    def test_projection(self):
+        print('A model trained on PCA reduced glyphs should be exported with')
+        print('the PCA and classify the raw glyphs like the sklearn pair')
+        for whiten in (False, True):
+            pca = PCA(20, whiten=whiten, random_state=0).fit(self.features)
+            reduced = pca.transform(self.features)
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', FutureWarning)
+                model = SVC(kernel='linear', probability=True,
+                    random_state=0).fit(reduced, self.target_data)
+            engine = LinearSVMEngine.from_model(model, projection=pca)
+            assert np.allclose(engine.project(self.features), reduced)
+            assert np.allclose(engine.predict_proba(self.features),
+                model.predict_proba(reduced), atol=1e-3)
+            copy = LinearSVMEngine.from_arrays(engine.to_arrays())
+            assert np.allclose(copy.predict_proba(self.features[:10]),
+                engine.predict_proba(self.features[:10]))
+
+    def test_arrays_and_compile(self):
+        print('The exported arrays should rebuild the same engine')
+        copy = LinearSVMEngine.from_arrays(self.engine.to_arrays())
+        assert np.allclose(copy.predict_proba(self.features[:10]),
+            self.engine.predict_proba(self.features[:10]))
+        assert copy.predict_proba(self.features[:0]).shape == (0, 34)
+        other = SVC(kernel='rbf')
+        assert compile_model(other) is other
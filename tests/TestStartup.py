@@ -0,0 +1,44 @@
+import startup
+
+SAMPLE = '''import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     _json
+import time:       800 |        920 |   json.decoder
+import time:       300 |       1220 | json
+'''
+
+
+class TestStartup():
+
+    def test_parse_importtime(self):
+        print('Every module line should be parsed with its depth')
+        rows = startup.parse_importtime(SAMPLE)
+        assert [row['module'] for row in rows] == ['_json', 'json.decoder', 'json']
+        assert [row['depth'] for row in rows] == [2, 1, 0]
+        assert rows[2]['self_us'] == 300 and rows[2]['cumulative_us'] == 1220
+
+    def test_profile_imports(self):
+        print('The imports should be timed in a fresh interpreter, leaving out')
+        print('what was imported before')
+        rows, wall, error = startup.profile_imports(['json'], after=['csv'])
+        assert error is None and wall > 0
+        modules = [row['module'] for row in rows]
+        assert 'json' in modules and 'csv' not in modules
+
+        rows, wall, error = startup.profile_imports(['no_such_module_here'])
+        assert rows == [] and 'no_such_module_here' in error
+
+    def test_pipeline_not_imported_by_database(self):
+        print('The vehicle registry should not pull in skimage or scikit-learn')
+        rows, wall, error = startup.profile_imports(['dbAspect', 'modelbundle'])
+        assert error is None
+        modules = set(row['module'] for row in rows)
+        assert 'skimage' not in modules and 'sklearn' not in modules
+
+    def test_warm_up(self):
+        print('The warm-up should report every step')
+        import full
+        steps = []
+        timings = full.warm_up(lambda step, seconds, error: steps.append(step))
+        assert tuple(steps) == full.WARM_UP_STEPS
+        assert set(timings) == set(full.WARM_UP_STEPS)
+        assert full.get_db() is full.get_db()
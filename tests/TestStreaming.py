@@ -0,0 +1,62 @@
+from recognition import RecognitionResult
+from streaming import PlateStream
+
+
+class FakeRecognizer():
+    """
+    treats every frame as a (plate text, confidence) tuple
+    """
+
+    def recognize(self, frame):
+        result = RecognitionResult(None)
+        result.plate_text, confidence = frame
+        result.confidences = [confidence]
+        return result
+
+
+class TestStreaming():
+
+    def test_consecutive_reads_are_merged(self):
+        print('Reads of the same plate in consecutive frames give one sighting')
+        frames = [('EGB626AA', 0.2), ('EGB626AA', 0.5), ('', 0.0),
+            ('EGB626AA', 0.3)] + [('', 0.0)] * 5 + [('KJA123XY', 0.4)]
+        saved = []
+        stream = PlateStream(FakeRecognizer(), max_gap=3,
+            on_sighting=saved.append)
+        sightings = list(stream.process(frames))
+        assert [each.plate_text for each in sightings] == ['EGB626AA', 'KJA123XY']
+        assert sightings[0].reads == 3
+        assert sightings[0].confidence == 0.5
+        assert sightings[0].best_frame == 1
+        assert saved == sightings
+
+    def test_misread_variant_is_merged(self):
+        print('A read with a look-alike character should not open a new')
+        print('sighting, the most confident read sets the text')
+        frames = [('EGB626AA', 0.2), ('EGB6Z6AA', 0.6), ('EGB626AA', 0.3),
+            ('EG8626AA', 0.1), ('EGB626AA', 0.4)]
+        saved = []
+        stream = PlateStream(FakeRecognizer(), on_sighting=saved.append)
+        sightings = list(stream.process(frames))
+        assert len(sightings) == 1 and saved == sightings
+        assert sightings[0].reads == 5
+        assert sightings[0].plate_text == 'EGB6Z6AA'
+        assert sightings[0].best_frame == 1
+
+    def test_different_plates_in_view(self):
+        print('Plates differing by more than a look-alike character are')
+        print('different sightings')
+        frames = [('EGB626AA', 0.2), ('KJA123XY', 0.5), ('EGB626AA', 0.3),
+            ('KJA128XY', 0.1), ('KJA123XY', 0.1)]
+        stream = PlateStream(FakeRecognizer())
+        sightings = list(stream.process(frames))
+        assert [each.plate_text for each in sightings] == ['EGB626AA',
+            'KJA123XY', 'KJA128XY']
+        assert [each.reads for each in sightings] == [2, 2, 1]
+
+    def test_stride(self):
+        print('Only every stride-th frame should be recognized')
+        frames = [('AAA111AA', 0.5), ('BBB222BB', 0.5)] * 3
+        stream = PlateStream(FakeRecognizer(), stride=2)
+        sightings = list(stream.process(frames))
+        assert [each.plate_text for each in sightings] == ['AAA111AA']
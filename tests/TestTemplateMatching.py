@@ -0,0 +1,74 @@
+import os
+import os.path as path
+import tempfile
+import numpy as np
+from skimage.feature import match_template
+import templatematching
+from templatematching import TemplateBank
+
+
+class TestTemplateMatching():
+
+    @classmethod
+    def setup_class(self):
+        root = path.split(path.dirname(path.realpath(__file__)))[0]
+        self.training_dir = path.join(root, 'training_data', 'train20X20')
+        self.bank = templatematching.get_template_bank(self.training_dir)
+        rng = np.random.RandomState(0)
+        self.images = rng.rand(5, 20, 20)
+
+    def test_scores_match_skimage(self):
+        print('The vectorized match should agree with match_template')
+        scores = self.bank.fraction_scores(self.images.reshape(5, -1), ['2', 'Z'])
+        for image_index, image in enumerate(self.images):
+            for label_index, label in enumerate(['2', 'Z']):
+                expected = 0
+                for i in range(10):
+                    template = self.bank.templates[self.bank.label_index[label], i]
+                    expected += match_template(image, template)[0, 0] / 10
+                assert abs(scores[image_index, label_index] - expected) < 1e-9
+
+    def test_template_match_picks_template_label(self):
+        print('A template image should be matched to its own label')
+        template = self.bank.templates[self.bank.label_index['Z'], 0]
+        assert templatematching.template_match('2', template,
+            self.training_dir) == 'Z'
+
+    def test_fraction_match_any_label(self):
+        print('A label outside the template bank should still be matched')
+        image = self.images[0]
+        expected = 0
+        for i in range(10):
+            template = templatematching.read_template(path.join(self.training_dir,
+                'A', 'A_{}.jpg'.format(i)))
+            expected += match_template(image, template)[0, 0] / 10
+        assert 'A' not in self.bank.label_index
+        fraction = templatematching.fraction_match('A', self.training_dir, image)
+        assert abs(fraction - expected) < 1e-9
+        assert templatematching.template_match('A', image, self.training_dir) == 'A'
+
+    def test_cache_round_trip(self):
+        print('A bank read back from the cache should equal the original')
+        print('without reading the template images again')
+        handle, cache_path = tempfile.mkstemp(suffix='.npz')
+        os.close(handle)
+        os.remove(cache_path)
+        read_template = templatematching.read_template
+        reads = []
+
+        def counting_read_template(image_dir):
+            reads.append(image_dir)
+            return read_template(image_dir)
+
+        templatematching.read_template = counting_read_template
+        try:
+            bank = TemplateBank.from_directory(self.training_dir, ['5', 'S'],
+                cache_path)
+            assert len(reads) == 20 and os.path.exists(cache_path)
+            cached = TemplateBank.from_directory(self.training_dir, ['5', 'S'],
+                cache_path)
+            assert len(reads) == 20
+            assert np.array_equal(bank.templates, cached.templates)
+        finally:
+            templatematching.read_template = read_template
+            os.remove(cache_path)
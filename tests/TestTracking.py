@@ -0,0 +1,29 @@
+import os.path as path
+import numpy as np
+from skimage.io import imread
+from preprocess import PreProcess
+from tracking import PlateTracker
+
+
+class TestTracking():
+
+    @classmethod
+    def setup_class(self):
+        image_path = path.join(path.split(path.dirname(path.realpath(__file__)))[0],
+            'test_images', 'car10.jpg')
+        image = imread(image_path)
+        self.frames = [np.roll(image, shift, axis=1) for shift in (0, 3, 6)]
+
+    def test_window_search_finds_the_plate(self):
+        print('The window search should find the same plate as a full search')
+        tracker = PlateTracker()
+        for each_frame in self.frames:
+            pre_process = PreProcess(each_frame)
+            tracker.locate(pre_process)
+            full_search = PreProcess(each_frame)
+            full_search.get_plate_like_objects()
+            plate_box = full_search.plate_objects_cordinates[1]
+            assert plate_box in pre_process.plate_objects_cordinates
+            tracker.last_bbox = plate_box
+        assert tracker.full_searches == 1
+        assert tracker.window_hits == 2
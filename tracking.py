@@ -0,0 +1,115 @@
+"""
+Plate tracking across consecutive frames.
+
+For a fixed camera the plate of the next frame is almost where it was in the
+previous one. PlateTracker searches a padded window around the last plate
+first, thresholding with the Otsu value of the last full frame search, and
+only thresholds and labels the whole frame when the window search finds
+nothing, when the plate was lost or every refresh_every frames.
+"""
+from skimage import measure
+
+import profiling
+
+
+class PlateTracker():
+
+    def __init__(self, padding=0.5, refresh_every=30):
+        """
+        Parameters:
+        -----------
+        padding: float; the window is the last plate box grown on every side
+            by this fraction of the plate height (rows) and width (columns)
+        refresh_every: int; a full frame search is forced after this many
+            window searches
+        """
+        self.padding = padding
+        self.refresh_every = refresh_every
+        self.last_bbox = None
+        self.image_shape = None
+        self.threshold_value = None
+        self.window_searches = 0
+        self.window_hits = 0
+        self.full_searches = 0
+
+    def locate(self, pre_process):
+        """
+        Finds the plate like objects of a frame, same as
+        PreProcess.get_plate_like_objects
+
+        Parameters:
+        -----------
+        pre_process: PreProcess instance of the frame
+
+        Returns:
+        --------
+        list of the candidate regions (views of full_car_image), their boxes
+        are in pre_process.plate_objects_cordinates
+        """
+        if (self.last_bbox is not None and self.threshold_value is not None and
+                self.window_searches < self.refresh_every and
+                self.image_shape == pre_process.full_car_image.shape):
+            self.window_searches += 1
+            plate_like_objects = self.search_window(pre_process)
+            if plate_like_objects:
+                self.window_hits += 1
+                return plate_like_objects
+
+        return self.search_full(pre_process)
+
+    def search_full(self, pre_process):
+        self.full_searches += 1
+        self.window_searches = 0
+        plate_like_objects = pre_process.get_plate_like_objects()
+        self.threshold_value = pre_process.threshold_value
+        self.image_shape = pre_process.full_car_image.shape
+        return plate_like_objects
+
+    def search_window(self, pre_process):
+        """
+        Looks for the plate only around the last known plate box
+        """
+        full_car_image = pre_process.full_car_image
+        height, width = full_car_image.shape
+        minRow, minCol, maxRow, maxCol = self.last_bbox
+        pad_rows = int(round((maxRow - minRow) * self.padding))
+        pad_cols = int(round((maxCol - minCol) * self.padding))
+        top, left = max(0, minRow - pad_rows), max(0, minCol - pad_cols)
+        bottom, right = min(height, maxRow + pad_rows), min(width, maxCol + pad_cols)
+
+        with profiling.stage('otsu'):
+            window = full_car_image[top:bottom, left:right] > self.threshold_value
+        with profiling.stage('label'):
+            bboxes = pre_process.filter_plate_regions(measure.label(window),
+                pre_process.plate_dimensions(full_car_image.shape))
+
+        # a region cut by the window border may only be part of a bigger
+        # object, leave those to the full frame search
+        inside = (((bboxes[:, 0] > 0) | (top == 0)) &
+            ((bboxes[:, 1] > 0) | (left == 0)) &
+            ((bboxes[:, 2] < bottom - top) | (bottom == height)) &
+            ((bboxes[:, 3] < right - left) | (right == width)))
+        bboxes = bboxes[inside] + (top, left, top, left)
+
+        pre_process.plate_objects_cordinates = [tuple(each) for each in bboxes.tolist()]
+        return [full_car_image[minRow:maxRow, minCol:maxCol]
+            for minRow, minCol, maxRow, maxCol in pre_process.plate_objects_cordinates]
+
+    def observe(self, result):
+        """
+        Remembers where the plate of a recognized frame was, a failed
+        recognition drops the track so the next frame is searched in full
+
+        Parameters:
+        -----------
+        result: RecognitionResult of the frame
+        """
+        if result.success:
+            self.last_bbox = result.plate_box
+        else:
+            self.last_bbox = None
+
+    def reset(self):
+        self.last_bbox = None
+        self.threshold_value = None
+        self.window_searches = 0
@@ -0,0 +1,262 @@
+"""
+Binary cache of the vehicle dataset.
+
+Parsing vehicles_dataset.xlsx takes seconds for a large registry. The first
+load converts it to a NumPy structured array (one field per column) plus a
+sorted plate number index and saves both as .npy files next to the dataset.
+Later loads memory-map those files instead of parsing the spreadsheet again.
+The cache is rebuilt when the dataset changes: the modification time and
+size are compared first and the SHA-1 of the contents when they differ.
+"""
+import os
+import json
+import hashlib
+import tempfile
+
+import numpy as np
+
+# bump when the layout of the cache files changes
+CACHE_VERSION = 1
+
+# characters ignored when comparing plate numbers
+PLATE_SEPARATORS = str.maketrans('', '', ' -\t')
+
+
+def replace_file(path, write):
+    """
+    Calls write with a binary file object of a new temporary file next to
+    path and moves it over path, so readers never see a partial file and
+    processes rebuilding the cache at the same time do not share one.
+    """
+    directory, name = os.path.split(path)
+    descriptor, temporary_path = tempfile.mkstemp(prefix=name + '.',
+        suffix='.tmp', dir=directory or '.')
+    try:
+        with os.fdopen(descriptor, 'wb') as f:
+            write(f)
+        os.replace(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+
+def normalize_plate(plate_text):
+    """
+    Upper-case plate text without spaces or dashes, the key plates are
+    looked up by.
+    """
+    return str(plate_text).translate(PLATE_SEPARATORS).upper()
+
+
+class SortedPlateIndex():
+
+    def __init__(self, keys, positions):
+        """
+        Plate number index stored as two arrays so it can be memory mapped.
+
+        Parameters:
+        -----------
+        keys: 1D array of the sorted, unique normalized plate numbers
+        positions: 1D array of the dataset row of each key
+        """
+        self.keys = keys
+        self.positions = positions
+
+    @classmethod
+    def from_plates(cls, plates):
+        """
+        Parameters:
+        -----------
+        plates: 1D array of the plate number of every row ('' for none)
+
+        the first row of a duplicated plate wins
+        """
+        keys = np.array([normalize_plate(each) for each in plates.tolist()],
+            dtype=str)
+        order = np.argsort(keys, kind='stable')
+        unique_keys, first = np.unique(keys[order], return_index=True)
+        positions = order[first]
+        if len(unique_keys) and unique_keys[0] == '':
+            unique_keys, positions = unique_keys[1:], positions[1:]
+        return cls(unique_keys, positions.astype(np.int64))
+
+    def get(self, key, default=None):
+        # a key longer than the stored ones is not there, and searching for
+        # it would cast the whole key array to the longer width
+        if self.keys.dtype.kind == 'U' and len(key) > self.keys.dtype.itemsize // 4:
+            return default
+        index = int(np.searchsorted(self.keys, key))
+        if index < len(self.keys) and self.keys[index] == key:
+            return int(self.positions[index])
+        return default
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def read_dataset(data_file):
+    """
+    Parses the Excel or CSV dataset with pandas
+
+    Returns:
+    --------
+    the DataFrame or None for an unsupported file format
+    """
+    import pandas as pd
+
+    if data_file.lower().endswith('.xlsx') or data_file.lower().endswith('.xls'):
+        return pd.read_excel(data_file)
+    elif data_file.lower().endswith('.csv'):
+        return pd.read_csv(data_file)
+    print("Unsupported file format. Use Excel (.xlsx) or CSV (.csv).")
+    return None
+
+
+def dataframe_to_table(vehicle_df):
+    """
+    Converts a DataFrame to a structured array. Numeric columns keep their
+    type, every other column (text, dates) is stored as fixed width text
+    with missing values as ''.
+    """
+    fields = []
+    columns = []
+    for column in vehicle_df.columns:
+        values = vehicle_df[column]
+        if values.dtype.kind in 'biuf':
+            data = values.to_numpy()
+        else:
+            data = np.array(['' if value is None or value != value else str(value)
+                for value in values.tolist()], dtype=str)
+        fields.append((str(column), data.dtype))
+        columns.append(data)
+
+    table = np.empty(len(vehicle_df), dtype=fields)
+    for (name, dtype), data in zip(fields, columns):
+        table[name] = data
+    return table
+
+
+def source_signature(data_file, with_digest=True):
+    stat = os.stat(data_file)
+    signature = {'version': CACHE_VERSION, 'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size}
+    if with_digest:
+        digest = hashlib.sha1()
+        with open(data_file, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        signature['sha1'] = digest.hexdigest()
+    return signature
+
+
+class VehicleCache():
+
+    def __init__(self, data_file, cache_dir=None, registration_col='plate_number'):
+        """
+        Parameters:
+        -----------
+        data_file: str; the Excel or CSV dataset
+        cache_dir: str; directory of the cache files (default: the dataset
+            path with a .cache suffix)
+        registration_col: str; the plate number column the index is built on
+        """
+        self.data_file = data_file
+        self.cache_dir = cache_dir or data_file + '.cache'
+        self.registration_col = registration_col
+        self.meta_path = os.path.join(self.cache_dir, 'meta.json')
+
+    def path(self, name):
+        return os.path.join(self.cache_dir, name + '.npy')
+
+    def load(self):
+        """
+        Returns:
+        --------
+        a tuple containing
+        0: the structured array of the dataset (memory mapped when it came
+            from the cache) or None when the dataset could not be read
+        1: SortedPlateIndex on the registration column or None
+        """
+        if self.is_current():
+            return self.read_cache()
+
+        table = self.read_table()
+        if table is None:
+            return None, None
+        plate_index = None
+        if self.registration_col in (table.dtype.names or ()):
+            plate_index = SortedPlateIndex.from_plates(table[self.registration_col])
+
+        try:
+            self.write_cache(table, plate_index)
+            return self.read_cache()
+        except OSError as e:
+            print(f"Could not write the vehicle cache {self.cache_dir}: {e}")
+            return table, plate_index
+
+    def read_table(self):
+        """
+        parses the dataset itself, bypassing the cache
+        """
+        vehicle_df = read_dataset(self.data_file)
+        if vehicle_df is None:
+            return None
+        return dataframe_to_table(vehicle_df)
+
+    def is_current(self):
+        if not os.path.exists(self.meta_path):
+            return False
+        try:
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if meta.get('registration_col') != self.registration_col:
+            return False
+
+        signature = source_signature(self.data_file, with_digest=False)
+        if all(meta.get(key) == signature[key] for key in signature):
+            return True
+
+        # touched but maybe not changed, e.g. copied to another machine
+        signature = source_signature(self.data_file)
+        if meta.get('sha1') != signature['sha1'] or meta.get('version') != CACHE_VERSION:
+            return False
+        meta.update(signature)
+        self.write_meta(meta)
+        return True
+
+    def read_cache(self):
+        table = np.load(self.path('table'), mmap_mode='r')
+        plate_index = None
+        if os.path.exists(self.path('plate_keys')):
+            plate_index = SortedPlateIndex(np.load(self.path('plate_keys'), mmap_mode='r'),
+                np.load(self.path('plate_positions'), mmap_mode='r'))
+        return table, plate_index
+
+    def write_cache(self, table, plate_index):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # the meta file goes last and is only valid with the arrays it describes
+        if os.path.exists(self.meta_path):
+            os.remove(self.meta_path)
+        # replaced rather than overwritten, another process may have the
+        # old files memory mapped
+        replace_file(self.path('table'), lambda f: np.save(f, table))
+        if plate_index is not None:
+            replace_file(self.path('plate_keys'),
+                lambda f: np.save(f, plate_index.keys))
+            replace_file(self.path('plate_positions'),
+                lambda f: np.save(f, plate_index.positions))
+        elif os.path.exists(self.path('plate_keys')):
+            os.remove(self.path('plate_keys'))
+        meta = source_signature(self.data_file)
+        meta['registration_col'] = self.registration_col
+        self.write_meta(meta)
+
+    def write_meta(self, meta):
+        replace_file(self.meta_path,
+            lambda f: f.write(json.dumps(meta).encode('utf-8')))